@@ -0,0 +1,213 @@
+"""Approximate nearest-neighbour indexes over the NumPy store's normalized vectors.
+
+Both kinds answer `search(queries, k) -> (rows, scores)` with rows into the
+store's matrix and inner-product scores, and persist their build and search
+parameters next to the index so a restart does not rebuild. Search-time
+knobs (ef_search, nprobe) can change without a rebuild.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+ANN_INDEX = os.getenv("ANN_INDEX", "")  # "", "hnsw" or "ivf"
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0: about 4 * sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PARAMS_NAME = "ann.json"
+SEARCH_PARAM_ENV = {"ef_search": "HNSW_EF_SEARCH", "nprobe": "IVF_NPROBE"}
+
+
+def ids_fingerprint(ids) -> str:
+    return hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()
+
+
+def _as_queries(queries):
+    queries = np.asarray(queries, dtype=np.float32)
+    return queries[None, :] if queries.ndim == 1 else queries
+
+
+class HnswIndex:
+    """hnswlib graph (installed with chromadb as chroma-hnswlib) in inner-product space."""
+
+    kind = "hnsw"
+    build_params = ("M", "ef_construction")
+    search_params = ("ef_search",)
+
+    def __init__(self, M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH, seed=100):
+        self.params = {"M": M, "ef_construction": ef_construction, "ef_search": ef_search, "seed": seed}
+        self.index = None
+        # ef is shared by every thread searching the index, so it only changes under this lock
+        self._ef_lock = threading.Lock()
+
+    def build(self, vectors):
+        import hnswlib
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=self.params["ef_construction"],
+                              M=self.params["M"], random_seed=self.params["seed"])
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        self.set_search_params()
+        return self
+
+    def set_search_params(self, ef_search=None):
+        with self._ef_lock:
+            if ef_search is not None:
+                self.params["ef_search"] = ef_search
+            if self.index is not None:
+                self.index.set_ef(self.params["ef_search"])
+
+    def search(self, queries, k=10):
+        queries = _as_queries(queries)
+        k = min(k, self.index.get_current_count())
+        if k <= self.params["ef_search"]:
+            # ef is never below ef_search, so this needs no lock
+            rows, distances = self.index.knn_query(queries, k=k)
+        else:
+            # ef below k makes hnswlib return fewer than k; raise it for this query only
+            with self._ef_lock:
+                self.index.set_ef(k)
+                try:
+                    rows, distances = self.index.knn_query(queries, k=k)
+                finally:
+                    self.index.set_ef(self.params["ef_search"])
+        return rows.astype(np.int64), 1.0 - distances
+
+    def save(self, path):
+        self.index.save_index(os.path.join(path, "hnsw.bin"))
+
+    def load(self, path, vectors):
+        import hnswlib
+
+        self.index = hnswlib.Index(space="ip", dim=np.shape(vectors)[1])
+        self.index.load_index(os.path.join(path, "hnsw.bin"), max_elements=len(vectors))
+        self.set_search_params()
+        return self
+
+
+class IVFIndex:
+    """Inverted-file index: k-means centroids, rows stored list by list, nprobe lists scanned per query."""
+
+    kind = "ivf"
+    build_params = ("nlist",)
+    search_params = ("nprobe",)
+
+    def __init__(self, nlist=IVF_NLIST, nprobe=IVF_NPROBE, train_iters=10, train_sample=50_000, seed=0):
+        self.params = {"nlist": nlist, "nprobe": nprobe, "train_iters": train_iters,
+                       "train_sample": train_sample, "seed": seed}
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+        self.vectors = None
+
+    def _assign(self, vectors, centroids, batch=8192):
+        return np.concatenate([
+            np.argmax(vectors[i:i + batch] @ centroids.T, axis=1) for i in range(0, len(vectors), batch)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def build(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = self.params["nlist"] or max(1, int(4 * np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        self.params["nlist"] = nlist
+
+        # spherical k-means on a sample; centroids stay unit length so assignment is an inner product
+        rng = np.random.default_rng(self.params["seed"])
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), self.params["train_sample"]), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.params["train_iters"]):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignment = self._assign(vectors, centroids)
+        self.centroids = centroids
+        self.order = np.argsort(assignment, kind="stable")
+        self.offsets = np.r_[0, np.cumsum(np.bincount(assignment, minlength=nlist))]
+        self.vectors = vectors[self.order]
+        return self
+
+    def set_search_params(self, nprobe=None):
+        if nprobe is not None:
+            self.params["nprobe"] = nprobe
+
+    def search(self, queries, k=10):
+        queries = _as_queries(queries)
+        nprobe = min(self.params["nprobe"], len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+            if not len(candidates):
+                continue
+            found = self.vectors[candidates] @ queries[q]
+            n = min(k, len(found))
+            top = np.argpartition(-found, n - 1)[:n]
+            top = top[np.argsort(-found[top], kind="stable")]
+            rows[q, :n] = self.order[candidates[top]]
+            scores[q, :n] = found[top]
+        return rows, scores
+
+    def save(self, path):
+        np.savez(os.path.join(path, "ivf.npz"), centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    def load(self, path, vectors):
+        with np.load(os.path.join(path, "ivf.npz")) as data:
+            self.centroids, self.order, self.offsets = data["centroids"], data["order"], data["offsets"]
+        self.vectors = np.asarray(vectors, dtype=np.float32)[self.order]
+        return self
+
+
+ANN_KINDS = {"hnsw": HnswIndex, "ivf": IVFIndex}
+
+
+def load_or_build(kind, path, vectors, fingerprint, **params):
+    """Reuse the index under `path` if it was built from the same vectors (`fingerprint`) and build params.
+
+    Search params saved in ann.json are restored unless given in `params`
+    or set in the environment (HNSW_EF_SEARCH, IVF_NPROBE).
+    """
+    index = ANN_KINDS[kind](**params)
+    params_path = os.path.join(path, PARAMS_NAME)
+    saved = {}
+    if os.path.exists(params_path):
+        try:
+            with open(params_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable ANN params {params_path}: {e}")
+
+    if saved.get("kind") == kind:
+        # tuned search knobs survive restarts unless passed explicitly or set in the environment
+        index.params.update({name: saved["params"][name] for name in index.search_params
+                             if name not in params and os.getenv(SEARCH_PARAM_ENV[name]) is None
+                             and name in saved.get("params", {})})
+
+    same_build = saved.get("kind") == kind and saved.get("fingerprint") == fingerprint and all(
+        saved.get("params", {}).get(name) == index.params[name] for name in index.build_params if index.params[name]
+    )
+    if same_build:
+        try:
+            index.load(path, vectors)
+            index.params.update({name: saved["params"][name] for name in index.build_params})
+            index.set_search_params()
+            return index
+        except Exception as e:
+            print(f"Rebuilding {kind} index: {e}")
+
+    print(f"Building {kind} index over {len(vectors)} vectors with {index.params}")
+    index.build(vectors)
+    os.makedirs(path, exist_ok=True)
+    index.save(path)
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "fingerprint": fingerprint, "count": len(vectors), "params": index.params}, f, indent=2)
+    return index
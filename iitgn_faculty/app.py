@@ -1,158 +1,71 @@
 import streamlit as st
-import json
-import re
 import urllib.parse
-from collections import defaultdict
-from streamlit_pills import pills
-from email_drafter import draft_email
-import requests
-from PIL import Image
-from io import BytesIO
-import certifi
-import os
-import urllib.parse
-from recommender import retrieve_symantic_recommendations
+from email_drafter import draft_cache_stats, draft_email_stream, draft_emails_bulk, drafts_zip
+from images import ThumbnailCache
+from corpus import load_records
+from search_index import FacultySearchIndex
+from cards import card_key, render_card_html
+from recommender import embedding_cache_stats, last_retrieval_mode, retrieve_symantic_recommendations, warm_up
 
 
-def proxy_image_url(url: str) -> str:
-    if not url:
-        return FALLBACK_IMAGE_URL
-    return f"https://images.weserv.nl/?url={urllib.parse.quote(url, safe='')}&w=300"
+st.set_page_config(page_title="IIT Faculty Hub", layout="wide")
 
 
-FALLBACK_IMAGE_URL = "https://upload.wikimedia.org/wikipedia/en/3/3e/IIT_Delhi_Logo.png"
-st.set_page_config(page_title="IIT Faculty Hub", layout="wide")
+@st.cache_resource(show_spinner=False)
+def load_thumbnail_cache():
+    return ThumbnailCache()
 
-@st.cache_data(show_spinner=False)
-def safe_load_image(url):
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=4, verify=certifi.where())
-        if response.status_code == 200 and "image" in response.headers.get("Content-Type", ""):
-            return Image.open(BytesIO(response.content))
-    except Exception as e:
-        print("Image load error:", e)
-    return None
 
 @st.cache_data
 def load_data():
-    all_data = []
-    base_dir = os.path.dirname(__file__)
-
-    with open(os.path.join(base_dir, "faculty/iitgn_faculty.json"), "r", encoding="utf-8") as f:
-        gn_data = json.load(f)
-        for prof in gn_data:
-            match = re.search(r'/faculty/([^/]+)', prof.get("profile_url", ""))
-            prof["department"] = match.group(1).upper() if match else "UNKNOWN"
-            prof["college_name"] = "IIT Gandhinagar"
-        all_data.extend(gn_data)
-    
-    with open(os.path.join(base_dir, "faculty/iitj_faculty.json"), "r", encoding="utf-8") as f:
-        j_data = json.load(f)
-
-        for prof in j_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#")
-            prof["college_name"] = "IIT jodhpur"
-
-        all_data.extend(j_data)
-
-
-    with open(os.path.join(base_dir, "faculty/iitg_faculty.json"), "r", encoding="utf-8") as f:
-        g_data = json.load(f)
-        for prof in g_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["college_name"] = "IIT Guwahati"
-        all_data.extend(g_data)
-
-    with open(os.path.join(base_dir, "faculty/iitr_faculty.json"), "r", encoding="utf-8") as f:
-        r_data = json.load(f)
-        for prof in r_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#").replace(" ", "%20")
-            prof["college_name"] = "IIT Roorkee"
-        all_data.extend(r_data)
-
-    with open(os.path.join(base_dir, "faculty/iitbhu_faculty.json"), "r", encoding="utf-8") as f:
-        bhu_data = json.load(f)
-        for prof in bhu_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#")
-            prof["college_name"] = "IIT BHU (Varanasi)"
-        all_data.extend(bhu_data)
-
-    with open(os.path.join(base_dir, "faculty/iith_faculty.json"), "r", encoding="utf-8") as f:
-        h_data = json.load(f)
-        for prof in h_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#")
-            prof["college_name"] = "IIT Hyderabad"
-        all_data.extend(h_data)
-
-    with open(os.path.join(base_dir, "faculty/iiti_faculty.json"), "r", encoding="utf-8") as f:
-        i_data = json.load(f)
-        for prof in i_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#")
-            prof["college_name"] = "IIT Indore"
-        all_data.extend(i_data)
-
-    with open(os.path.join(base_dir, "faculty/iitd_faculty.json"), "r", encoding="utf-8") as f:
-        d_data = json.load(f)
-        for prof in d_data:
-            prof["department"] = prof.get("department", "UNKNOWN").strip()
-            prof["profile_url"] = prof.get("profile_url", "#")
-            prof["college_name"] = "IIT delhi"
-        all_data.extend(d_data)
-
-    return all_data
+    return load_records()
+
+
+@st.cache_resource(show_spinner=False)
+def load_search_index():
+    return FacultySearchIndex(load_data())
+
+
+@st.cache_data(show_spinner=False)
+def filter_options():
+    data = load_data()
+    departments = sorted(set(p.get("department", "UNKNOWN") for p in data if p.get("department")))
+    colleges = sorted(set(p.get("college_name", "Unknown") for p in data))
+    return departments, colleges
+
+
+@st.cache_data(show_spinner=False, max_entries=5000)
+def card_html(key, _prof):
+    return render_card_html(_prof)
+
+
+def render_card(prof, extra_html=None):
+    with st.container():
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(card_html(card_key(prof), prof), unsafe_allow_html=True)
+            if extra_html:
+                st.markdown(extra_html, unsafe_allow_html=True)
+        with col2:
+            if prof.get("photo"):
+                # served from the local thumbnail cache; on a miss the browser loads the original
+                thumbnail = load_thumbnail_cache().get(prof["photo"])
+                st.image(thumbnail or prof["photo"], use_container_width=True)
+
 
 with st.spinner("Loading faculty data..."):
     data = load_data()
+    search_index = load_search_index()
+
+# Embeddings + Chroma load in the background while the first page renders
+warm_up()
 
 st.title("IIT Faculty Hub")
 if "suggested_profs" in st.session_state and st.session_state["suggested_profs"]:
     st.markdown("## Suggested Professors")
     for prof in st.session_state["suggested_profs"]:
-        with st.container():
-            col1, col2 = st.columns([4, 1])
-            with col1:
-                st.markdown(f"### {prof.get('name', 'N/A')}")
-                st.markdown(f"College: {prof.get('college_name', 'N/A')}")
-                st.markdown(f"Designation: {prof.get('designation', 'N/A')}")
-                st.markdown(f"Department: {prof.get('department', 'N/A')}")
-                st.markdown(f"Email: `{prof.get('email', 'N/A')}`")
-
-                if prof.get("website"):
-                    st.markdown(f"[Website]({prof['website']})")
-
-                research_raw = prof.get("research_interests") or ""
-                interests = [s.strip(" ●,|") for s in re.split(r"[●•,|]", research_raw) if s.strip()]
-                if interests:
-                    st.markdown("Research Interests:")
-                    for i in interests:
-                        st.markdown(f"- {i}")
-                else:
-                    st.markdown("Research Interests: N/A")
-
-                st.markdown(f"Academic Background: {prof.get('academic_background', 'N/A')}")
-                st.markdown(f"Work Experience: {prof.get('work_experience', 'N/A')}")
-
-                if prof.get("selected_publications"):
-                    with st.expander("Selected Publications"):
-                        pubs = prof["selected_publications"]
-                        if isinstance(pubs, list):
-                            for pub in pubs:
-                                st.markdown(f"- {pub}")
-                        else:
-                            st.markdown(pubs)
-
-                st.markdown(f"[🔗 Profile Link]({prof.get('profile_url', '#')})")
-
-            with col2:
-                if prof.get("photo"):
-                    st.image(proxy_image_url(prof["photo"]), use_container_width=True)
-            st.markdown("---")
+        render_card(prof)
+        st.markdown("---")
 
 if "suggested_profs" in st.session_state and st.session_state["suggested_profs"]:
     if st.button("Clear Suggestions"):
@@ -218,6 +131,14 @@ with st.sidebar:
                         st.warning("No suggestions found.")
                     else:
                         st.session_state["suggested_profs"] = suggested_names
+                if last_retrieval_mode() == "lexical":
+                    st.caption("Semantic search unavailable right now; showing keyword matches.")
+                cache_stats = embedding_cache_stats()
+                if cache_stats:
+                    st.caption(
+                        f"Query embedding cache: {cache_stats['hits_memory'] + cache_stats['hits_disk']} hits, "
+                        f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})"
+                    )
         st.markdown("---")
 
 
@@ -225,10 +146,9 @@ with st.sidebar:
         filter_mode = st.checkbox("🔍 Show Filters", value=False)
         if filter_mode:
             st.header("🎯 Search Professors")
-            departments = sorted(set(p.get("department", "UNKNOWN") for p in data if p.get("department")))
+            departments, college_options = filter_options()
             st.selectbox("Select Department", ["All"] + departments, key="selected_dept")
             st.text_input("Search by Name", key="search_name").strip()
-            college_options = sorted(set(p.get("college_name", "Unknown") for p in data))
             st.selectbox("Select College", [""] + college_options, key="search_college")
 
             st.text_input("Search by Research Interest", key="search_interest").strip()
@@ -255,25 +175,49 @@ with st.sidebar:
         extra_note = st.text_area("Additional message (optional)")
     else:
         st.header("🎯 Search Professors")
-        departments = sorted(set(p.get("department", "UNKNOWN") for p in data if p.get("department")))
+        departments, _ = filter_options()
         st.selectbox("Select Department", ["All"] + departments, key="selected_dept")
         st.text_input("Search by Name", key="search_name").strip()
         st.text_input("Search by Research Interest", key="search_interest").strip()
 
-filtered = [
-    p for p in data_to_filter
-    if (st.session_state.get("selected_dept", "All") == "All" or (p.get("department", "").strip().lower() == st.session_state.get("selected_dept", "").strip().lower()))
-    and (st.session_state.get("search_name") or "").strip().lower() in (p.get("name", "") or "").strip().lower()
-    and (st.session_state.get("search_interest") or "").strip().lower() in (p.get("research_interests", "") or "").strip().lower()
-    and (st.session_state.get("search_college") or "").strip().lower() in (p.get("college_name", "") or "").strip().lower()
-]
+# Suggestions are a handful of rows, so a throwaway index is cheaper than caching one
+active_index = search_index if data_to_filter is data else FacultySearchIndex(data_to_filter)
+filtered = active_index.filter(
+    data_to_filter,
+    st.session_state.get("selected_dept", "All"),
+    st.session_state.get("search_name") or "",
+    st.session_state.get("search_interest") or "",
+    st.session_state.get("search_college") or "",
+)
 
 
+# Cap for the "Choose a Professor" selectbox; the card list below is paginated instead
 MAX_PROFS_TO_SHOW = 200
-filtered = filtered[:MAX_PROFS_TO_SHOW]
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+
+with st.sidebar:
+    page_size = st.selectbox("Results per page", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE), key="page_size")
+
+query_key = (
+    view_mode,
+    st.session_state.get("selected_dept"),
+    st.session_state.get("search_name"),
+    st.session_state.get("search_interest"),
+    st.session_state.get("search_college"),
+    page_size,
+)
+if st.session_state.get("results_query") != query_key:
+    st.session_state["results_query"] = query_key
+    st.session_state["results_limit"] = page_size
+
+
+def load_more():
+    st.session_state["results_limit"] += st.session_state["page_size"]
 
 email = None
 selected_prof_name = None
+bulk_clicked = False
 
 if view_mode == "📧 Email Generator":
     with st.sidebar:
@@ -284,29 +228,36 @@ if view_mode == "📧 Email Generator":
         else:
             selected_prof_name = st.selectbox(
                 "Choose a Professor",
-                options=[prof["name"] for prof in filtered],
+                options=[prof["name"] for prof in filtered[:MAX_PROFS_TO_SHOW]],
                 index=0
             )
 
-            if st.button("Generate Email"):
+            generate_clicked = st.button("Generate Email")
+            regenerate_clicked = st.button("🔄 Regenerate", help="Ask Gemini for a fresh draft instead of reusing the last one")
+            if generate_clicked or regenerate_clicked:
                 if not (student_name and student_background and student_academic_year and student_interest and (goal or intent_note)):
                     st.error("Please complete all required fields.")
                 else:
                     selected_prof = next((p for p in filtered if p["name"] == selected_prof_name), None)
                     if selected_prof:
                         final_goal = intent_note if use_ai_goal else goal
-                        email = draft_email(
-                            prof_name=selected_prof['name'],
-                            prof_interest=selected_prof.get('research_interests', ''),
-                            student_name=student_name,
-                            student_academic_year=student_academic_year,
-                            student_background=student_background,
-                            student_interest=student_interest,
-                            goal=final_goal,
-                            extra=extra_note
-                        )
                         with st.expander("📧 View Generated Email", expanded=True):
-                            st.markdown(email)
+                            email = st.write_stream(draft_email_stream(
+                                prof_name=selected_prof['name'],
+                                prof_interest=selected_prof.get('research_interests', ''),
+                                student_name=student_name,
+                                student_academic_year=student_academic_year,
+                                student_background=student_background,
+                                student_interest=student_interest,
+                                goal=final_goal,
+                                extra=extra_note,
+                                regenerate=regenerate_clicked
+                            )).strip()
+                        draft_stats = draft_cache_stats()
+                        st.caption(
+                            f"Draft cache: {draft_stats['hits']} hits, {draft_stats['misses']} misses "
+                            f"({draft_stats['hit_rate']:.0%})"
+                        )
 
                         prof_email = selected_prof.get('email', 'N/A')
                         subject = f"Inquiry from {student_name}"
@@ -333,70 +284,83 @@ if view_mode == "📧 Email Generator":
                             </a>
                         """, unsafe_allow_html=True)
 
+        if st.session_state.get("suggested_profs"):
+            bulk_clicked = st.button(f"✉️ Draft emails for all {len(st.session_state['suggested_profs'])} suggestions")
+
+
+if view_mode == "📧 Email Generator" and bulk_clicked:
+    if not (student_name and student_background and student_academic_year and student_interest and (goal or intent_note)):
+        st.error("Please complete all required fields.")
+    else:
+        shortlist = st.session_state["suggested_profs"]
+        st.markdown("## ✉️ Drafts for Suggested Professors")
+        progress = st.progress(0.0, text=f"Drafting 0 of {len(shortlist)}...")
+        drafts = {}
+        finished = 0
+        # drafts come back in completion order, so each one shows up as soon as it is ready
+        for prof, draft, error in draft_emails_bulk(
+            shortlist,
+            student_name=student_name,
+            student_academic_year=student_academic_year,
+            student_background=student_background,
+            student_interest=student_interest,
+            goal=intent_note if use_ai_goal else goal,
+            extra=extra_note,
+        ):
+            finished += 1
+            progress.progress(finished / len(shortlist), text=f"Drafted {finished} of {len(shortlist)}")
+            with st.expander(f"{'📧' if draft else '⚠️'} {prof['name']}"):
+                if draft:
+                    # keyed by id: two professors can share a name
+                    drafts[prof["prof_id"]] = (prof["name"], draft)
+                    st.markdown(f"To: `{prof.get('email', 'N/A')}`")
+                    st.markdown(draft)
+                else:
+                    st.error(f"Could not draft this email: {error}")
+        if drafts:
+            st.session_state["bulk_drafts"] = drafts
+
+if view_mode == "📧 Email Generator" and st.session_state.get("bulk_drafts"):
+    st.download_button(
+        "⬇️ Download all drafts (.zip)",
+        data=drafts_zip(st.session_state["bulk_drafts"]),
+        file_name="email_drafts.zip",
+        mime="application/zip",
+    )
+
 
 if show_filtered:
     if not filtered:
         st.warning("No matching faculty found.")
     else:
-        grouped = defaultdict(list)
-        for prof in filtered:
-            grouped[prof["department"]].append(prof)
-
-        for dept, profs in sorted(grouped.items()):
-            for prof in profs:
-                with st.container():
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f"###{prof.get('name', 'N/A')}")
-                        st.markdown(f"College: {prof.get('college_name', 'N/A')}")
-                        st.markdown(f"Designation:{prof.get('designation', 'N/A')}")
-                        st.markdown(f"Department:{prof.get('department', 'N/A')}")
-                        prof_email = prof.get('email', 'N/A')
-                        st.markdown(f"Email:`{prof_email}`")
-                        if prof.get("website"):
-                            st.markdown(f"[Website]({prof['website']})")
-
-                        research_raw = prof.get("research_interests") or ""
-                        interests = [s.strip(" ●,|") for s in re.split(r"[●•,|]", research_raw) if s.strip()]
-                        if interests:
-                            st.markdown("Research Interests:")
-                            for i in interests:
-                                st.markdown(f"- {i}")
-                        else:
-                            st.markdown("Research Interests: N/A")
-
-                        st.markdown(f"Academic Background: {prof.get('academic_background', 'N/A')}")
-                        st.markdown(f"Work Experience: {prof.get('work_experience', 'N/A')}")
-
-                        if prof.get("selected_publications"):
-                            with st.expander("Selected Publications"):
-                                pubs = prof["selected_publications"]
-                                if isinstance(pubs, list):
-                                    for pub in pubs:
-                                        st.markdown(f"- {pub}")
-                                else:
-                                    st.markdown(pubs)
-
-                        st.markdown(f"[🔗 Profile Link]({prof.get('profile_url', '#')})")
-
-                        if view_mode == "📧 Email Generator" and prof["name"] == selected_prof_name and email:
-                            subject = f"Inquiry from {student_name}"
-                            safe_body = email if len(email) < 1800 else email[:1800] + "\n\n[Trimmed for URL]"
-                            encoded_subject = urllib.parse.quote(subject)
-                            encoded_body = urllib.parse.quote(safe_body)
-
-                            mailto_link = f"mailto:{prof_email}?subject={encoded_subject}&body={encoded_body}"
-                            gmail_link = f"https://mail.google.com/mail/?view=cm&fs=1&to={prof_email}&su={encoded_subject}&body={encoded_body}"
-
-                            st.markdown(f"""
-                                <a href="{mailto_link}">
-                                    <button style='margin:5px;'>📨 Open in Mail App</button>
-                                </a>
-                                <a href="{gmail_link}" target="_blank">
-                                    <button style='margin:5px;'>📬 Open in Gmail</button>
-                                </a>
-                            """, unsafe_allow_html=True)
-                    with col2:
-                        if prof.get("photo"):
-                            image_url = proxy_image_url(prof.get("photo", ""))
-                            st.image(image_url, use_container_width=True)
+        # stable sort keeps the old grouped-by-department order
+        ordered = sorted(filtered, key=lambda p: p["department"])
+        visible = ordered[:st.session_state["results_limit"]]
+        next_page = ordered[len(visible):len(visible) + page_size]
+        load_thumbnail_cache().prefetch(p.get("photo") for p in visible + next_page)
+
+        for prof in visible:
+            extra_html = None
+            if view_mode == "📧 Email Generator" and prof["name"] == selected_prof_name and email:
+                prof_email = prof.get('email', 'N/A')
+                subject = f"Inquiry from {student_name}"
+                safe_body = email if len(email) < 1800 else email[:1800] + "\n\n[Trimmed for URL]"
+                encoded_subject = urllib.parse.quote(subject)
+                encoded_body = urllib.parse.quote(safe_body)
+
+                mailto_link = f"mailto:{prof_email}?subject={encoded_subject}&body={encoded_body}"
+                gmail_link = f"https://mail.google.com/mail/?view=cm&fs=1&to={prof_email}&su={encoded_subject}&body={encoded_body}"
+
+                extra_html = f"""
+                    <a href="{mailto_link}">
+                        <button style='margin:5px;'>📨 Open in Mail App</button>
+                    </a>
+                    <a href="{gmail_link}" target="_blank">
+                        <button style='margin:5px;'>📬 Open in Gmail</button>
+                    </a>
+                """
+            render_card(prof, extra_html)
+
+        st.caption(f"Showing {len(visible)} of {len(ordered)} professors")
+        if len(visible) < len(ordered):
+            st.button("Load more", on_click=load_more)
@@ -0,0 +1,154 @@
+"""Recommend professors for a whole cohort of students in one run.
+
+    cd iitgn_faculty && python batch_recommend.py students.csv -o recommendations.jsonl [--top-k 10]
+
+Input is a CSV or JSONL of student profiles. The query for each student is
+its `query` field if present, otherwise `background` and `interests`
+joined, the same text the app builds. Queries are embedded in batched,
+rate-limited requests, scored against the whole corpus with one
+matrix-matrix product per chunk, and written out as one JSON line per
+student while the run is still going.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from embedding_builder import EmbeddingBuilder
+from recommender import EMBEDDING_MODEL_NAME, FIELD_WEIGHTS, Recommender
+from vector_store import normalize_rows
+
+QUERY_FIELDS = ("background", "interests")
+ID_FIELDS = ("id", "student_id", "email", "name")
+RESULT_FIELDS = ("prof_id", "name", "designation", "department", "college_name", "email", "profile_url")
+CHUNK_SIZE = 500
+
+
+def read_students(path):
+    """Yield one dict per student from a .csv or .jsonl file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def student_query(student: dict, query_fields=QUERY_FIELDS) -> str:
+    if student.get("query"):
+        return str(student["query"]).strip()
+    return " ".join(str(student[field]).strip() for field in query_fields if student.get(field))
+
+
+def student_id(student: dict, row: int):
+    for field in ID_FIELDS:
+        if student.get(field):
+            return student[field]
+    return row
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def batch_recommend(students, top_k=10, recommender=None, chunk_size=CHUNK_SIZE, query_fields=QUERY_FIELDS):
+    """Yield {"student", "query", "results"} per student, in input order.
+
+    Uses the NumPy index (built from Chroma on first use) so a chunk of
+    queries is scored with a single matrix product, then reduced to the best
+    chunk per professor.
+    """
+    recommender = recommender or Recommender(backend="numpy")
+    recommender.ensure_loaded()
+    store = recommender.numpy_store
+    if store is None or store.matrix is None:
+        raise RuntimeError("No NumPy index available; run the recommender once to build it")
+
+    matrix = np.asarray(store.matrix, dtype=np.float32)
+    weights = store.chunk_weights(FIELD_WEIGHTS)
+    group_ids = store.groups()[0]
+    rows = np.array([recommender.row_by_id.get(prof_id, -1) for prof_id in group_ids])
+    k = min(top_k, len(group_ids))
+    embed = recommender.embedding_model
+    embed_queries = getattr(embed, "embed_queries", None) or (lambda texts: [embed.embed_query(t) for t in texts])
+    builder = EmbeddingBuilder(embed_queries, EMBEDDING_MODEL_NAME, checkpoint_path=None)
+
+    offset = 0
+    for chunk in _chunks(students, chunk_size):
+        queries = [student_query(student, query_fields) for student in chunk]
+        present = [i for i, query in enumerate(queries) if query]
+        top, scores = [], None
+        if present and k:
+            vectors = normalize_rows(builder.embed_documents([queries[i] for i in present]))
+            _, scores = store.group_scores(vectors @ matrix.T, weights)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+
+        ranked = dict(zip(present, range(len(present))))
+        for i, (student, query) in enumerate(zip(chunk, queries)):
+            results = []
+            if i in ranked:
+                q = ranked[i]
+                for col in top[q]:
+                    if rows[col] < 0:
+                        continue
+                    prof = recommender.records[rows[col]]
+                    results.append({**{field: prof.get(field) for field in RESULT_FIELDS},
+                                    "score": round(float(scores[q, col]), 6)})
+            yield {"student": student_id(student, offset + i), "query": query, "results": results}
+        offset += len(chunk)
+
+
+def write_jsonl(results, out):
+    count = 0
+    for result in results:
+        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        count += 1
+        if count % CHUNK_SIZE == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="students .csv or .jsonl")
+    parser.add_argument("-o", "--output", help="JSONL output path (default: stdout)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--query-fields", default=",".join(QUERY_FIELDS),
+                        help="columns joined into the query when there is no `query` column")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = batch_recommend(read_students(args.input), args.top_k, chunk_size=args.chunk_size,
+                              query_fields=tuple(args.query_fields.split(",")))
+    # stdout carries only result records; progress and warnings printed while loading go to stderr
+    records = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as out:
+                count = write_jsonl(results, out)
+        else:
+            count = write_jsonl(results, records)
+    elapsed = time.perf_counter() - start
+    print(f"Recommended for {count} students in {elapsed:.1f}s ({count / elapsed * 60:.0f}/min)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Recall vs latency of the ANN indexes against exact search on synthetic vectors.
+
+    cd iitgn_faculty && python -m benchmarks.ann_sweep [--sizes 50000 500000] [--dim 256] [--kinds hnsw ivf]
+
+Vectors are a normalized Gaussian mixture (clustered like real embeddings,
+not uniform noise); queries are held-out points from the same mixture.
+For each size every index is built once per build setting (HNSW M, IVF
+nlist) and then swept over its search knob (ef_search, nprobe).
+"""
+import argparse
+import json
+
+import numpy as np
+
+from ann_index import ANN_KINDS
+from benchmarks.common import percentiles, rss_mb, timed
+from vector_store import normalize_rows
+
+SWEEPS = {
+    "hnsw": {"build": [{"M": 16, "ef_construction": 200}, {"M": 32, "ef_construction": 200}],
+             "search": ("ef_search", [16, 32, 64, 128, 256])},
+    "ivf": {"build": [{"nlist": 0}],
+            "search": ("nprobe", [1, 2, 4, 8, 16, 32, 64])},
+}
+
+
+def synthetic(n, dim, n_queries, clusters=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n + n_queries)
+    points = np.empty((n + n_queries, dim), dtype=np.float32)
+    for start in range(0, len(points), 100_000):
+        chunk = labels[start:start + 100_000]
+        points[start:start + len(chunk)] = centers[chunk] + rng.normal(scale=1.5, size=(len(chunk), dim))
+    points = normalize_rows(points)
+    return points[:n], points[n:]
+
+
+def exact_top_k(vectors, queries, k, batch=64):
+    truth = []
+    for start in range(0, len(queries), batch):
+        scores = queries[start:start + batch] @ vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth.extend(set(row) for row in top)
+    return truth
+
+
+def _measure(search, queries, truth, k):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        (rows, _), ms = timed(search, query, k)
+        latencies.append(ms)
+        recalls.append(len(expected & set(rows[0].tolist())) / k)
+    return {"recall_at_k": float(np.mean(recalls)), "latency_ms": {"mean": float(np.mean(latencies)),
+                                                                  **percentiles(latencies)}}
+
+
+def run(size, dim=256, n_queries=200, k=10, kinds=("hnsw", "ivf")) -> dict:
+    vectors, queries = synthetic(size, dim, n_queries)
+    truth = exact_top_k(vectors, queries, k)
+
+    def brute(query, k):
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[None, :], scores[top][None, :]
+
+    report = {"size": size, "dim": dim, "queries": n_queries, "k": k,
+              "exact": _measure(brute, queries, truth, k), "indexes": []}
+    for kind in kinds:
+        for build in SWEEPS[kind]["build"]:
+            rss_before = rss_mb()
+            index, build_ms = timed(ANN_KINDS[kind](**build).build, vectors)
+            entry = {"kind": kind, "build": dict(index.params), "build_ms": build_ms,
+                     "rss_mb": rss_mb() - rss_before, "sweep": []}
+            knob, values = SWEEPS[kind]["search"]
+            for value in values:
+                index.set_search_params(value)
+                entry["sweep"].append({knob: value, **_measure(index.search, queries, truth, k)})
+            report["indexes"].append(entry)
+            del index
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 500_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", choices=sorted(ANN_KINDS), default=sorted(ANN_KINDS))
+    parser.add_argument("--json", help="also write the reports to this path")
+    args = parser.parse_args()
+
+    reports = []
+    for size in args.sizes:
+        report = run(size, args.dim, args.queries, args.k, args.kinds)
+        reports.append(report)
+        exact = report["exact"]["latency_ms"]
+        print(f"\n{size} x {args.dim}, k={args.k}: exact p50={exact['p50']:.2f}ms p95={exact['p95']:.2f}ms")
+        for entry in report["indexes"]:
+            print(f"{entry['kind']} {entry['build']}  build={entry['build_ms'] / 1000:.1f}s rss=+{entry['rss_mb']:.0f}MB")
+            for point in entry["sweep"]:
+                knob = next(iter(point))
+                latency = point["latency_ms"]
+                print(f"  {knob}={point[knob]:<4} recall@k={point['recall_at_k']:.3f}  "
+                      f"p50={latency['p50']:.3f}ms p95={latency['p95']:.3f}ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
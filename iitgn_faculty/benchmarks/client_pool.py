@@ -0,0 +1,71 @@
+"""Latency of building Google API clients per call vs through the client pool.
+
+    cd iitgn_faculty && python -m benchmarks.client_pool [--rounds 50]
+
+Uses a throwaway token file with a far-off expiry, so nothing touches the
+network: each round loads credentials and builds the gmail, sheets and
+script services, the way send_email / log_email_to_sheet /
+attach_apps_script each used to.
+"""
+import argparse
+import datetime
+import json
+import tempfile
+
+from benchmarks.common import percentiles, timed
+from client_pool import ClientPool, token_path
+
+APIS = (("gmail", "v1"), ("sheets", "v4"), ("script", "v1"))
+USER = "student@example.com"
+
+
+def _write_token(token_dir):
+    expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    with open(token_path(USER, token_dir), "w") as f:
+        json.dump({"token": "fake", "refresh_token": "fake", "client_id": "fake", "client_secret": "fake",
+                   "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ")}, f)
+
+
+def run(rounds=50) -> dict:
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    with tempfile.TemporaryDirectory() as token_dir:
+        _write_token(token_dir)
+
+        def per_call():
+            creds = Credentials.from_authorized_user_file(token_path(USER, token_dir))
+            for api, version in APIS:
+                build(api, version, credentials=creds)
+
+        pool = ClientPool(token_dir=token_dir)
+
+        def pooled():
+            for api, version in APIS:
+                pool.service(USER, api, version)
+
+        report = {"rounds": rounds}
+        for name, fn in (("per_call", per_call), ("pooled", pooled)):
+            samples = [timed(fn)[1] for _ in range(rounds)]
+            report[name] = {"total_ms": sum(samples), "first_ms": samples[0], **percentiles(samples)}
+        report["pool_stats"] = pool.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    report = run(args.rounds)
+    for name in ("per_call", "pooled"):
+        stats = report[name]
+        print(f"{name:<9} {report['rounds']} rounds: total={stats['total_ms']:.1f}ms first={stats['first_ms']:.2f}ms "
+              f"p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms")
+    for component, stats in report["pool_stats"].items():
+        print(f"  {component:<12} hits={stats['hits']:<5} misses={stats['misses']:<3} "
+              f"miss={stats['miss_ms']:.2f}ms saved={stats['saved_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
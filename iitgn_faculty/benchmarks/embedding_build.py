@@ -0,0 +1,53 @@
+"""Exercise EmbeddingBuilder against the local fake embedding model.
+
+    cd iitgn_faculty && python -m benchmarks.embedding_build [--latency 0.2] [--workers 4]
+
+Embeds the real research-interest texts twice: first with a fake quota that
+runs out halfway (the build fails), then again to show it resumes from the
+checkpoint and only embeds what is missing. Reports docs/s for both runs.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import timed
+from benchmarks.fake_embeddings import HashingEmbeddings
+from corpus import load_columns
+from embedding_builder import EmbeddingBuilder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake API call")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=6000)
+    args = parser.parse_args()
+
+    texts = sorted(set(t for t in load_columns()["research_interests"] if t))
+    batches = -(-len(texts) // args.batch_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.sqlite3")
+
+        def builder(fake):
+            return EmbeddingBuilder(fake.embed_documents, "fake", args.batch_size, args.workers, args.rpm,
+                                    max_retries=1, base_delay=0.01, checkpoint_path=checkpoint)
+
+        first = builder(HashingEmbeddings(latency=args.latency, fail_after=batches // 2))
+        try:
+            first.embed_documents(texts)
+        except RuntimeError as e:
+            print(f"run 1 failed as intended: {e}")
+        print(f"run 1: {first.last_stats}")
+
+        second = builder(HashingEmbeddings(latency=args.latency))
+        vectors, ms = timed(second.embed_documents, texts)
+        print(f"run 2: {second.last_stats}")
+        assert len(vectors) == len(texts)
+        assert second.last_stats["resumed"] > 0, "nothing was resumed from the checkpoint"
+        print(f"{len(texts)} texts ready in {ms / 1000:.2f}s after resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+class QuotaExceeded(RuntimeError):
+    """Shaped like google.api_core's ResourceExhausted: the HTTP status is .code."""
+
+    code = 429
+
+
+class HashingEmbeddings:
+    """Deterministic, offline stand-in for GoogleGenerativeAIEmbeddings.
+
+    Tokens are hashed into `dim` signed buckets, so texts sharing words get
+    similar vectors. `latency` (seconds per call) and `fail_after` (calls that
+    succeed before every further call raises) simulate a remote API.
+    """
+
+    def __init__(self, dim=256, latency=0.0, fail_after=None):
+        self.dim = dim
+        self.latency = latency
+        self.fail_after = fail_after
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN.findall((text or "").lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_after is not None and calls > self.fail_after:
+            raise QuotaExceeded("429 Resource has been exhausted (fake quota)")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,199 @@
+import base64
+import email
+import itertools
+import random
+import threading
+import time
+
+_counter_lock = threading.Lock()
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient's HttpError: the status code lives on .resp.status."""
+
+    def __init__(self, status, message=""):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class _Request:
+    def __init__(self, service, fn):
+        self._service = service
+        self._fn = fn
+
+    def execute(self):
+        with _counter_lock:
+            self._service.http_requests += 1
+        return self._fn()
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        with _counter_lock:
+            self._service.http_requests += 1
+        for request_id, request in self._requests:
+            try:
+                response, exception = request._fn(), None
+            except Exception as e:
+                response, exception = None, e
+            self._callback(request_id, response, exception)
+
+
+class FakeGmail:
+    """In-memory mailbox answering the Gmail calls reply_tracker makes.
+
+    send() and reply() add messages and history records; after
+    expire_history() older startHistoryIds answer 404 as they do in Gmail
+    after about a week. messages().send takes `send_latency` seconds and
+    fails with a 503 for a `send_failure_rate` fraction of calls.
+    `http_requests` counts round trips (a batch counts once).
+    """
+
+    def __init__(self, email="student@example.com", send_latency=0.0, send_failure_rate=0.0, seed=0):
+        self.email = email
+        self.send_latency = send_latency
+        self.send_failure_rate = send_failure_rate
+        self.sent = []  # (to, subject, thread_id)
+        self._rng = random.Random(seed)
+        self.http_requests = 0
+        self.mailbox = {}
+        self.history_log = []  # (history_id, message)
+        self._ids = itertools.count(1)
+        self._history_id = 1000
+        self._oldest_history_id = 0
+        self._lock = threading.Lock()
+
+    def _add(self, thread_id, labels):
+        with self._lock:
+            message = {"id": f"m{next(self._ids)}", "threadId": thread_id, "labelIds": labels,
+                       "internalDate": str(int(time.time() * 1000))}
+            self.mailbox.setdefault(thread_id, []).append(message)
+            self._history_id += 1
+            self.history_log.append((self._history_id, message))
+            return message
+
+    def send(self, thread_id=None):
+        thread_id = thread_id or f"t{next(self._ids)}"
+        return self._add(thread_id, ["SENT"])["threadId"]
+
+    def messages_send(self, body):
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        with self._lock:
+            failed = self._rng.random() < self.send_failure_rate
+        if failed:
+            raise FakeHttpError(503, "backend error")
+        raw = base64.urlsafe_b64decode(body["raw"].encode())
+        message = email.message_from_bytes(raw)
+        thread_id = self.send(body.get("threadId"))
+        with self._lock:
+            self.sent.append((message["to"], message["subject"], thread_id))
+        return {"id": self.mailbox[thread_id][-1]["id"], "threadId": thread_id}
+
+    def reply(self, thread_id):
+        return self._add(thread_id, ["INBOX", "UNREAD"])
+
+    def expire_history(self):
+        self._oldest_history_id = self._history_id
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return _Request(self, lambda: {"emailAddress": self.email, "historyId": str(self._history_id)})
+
+    def threads_get(self, thread_id):
+        if thread_id not in self.mailbox:
+            raise FakeHttpError(404, "thread not found")
+        return {"id": thread_id, "messages": [dict(m) for m in self.mailbox[thread_id]]}
+
+    def _history_page(self, start, page_token, page_size):
+        start = int(start)
+        if start < self._oldest_history_id:
+            raise FakeHttpError(404, "startHistoryId too old")
+        records = [(hid, m) for hid, m in self.history_log if hid > start]
+        offset = int(page_token or 0)
+        page = records[offset:offset + page_size]
+        response = {"historyId": str(self._history_id),
+                    "history": [{"id": str(hid), "messagesAdded": [{"message": dict(m)}]} for hid, m in page]}
+        if offset + page_size < len(records):
+            response["nextPageToken"] = str(offset + page_size)
+        return response
+
+    class _Threads:
+        def __init__(self, gmail):
+            self._gmail = gmail
+
+        def get(self, userId, id, **kwargs):
+            return _Request(self._gmail, lambda: self._gmail.threads_get(id))
+
+    class _Messages:
+        def __init__(self, gmail):
+            self._gmail = gmail
+
+        def send(self, userId, body):
+            return _Request(self._gmail, lambda: self._gmail.messages_send(body))
+
+    class _History:
+        def __init__(self, gmail):
+            self._gmail = gmail
+
+        def list(self, userId, startHistoryId, pageToken=None, maxResults=100, **kwargs):
+            return _Request(self._gmail, lambda: self._gmail._history_page(startHistoryId, pageToken, maxResults))
+
+    def threads(self):
+        return self._Threads(self)
+
+    def history(self):
+        return self._History(self)
+
+    def messages(self):
+        return self._Messages(self)
+
+
+class FakeSheets:
+    """Records created sheets, appended rows and batchUpdate cells per spreadsheet; `http_requests` counts calls."""
+
+    def __init__(self):
+        self.http_requests = 0
+        self.cells = {}
+        self.rows = {}  # spreadsheet id -> appended rows
+
+    def create(self, body):
+        def apply():
+            spreadsheet_id = f"sheet{len(self.rows)}"
+            self.rows[spreadsheet_id] = []
+            return {"spreadsheetId": spreadsheet_id}
+        return _Request(self, apply)
+
+    def append(self, spreadsheetId, range, valueInputOption, body, insertDataOption=None):
+        def apply():
+            rows = self.rows.setdefault(spreadsheetId, [])
+            first = len(rows) + 1
+            rows.extend(body["values"])
+            return {"updates": {"updatedRange": f"Sheet1!A{first}:H{len(rows)}"}}
+        return _Request(self, apply)
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        def apply():
+            for update in body["data"]:
+                self.cells[(spreadsheetId, update["range"])] = update["values"][0][0]
+            return {"totalUpdatedCells": len(body["data"])}
+        return _Request(self, apply)
@@ -0,0 +1,85 @@
+"""Measure what app.py pays at import time before the first Streamlit frame.
+
+    cd iitgn_faculty && python -m benchmarks.import_budget [--budget-ms 50]
+
+The modules are the ones app.py imports at top level. streamlit itself is
+imported first and excluded, so the number reported is the cost of the app's
+own modules and the third-party packages they pull in. Exits non-zero when over budget.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 50.0
+
+
+def app_modules(path=os.path.join(BASE_DIR, "app.py")) -> list[str]:
+    """The modules app.py imports at top level, in order, streamlit itself left out."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name.split(".")[0] != "streamlit" and name not in modules]
+    return modules
+
+
+APP_MODULES = app_modules()
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, float, float]]:
+    """Return (module, depth, self_ms, cumulative_ms) rows from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure(modules=APP_MODULES) -> list[tuple[str, int, float, float]]:
+    code = "import streamlit\n" + "".join(f"import {m}\n" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = parse_importtime(proc.stderr)
+    # everything streamlit pulls in is logged before the app modules
+    start = max(i for i, row in enumerate(rows) if row[0] == "streamlit" and row[1] == 0) + 1
+    return rows[start:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure()
+    total = sum(cumulative for _, depth, _, cumulative in rows if depth == 0)
+
+    print(f"{'module':<50} {'self ms':>9} {'cum ms':>9}")
+    for name, depth, self_ms, cumulative in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:<50} {self_ms:>9.1f} {cumulative:>9.1f}")
+    print(f"\napp modules import in {total:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if total > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Build and query latency of the in-process BM25 index.
+
+    cd iitgn_faculty && python -m benchmarks.lexical_search [--queries 500] [--k 10]
+
+Queries are research-interest phrases sampled from the corpus plus a few
+exact acronyms; no network is involved. The target is p95 under 5 ms.
+"""
+import argparse
+import json
+import random
+
+import numpy as np
+
+from benchmarks.common import percentiles, rss_mb, timed
+from cards import split_interests
+from lexical_index import LexicalIndex
+from recommender import Recommender
+
+FIXED_QUERIES = ["O-RAN", "URLLC", "graph neural networks", "power electronics", "computational fluid dynamics"]
+TARGET_P95_MS = 5.0
+
+
+def run(n_queries=500, k=10, seed=0) -> dict:
+    df = Recommender()._build_frame()
+    records = df.to_dict(orient="records")
+
+    rss_before = rss_mb()
+    index, build_ms = timed(LexicalIndex, records, df["prof_id"])
+    rss_index = rss_mb() - rss_before
+
+    phrases = [p for prof in records for p in split_interests(prof.get("research_interests")) if len(p) > 3]
+    rng = random.Random(seed)
+    queries = FIXED_QUERIES + rng.sample(phrases, min(n_queries, len(phrases)))
+
+    latencies, empty = [], 0
+    for query in queries:
+        hits, ms = timed(index.search, query, k)
+        latencies.append(ms)
+        empty += not hits
+    return {
+        "documents": len(index),
+        "terms": len(index.postings),
+        "queries": len(queries),
+        "k": k,
+        "build_ms": build_ms,
+        "rss_mb": rss_index,
+        "empty_results": empty,
+        "latency_ms": {"mean": float(np.mean(latencies)), **percentiles(latencies)},
+        "examples": {q: [prof_id for prof_id, _ in index.search(q, 3)] for q in FIXED_QUERIES[:2]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    report = run(args.queries, args.k)
+    latency = report["latency_ms"]
+    print(
+        f"{report['documents']} docs, {report['terms']} terms, built in {report['build_ms']:.0f}ms "
+        f"(+{report['rss_mb']:.1f}MB)"
+    )
+    print(
+        f"{report['queries']} queries, k={report['k']}: mean={latency['mean']:.3f}ms p50={latency['p50']:.3f}ms "
+        f"p95={latency['p95']:.3f}ms p99={latency['p99']:.3f}ms "
+        f"[{'ok' if latency['p95'] < TARGET_P95_MS else 'over'} vs {TARGET_P95_MS}ms target]"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
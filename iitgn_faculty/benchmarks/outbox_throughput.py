@@ -0,0 +1,85 @@
+"""Unattended outbox throughput against a fake Gmail with latency and transient failures.
+
+    cd iitgn_faculty && python -m benchmarks.outbox_throughput [--messages 200] [--rate 600] [--failures 0.1]
+
+Queues a campaign that is due now, drains it with run_once (rescheduled
+retries are pulled forward so the run finishes), then replies to some
+threads and fast-forwards to the follow-up date to check that only the
+unanswered threads get a follow-up.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_gmail import FakeGmail
+from outbox import Outbox
+
+
+def run(n_messages=200, rate_per_minute=600, workers=4, failure_rate=0.1, latency=0.05, seed=0) -> dict:
+    gmail = FakeGmail(send_latency=latency, send_failure_rate=failure_rate, seed=seed)
+    builds = []
+
+    def service_factory(user_email):
+        builds.append(user_email)
+        return gmail
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replied = set()
+        outbox = Outbox(service_factory, path=os.path.join(tmp, "outbox.sqlite3"), workers=workers,
+                        rate_per_minute=rate_per_minute, daily_limit=n_messages * 2, retry_base=0.01,
+                        replied_threads=lambda user_email, thread_ids: [t for t in thread_ids if t in replied])
+        for i in range(n_messages):
+            outbox.enqueue("student@example.com", f"prof{i}@example.com", "Research internship", "Dear Prof,",
+                           send_at=time.time(), student_name="Student", prof_name=f"Prof {i}")
+
+        start = time.perf_counter()
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        while _queued_originals(outbox):
+            for key, value in outbox.run_once(now=_next_original_due(outbox)).items():
+                counts[key] += value
+        elapsed = time.perf_counter() - start
+
+        sent = outbox.messages("sent")
+        for message in sent[::2]:
+            replied.add(message["thread_id"])
+            gmail.reply(message["thread_id"])
+        followup_counts = outbox.run_once(now=time.time() + 30 * 86400)
+        stats = outbox.stats()
+    return {
+        "messages": n_messages, "workers": workers, "rate_per_minute": rate_per_minute,
+        "failure_rate": failure_rate, "latency_ms": latency * 1000,
+        "elapsed_s": elapsed, "throughput_per_min": len(sent) / elapsed * 60,
+        "send_attempts": counts, "service_builds": len(builds), "followups": followup_counts, "final": stats,
+    }
+
+
+def _queued_originals(outbox):
+    return sum(1 for m in outbox.messages("queued") if not m["followup_of"])
+
+
+def _next_original_due(outbox):
+    # retries are rescheduled a little into the future; follow-ups stay in the future
+    pending = [m["send_at"] for m in outbox.messages("queued") if not m["followup_of"]]
+    return max([time.time(), *pending])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=600, help="sends per minute per user")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--failures", type=float, default=0.1, help="fraction of sends failing with a 503")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per send")
+    args = parser.parse_args()
+
+    report = run(args.messages, args.rate, args.workers, args.failures, args.latency)
+    print(f"{report['messages']} messages, {report['workers']} workers, limit {report['rate_per_minute']:.0f}/min, "
+          f"{report['failure_rate']:.0%} transient failures, {report['latency_ms']:.0f}ms per send")
+    print(f"sent in {report['elapsed_s']:.1f}s = {report['throughput_per_min']:.0f}/min; attempts {report['send_attempts']}; "
+          f"{report['service_builds']} Gmail service builds")
+    print(f"follow-ups: {report['followups']}; final {report['final']}")
+
+
+if __name__ == "__main__":
+    main()
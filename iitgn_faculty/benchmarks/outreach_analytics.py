@@ -0,0 +1,126 @@
+"""Latency of reply analytics as the outreach history grows.
+
+    cd iitgn_faculty && python -m benchmarks.outreach_analytics [--rows 50000] [--students 200]
+
+Builds a synthetic history of sheet rows, imports it, then measures the
+incremental paths the app uses: appending a flushed batch of rows,
+applying a round of replies, and answering suggestions/heatmaps from the
+cached aggregates. The old per-call path (DataFrame from the whole sheet,
+then the mode of replied rows) is timed for comparison. Finally the
+incrementally maintained aggregates are checked against a full recompute.
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+
+import pandas as pd
+
+from benchmarks.common import percentiles, timed
+from outreach_analytics import OutreachAnalytics, aggregate
+from sheet_writer import SHEET_HEADER
+
+COLLEGE_EMAILS = ["iitgn.ac.in", "iitb.ac.in", "iitd.ac.in", "iitk.ac.in", "iitm.ac.in"]
+
+
+def synthetic_rows(n, students, seed=0, start=None):
+    rng = random.Random(seed)
+    start = start or datetime.datetime(2025, 1, 1)
+    rows = []
+    for i in range(n):
+        sent = start + datetime.timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        # weekday mornings get more replies, so there is a signal to find
+        rate = 0.35 if sent.weekday() < 5 and 9 <= sent.hour < 12 else 0.1
+        rows.append([sent.strftime("%Y-%m-%d %H:%M:%S"), f"student{rng.randrange(students)}", f"Prof {i % 3000}",
+                     f"prof{i % 3000}@{COLLEGE_EMAILS[i % len(COLLEGE_EMAILS)]}", "Research", "...",
+                     "Replied" if rng.random() < rate else "Awaiting Reply", f"t{seed}-{i}"])
+    return rows
+
+
+class _Tracker:
+    def __init__(self, replies):
+        self.replies = replies
+
+    def replies_since(self, since):
+        return [r for r in self.replies if r[2] > since]
+
+
+def _labelled(aggregates):
+    """Non-zero counters keyed by names rather than codes, which differ between build orders."""
+    students = {code: name for name, code in aggregates.students.items()}
+    labelled = {}
+    for name, vocabulary in (("slots", None), ("by_college", aggregates.colleges),
+                             ("by_department", aggregates.departments), ("reply_hours", None)):
+        labels = {code: label for label, code in vocabulary.items()} if vocabulary else {}
+        counts = getattr(aggregates, name)
+        for index in zip(*counts.nonzero()):
+            key = (name, students[index[0]], labels.get(index[1], index[1]), *index[2:])
+            labelled[key] = int(counts[index])
+    return labelled
+
+
+def _old_suggestion(rows):
+    df = pd.DataFrame(rows, columns=SHEET_HEADER)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    df = df[df["Reply Status"] == "Replied"]
+    return df["Timestamp"].dt.dayofweek.mode()[0], df["Timestamp"].dt.hour.mode()[0]
+
+
+def run(n_rows=50_000, students=200, batches=20) -> dict:
+    rows = synthetic_rows(n_rows, students)
+    report = {"rows": n_rows, "students": students}
+    with tempfile.TemporaryDirectory() as tmp:
+        analytics = OutreachAnalytics(path=tmp)
+        _, report["import_ms"] = timed(analytics.ingest_rows, rows)
+
+        append_ms = []
+        for b in range(batches):
+            batch = synthetic_rows(25, students, seed=b + 1, start=datetime.datetime(2026, 1, 1))
+            append_ms.append(timed(analytics.ingest_rows, batch)[1])
+        report["append_25_ms"] = percentiles(append_ms)
+
+        awaiting = analytics.history.loc[~analytics.history["replied"], "thread_id"].head(500).tolist()
+        now = datetime.datetime(2026, 6, 1).timestamp()
+        tracker = _Tracker([(t, now, 1.0) for t in awaiting])
+        _, report["replies_500_ms"] = timed(analytics.record_replies, tracker)
+
+        analytics._history = analytics._totals = None  # as after a restart: aggregates come from disk
+        _, report["reload_ms"] = timed(analytics.is_imported, "student0")
+        report["suggest_ms"] = percentiles([timed(analytics.suggest_best_time, f"student{i}")[1] for i in range(50)])
+        report["heatmap_all_ms"] = timed(analytics.heatmap)[1]
+        report["rates_ms"] = timed(analytics.response_rates, "department")[1]
+        report["time_to_reply_ms"] = timed(analytics.time_to_reply)[1]
+        report["suggestion"] = analytics.suggest_best_time()
+
+        student_rows = [row for row in rows if row[1] == "student0"]
+        report["old_per_student_ms"] = timed(_old_suggestion, student_rows)[1]
+        report["old_all_ms"] = timed(_old_suggestion, rows)[1]
+
+        full, report["full_recompute_ms"] = timed(aggregate, analytics.history)
+        report["aggregates_match"] = _labelled(full) == _labelled(analytics._totals)
+        report["parquet_mb"] = sum(os.path.getsize(os.path.join(tmp, name)) for name in analytics._parts()) / 2 ** 20
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--students", type=int, default=200)
+    args = parser.parse_args()
+
+    report = run(args.rows, args.students)
+    print(f"{report['rows']} rows, {report['students']} students, parquet {report['parquet_mb']:.1f}MB")
+    print(f"import {report['import_ms']:.0f}ms; append 25 rows p50={report['append_25_ms']['p50']:.1f}ms "
+          f"p95={report['append_25_ms']['p95']:.1f}ms; 500 replies {report['replies_500_ms']:.1f}ms; "
+          f"reload {report['reload_ms']:.1f}ms")
+    print(f"suggest p50={report['suggest_ms']['p50']:.2f}ms p95={report['suggest_ms']['p95']:.2f}ms; "
+          f"heatmap {report['heatmap_all_ms']:.2f}ms; department rates {report['rates_ms']:.2f}ms; "
+          f"time to reply {report['time_to_reply_ms']:.2f}ms")
+    print(f"old path: one student {report['old_per_student_ms']:.1f}ms, everyone {report['old_all_ms']:.1f}ms "
+          f"(plus the sheet download); full recompute {report['full_recompute_ms']:.1f}ms")
+    print(f"{report['suggestion']}; incremental aggregates match full recompute: {report['aggregates_match']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""API round trips and latency of reply-status syncing against a fake mailbox.
+
+    cd iitgn_faculty && python -m benchmarks.reply_sync [--threads 1000] [--replied 0.1]
+
+Compares the old Apps Script approach (one getThreadById per awaiting
+row) with ReplyTracker: a batched baseline on first sync, then incremental
+history syncs, and the sheet cells pushed back per spreadsheet.
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.common import timed
+from benchmarks.fake_gmail import FakeGmail, FakeSheets
+from reply_tracker import REPLIED, ReplyTracker
+
+
+def run(n_threads=1000, replied=0.1, sheets=5, seed=0) -> dict:
+    rng = random.Random(seed)
+    gmail, sheets_service = FakeGmail(), FakeSheets()
+    report = {"threads": n_threads, "per_thread_lookups": n_threads}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracker = ReplyTracker(gmail, sheets_service, path=os.path.join(tmp, "replies.sqlite3"))
+        thread_ids = []
+        for i in range(n_threads):
+            thread_id = gmail.send()
+            thread_ids.append(thread_id)
+            tracker.track(thread_id, f"sheet{i % sheets}", row=i // sheets + 2)
+
+        def measure(name):
+            gmail.http_requests = sheets_service.http_requests = 0
+            changed, sync_ms = timed(tracker.sync)
+            pushed, push_ms = timed(tracker.push_changes)
+            report[name] = {"replied": changed, "pushed": pushed, "gmail_requests": gmail.http_requests,
+                            "sheets_requests": sheets_service.http_requests, "sync_ms": sync_ms, "push_ms": push_ms}
+
+        for thread_id in rng.sample(thread_ids, int(n_threads * replied)):
+            gmail.reply(thread_id)
+        measure("baseline")
+
+        for thread_id in rng.sample(thread_ids, int(n_threads * replied)):
+            gmail.reply(thread_id)
+        measure("incremental")
+        measure("idle")
+
+        for thread_id in rng.sample(thread_ids, int(n_threads * replied)):
+            gmail.reply(thread_id)
+        gmail.expire_history()
+        measure("expired_history")
+
+        replied_threads = {t for t, messages in gmail.mailbox.items() if len(messages) > 1}
+        statuses = tracker.statuses()
+        report["mismatches"] = sum((statuses[t] == REPLIED) != (t in replied_threads) for t in thread_ids)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=1000)
+    parser.add_argument("--replied", type=float, default=0.1, help="fraction of threads replied to per round")
+    parser.add_argument("--sheets", type=int, default=5)
+    args = parser.parse_args()
+
+    report = run(args.threads, args.replied, args.sheets)
+    print(f"{report['threads']} threads: Apps Script poller = {report['per_thread_lookups']} thread lookups per run")
+    for name in ("baseline", "incremental", "idle", "expired_history"):
+        stats = report[name]
+        print(f"{name:<16} gmail={stats['gmail_requests']:<4} sheets={stats['sheets_requests']:<3} "
+              f"replied={stats['replied']:<4} pushed={stats['pushed']:<4} "
+              f"sync={stats['sync_ms']:.1f}ms push={stats['push_ms']:.1f}ms")
+    print(f"status mismatches vs mailbox: {report['mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Offline retrieval quality and latency for every recommender backend.
+
+    cd iitgn_faculty && python -m benchmarks.retrieval_eval [--k 10] [--compare benchmarks/results/<commit>.json]
+    cd iitgn_faculty && python -m benchmarks.retrieval_eval --relabel
+
+Queries and their relevant professors live in eval_queries.json. A query
+describes the work of one discipline, and its relevant professors are the
+ones whose department matches the query's `department` regex. No backend
+searches the department, so the labels do not favour whichever retriever
+matches the same words. They are coarse (relevant people outside the
+department count as misses), which keeps absolute numbers low but
+comparisons between backends and commits fair. --relabel regenerates the
+prof_id lists after a corpus change. The corpus is embedded with the
+deterministic HashingEmbeddings, so no network is used and numbers only
+move when the code does. Recall@k is |hits| / min(k, |relevant|). Every
+backend is the app's Recommender, Chroma included. Results are written to
+benchmarks/results/<commit>.json for diffing between commits.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import subprocess
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import BASE_DIR, percentiles, rss_mb, timed
+from benchmarks.fake_embeddings import HashingEmbeddings
+from recommender import Recommender
+from vector_store import NumpyVectorStore
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_queries.json")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+METRICS = ("recall_at_k", "mrr", "ndcg_at_k")
+
+
+def load_queries(path=QUERIES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["queries"]
+
+
+def relabel(path=QUERIES_PATH):
+    df = Recommender()._build_frame()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for entry in data["queries"]:
+        pattern = re.compile(entry["department"], re.I)
+        entry["relevant"] = sorted(
+            prof_id for prof_id, department in zip(df["prof_id"], df["department"])
+            if isinstance(department, str) and pattern.search(" ".join(department.split()))
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return data["queries"]
+
+
+def score_ranking(ranked, relevant, k) -> dict:
+    relevant = set(relevant)
+    hits = [prof_id in relevant for prof_id in ranked[:k]]
+    first = next((i for i, hit in enumerate(hits) if hit), None)
+    dcg = sum(1 / math.log2(i + 2) for i, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(k, len(relevant))))
+    return {
+        "recall_at_k": sum(hits) / min(k, len(relevant)) if relevant else 0.0,
+        "mrr": 1 / (first + 1) if first is not None else 0.0,
+        "ndcg_at_k": dcg / ideal if ideal else 0.0,
+    }
+
+
+def evaluate(search, queries, k) -> dict:
+    latencies, scores = [], []
+    for entry in queries:
+        ranked, ms = timed(search, entry["query"], k)
+        latencies.append(ms)
+        scores.append(score_ranking(ranked, entry["relevant"], k))
+    return {
+        **{metric: float(np.mean([s[metric] for s in scores])) for metric in METRICS},
+        "latency_ms": {"mean": float(np.mean(latencies)), **percentiles(latencies)},
+    }
+
+
+def _recommender(mode, store, embeddings, reranker=None):
+    recommender = Recommender(backend="numpy", mode=mode, reranker=reranker)
+    recommender.load_corpus()
+    recommender.numpy_store = store
+    recommender.embedding_model = embeddings
+    recommender._loaded = True
+    return recommender
+
+
+def _chroma_recommender(path, seed_vectors, embeddings):
+    """The app's Chroma path: a persistent collection from _open_chroma, filled by sync_index."""
+    from index_sync import MANIFEST_NAME, ChromaSyncBackend, Manifest, sync_index
+
+    recommender = Recommender(chroma_path=path, backend="chroma", mode="semantic")
+    recommender.load_corpus()
+    recommender.embedding_model = embeddings
+    chroma = recommender._open_chroma()
+    sync_index(recommender.documents, ChromaSyncBackend(chroma._collection),
+               Manifest(os.path.join(path, MANIFEST_NAME)), embeddings.embed_documents, seed_vectors)
+    recommender.vectorstore = chroma
+    recommender._loaded = True
+    return recommender
+
+
+def run(k=10, dim=256) -> dict:
+    queries = [q for q in load_queries() if q["relevant"]]
+    embeddings = HashingEmbeddings(dim=dim)
+
+    corpus = Recommender()
+    corpus.load_corpus()
+    ids = sorted(corpus.documents)
+    texts = [corpus.documents[doc_id][0] for doc_id in ids]
+    vectors, embed_ms = timed(embeddings.embed_documents, texts)
+
+    report = {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "k": k,
+        "embeddings": f"hashing-{dim}",
+        "professors": len(corpus.records),
+        "documents": len(ids),
+        "queries": len(queries),
+        "embed_ms": embed_ms,
+        "backends": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def numpy_store(ann=None):
+            rss_before = rss_mb()
+            store = NumpyVectorStore(tmp)
+            _, build_ms = timed(store.save, vectors, ids)
+            if ann:
+                _, ann_ms = timed(store.attach_ann, ann)
+                build_ms += ann_ms
+            return store, {"build_ms": build_ms, "rss_mb": rss_mb() - rss_before}
+
+        def add(name, search, build):
+            report["backends"][name] = {**build, **evaluate(search, queries, k)}
+
+        from lexical_index import LexicalIndex
+        rss_before = rss_mb()
+        _, lexical_ms = timed(LexicalIndex, corpus.records, [prof["prof_id"] for prof in corpus.records])
+        lexical_build = {"build_ms": lexical_ms, "rss_mb": rss_mb() - rss_before}
+
+        store, build = numpy_store()
+        add("lexical", _recommender("lexical", store, embeddings).search_ids, lexical_build)
+        add("numpy", _recommender("semantic", store, embeddings).search_ids, build)
+        add("hybrid", _recommender("hybrid", store, embeddings).search_ids, build)
+
+        from reranker import KeywordScorer, Reranker
+        reranked = _recommender("hybrid", store, embeddings, Reranker(KeywordScorer(), budget_ms=10_000,
+                                                                       cache_path=os.path.join(tmp, "rerank.sqlite3")))
+        add("hybrid+rerank", lambda query, k: [p["prof_id"] for p in reranked.recommend(query, k)], build)
+
+        for ann in ("hnsw", "ivf"):
+            try:
+                store, build = numpy_store(ann)
+            except ImportError as e:
+                print(f"Skipping numpy+{ann}: {e}")
+                continue
+            add(f"numpy+{ann}", _recommender("semantic", store, embeddings).search_ids, build)
+
+        try:
+            from index_sync import content_hash
+
+            rss_before = rss_mb()
+            seed_vectors = {content_hash(text): vector for text, vector in zip(texts, vectors)}
+            chroma, build_ms = timed(_chroma_recommender, os.path.join(tmp, "chroma"), seed_vectors, embeddings)
+            build = {"build_ms": build_ms, "rss_mb": rss_mb() - rss_before}
+            add("chroma", chroma.search_ids, build)
+            add("chroma+hybrid", lambda query, k: chroma.search_ids(query, k, mode="hybrid"), build)
+        except ImportError as e:
+            print(f"Skipping chroma: {e}")
+    return report
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print(report, baseline=None):
+    print(f"{report['professors']} professors, {report['documents']} documents, {report['queries']} queries, "
+          f"k={report['k']} @ {report['commit']}{' (dirty)' if report['dirty'] else ''}")
+    for name, stats in report["backends"].items():
+        line = (f"{name:<14} recall@k={stats['recall_at_k']:.3f} mrr={stats['mrr']:.3f} "
+                f"ndcg@k={stats['ndcg_at_k']:.3f}  p50={stats['latency_ms']['p50']:.2f}ms "
+                f"p95={stats['latency_ms']['p95']:.2f}ms p99={stats['latency_ms']['p99']:.2f}ms  "
+                f"build={stats['build_ms']:.0f}ms rss=+{stats['rss_mb']:.1f}MB")
+        old = (baseline or {}).get("backends", {}).get(name)
+        if old:
+            deltas = [f"{metric} {stats[metric] - old[metric]:+.3f}" for metric in METRICS]
+            deltas.append(f"p95 {stats['latency_ms']['p95'] - old['latency_ms']['p95']:+.2f}ms")
+            line += f"\n{'':<14} vs {baseline['commit']}: " + ", ".join(deltas)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--relabel", action="store_true", help="regenerate relevant prof_ids from the departments")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--json", help="results path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    if args.relabel:
+        queries = relabel()
+        print(f"Relabelled {len(queries)} queries in {QUERIES_PATH}")
+        return
+
+    report = run(args.k, args.dim)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print(report, baseline)
+
+    path = args.json or os.path.join(RESULTS_DIR, f"{report['commit']}{'-dirty' if report['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
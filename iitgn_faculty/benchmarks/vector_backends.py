@@ -0,0 +1,95 @@
+"""Compare the Chroma index with the NumPy brute-force backend.
+
+    cd iitgn_faculty && python -m benchmarks.vector_backends [--queries 200] [--k 10]
+
+Both backends are fed the vectors already stored in .chroma_index, and the
+queries are stored vectors plus Gaussian noise, so no embedding calls are
+made. Recall@k is measured against exact float64 cosine search.
+"""
+import argparse
+import json
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import percentiles, rss_mb, timed
+from recommender import CHROMA_PATH, COLLECTION_NAME, _use_pysqlite3
+from vector_store import NumpyVectorStore, normalize_rows
+
+
+def _recall(found, expected):
+    return len(set(found) & set(expected)) / max(len(expected), 1)
+
+
+def run(n_queries=200, k=10, noise=0.05, dtype="float32", seed=0) -> dict:
+    _use_pysqlite3()
+    import chromadb
+
+    rss_before = rss_mb()
+    collection, chroma_load_ms = timed(
+        lambda: chromadb.PersistentClient(path=CHROMA_PATH).get_collection(COLLECTION_NAME)
+    )
+    stored = collection.get(include=["embeddings"])
+    rss_chroma = rss_mb()
+
+    ids = stored["ids"]
+    exact = normalize_rows(stored["embeddings"], "float64")
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(exact), size=min(n_queries, len(exact)), replace=False)
+    queries = normalize_rows(exact[picks] + rng.normal(0, noise, size=(len(picks), exact.shape[1])), "float64")
+    truth = [[ids[i] for i in np.argsort(-(exact @ q))[:k]] for q in queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyVectorStore(tmp)
+        rss_numpy_before = rss_mb()
+        _, numpy_build_ms = timed(store.build_from_chroma, collection, dtype)
+        rss_numpy = rss_mb()
+
+        results = {}
+        for name, search in {
+            "chroma": lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])["ids"][0],
+            "numpy": lambda q: [doc_id for doc_id, _ in store.search_vector(q, k)],
+        }.items():
+            latencies, recalls = [], []
+            for q, expected in zip(queries, truth):
+                found, ms = timed(search, q)
+                latencies.append(ms)
+                recalls.append(_recall(found, expected))
+            results[name] = {
+                "recall_at_k": float(np.mean(recalls)),
+                "latency_ms": {"mean": float(np.mean(latencies)), **percentiles(latencies)},
+            }
+
+    results["chroma"]["load_ms"] = chroma_load_ms
+    results["chroma"]["rss_mb"] = rss_chroma - rss_before
+    results["numpy"]["build_ms"] = numpy_build_ms
+    results["numpy"]["rss_mb"] = rss_numpy - rss_numpy_before
+    results["numpy"]["dtype"] = dtype
+    return {"vectors": len(ids), "dim": int(exact.shape[1]), "queries": len(queries), "k": k, "backends": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    report = run(args.queries, args.k, args.noise, args.dtype)
+    print(f"{report['vectors']} vectors x {report['dim']} dims, {report['queries']} queries, k={report['k']}")
+    for name, stats in report["backends"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"{name:<7} recall@k={stats['recall_at_k']:.3f}  mean={latency['mean']:.2f}ms  "
+            f"p50={latency['p50']:.2f}ms  p95={latency['p95']:.2f}ms  rss=+{stats['rss_mb']:.1f}MB"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import html
+import re
+
+
+def _text(value, default="N/A") -> str:
+    # rows coming back from the recommender DataFrame carry NaN for missing fields
+    if value is None or value != value or value == "":
+        return default
+    return str(value)
+
+
+def split_interests(research_raw) -> list[str]:
+    research_raw = _text(research_raw, "")
+    return [s.strip(" ●,|") for s in re.split(r"[●•,|]", research_raw) if s.strip()]
+
+
+def card_key(prof: dict) -> str:
+    return _text(prof.get("prof_id"), "") or "|".join(
+        _text(prof.get(field), "") for field in ("college_name", "department", "name")
+    )
+
+
+def render_card_html(prof: dict) -> str:
+    """One professor card as a self-contained HTML fragment (the photo is rendered separately)."""
+    esc = lambda value, default="N/A": html.escape(_text(value, default))
+    parts = [
+        f"<h3>{esc(prof.get('name'))}</h3>",
+        f"<p>College: {esc(prof.get('college_name'))}<br>"
+        f"Designation: {esc(prof.get('designation'))}<br>"
+        f"Department: {esc(prof.get('department'))}<br>"
+        f"Email: <code>{esc(prof.get('email'))}</code></p>",
+    ]
+
+    website = _text(prof.get("website"), "")
+    if website:
+        parts.append(f'<p><a href="{html.escape(website, quote=True)}" target="_blank">Website</a></p>')
+
+    interests = split_interests(prof.get("research_interests"))
+    if interests:
+        items = "".join(f"<li>{html.escape(i)}</li>" for i in interests)
+        parts.append(f"<p>Research Interests:</p><ul>{items}</ul>")
+    else:
+        parts.append("<p>Research Interests: N/A</p>")
+
+    parts.append(f"<p>Academic Background: {esc(prof.get('academic_background'))}</p>")
+    parts.append(f"<p>Work Experience: {esc(prof.get('work_experience'))}</p>")
+
+    pubs = prof.get("selected_publications")
+    if isinstance(pubs, list) and pubs:
+        items = "".join(f"<li>{html.escape(str(pub))}</li>" for pub in pubs)
+        parts.append(f"<details><summary>Selected Publications</summary><ul>{items}</ul></details>")
+    elif _text(pubs, ""):
+        parts.append(f"<details><summary>Selected Publications</summary><p>{esc(pubs)}</p></details>")
+
+    profile_url = html.escape(_text(prof.get("profile_url"), "#"), quote=True)
+    parts.append(f'<p><a href="{profile_url}" target="_blank">🔗 Profile Link</a></p>')
+    return "\n".join(parts)
@@ -0,0 +1,272 @@
+"""Per-user Google credentials and API clients, shared across Streamlit sessions.
+
+Credentials are loaded from the token store once per user and refreshed
+shortly before they expire, instead of re-reading the token file on every
+call. Discovery documents are parsed once per API, and services are built
+from them once per user on a transport that any thread may use: httplib2
+connections are not thread-safe, so each request checks an idle connection
+out of a shared pool and returns it afterwards. Streamlit runs every rerun on
+a fresh thread, so nothing here is tied to the calling thread.
+stats() reports how much latency each cache has saved.
+"""
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+TOKEN_DIR = os.getenv("GOOGLE_TOKEN_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokens"))
+REFRESH_MARGIN = 300  # seconds before expiry at which credentials are refreshed
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/gmail.send",
+    "https://www.googleapis.com/auth/gmail.readonly",
+    "https://www.googleapis.com/auth/script.projects",
+    "https://www.googleapis.com/auth/script.deployments",
+    "https://www.googleapis.com/auth/script.scriptapp"
+]
+
+
+def token_path(user_email, token_dir=None):
+    return os.path.join(token_dir or TOKEN_DIR, f"token_{user_email}.json")
+
+
+class SharedHttp:
+    """httplib2.Http stand-in that is safe to share between threads.
+
+    Each request runs on an idle connection checked out under a lock; a new
+    one is opened only when every connection is busy, so the pool grows to
+    the peak number of concurrent requests and no further.
+    """
+
+    def __init__(self, timeout=60, on_checkout=None):
+        import httplib2
+
+        self.timeout = timeout
+        self.follow_redirects = True
+        self.redirect_codes = httplib2.Http().redirect_codes
+        self._idle = []
+        self._lock = threading.Lock()
+        self._on_checkout = on_checkout
+        self.opened = 0
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                http = self._idle.pop()
+                if self._on_checkout:
+                    self._on_checkout(hit=True)
+                return http
+        import httplib2
+        start = time.perf_counter()
+        http = httplib2.Http(timeout=self.timeout)
+        with self._lock:
+            self.opened += 1
+        if self._on_checkout:
+            self._on_checkout(hit=False, ms=(time.perf_counter() - start) * 1000)
+        return http
+
+    def request(self, *args, **kwargs):
+        http = self._checkout()
+        http.follow_redirects, http.redirect_codes = self.follow_redirects, self.redirect_codes
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._idle.append(http)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+
+class ClientPool:
+    def __init__(self, token_dir=None, scopes=SCOPES, refresh_margin=REFRESH_MARGIN, client_secret_path=None):
+        self.token_dir = token_dir or TOKEN_DIR
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.client_secret_path = client_secret_path
+        self._creds = {}
+        self._accounts = {}  # credentials -> the user they were loaded for
+        self._user_locks = {}
+        self._documents = {}
+        self._clients = {}
+        self._services = {}
+        self._shared_http = None
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _record(self, component, hit, ms=0.0):
+        with self._lock:
+            entry = self._stats.setdefault(component, {"hits": 0, "misses": 0, "miss_ms": 0.0})
+            if hit:
+                entry["hits"] += 1
+            else:
+                entry["misses"] += 1
+                entry["miss_ms"] += ms
+
+    def stats(self) -> dict:
+        """Per cache: hits, misses, mean cost of a miss and the latency the hits saved."""
+        with self._lock:
+            report = {}
+            for component, entry in self._stats.items():
+                miss_ms = entry["miss_ms"] / entry["misses"] if entry["misses"] else 0.0
+                report[component] = {"hits": entry["hits"], "misses": entry["misses"], "miss_ms": miss_ms,
+                                     "saved_ms": entry["hits"] * miss_ms}
+            return report
+
+    def _user_lock(self, user_email):
+        with self._lock:
+            return self._user_locks.setdefault(user_email, threading.Lock())
+
+    def _needs_refresh(self, creds):
+        if not creds.valid:
+            return True
+        expiry = getattr(creds, "expiry", None)
+        if expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds() < self.refresh_margin
+
+    def credentials(self, user_email):
+        """The user's credentials, loaded once and refreshed ahead of expiry; runs the OAuth flow if none exist."""
+        with self._user_lock(user_email):
+            creds = self._creds.get(user_email)
+            if creds is not None and not self._needs_refresh(creds):
+                self._record("credentials", hit=True)
+                return creds
+
+            start = time.perf_counter()
+            creds = creds or self._load(user_email)
+            if creds is None or self._needs_refresh(creds):
+                creds = self._refresh_or_authorize(user_email, creds)
+            self._creds[user_email] = creds
+            with self._lock:
+                self._accounts[creds] = user_email
+            self._record("credentials", hit=False, ms=(time.perf_counter() - start) * 1000)
+            return creds
+
+    def _load(self, user_email):
+        from google.oauth2.credentials import Credentials
+
+        path = token_path(user_email, self.token_dir)
+        return Credentials.from_authorized_user_file(path, self.scopes) if os.path.exists(path) else None
+
+    def _refresh_or_authorize(self, user_email, creds):
+        from google.auth.transport.requests import Request
+
+        if creds and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(self._client_secret(), self.scopes)
+            creds = flow.run_local_server(port=0)
+        os.makedirs(self.token_dir, exist_ok=True)
+        with open(token_path(user_email, self.token_dir), "w") as token:
+            token.write(creds.to_json())
+        return creds
+
+    def _client_secret(self):
+        if self.client_secret_path:
+            return self.client_secret_path
+        import streamlit as st
+        return st.secrets["CLIENT_SECRET_JSON"]
+
+    def account(self, creds):
+        """The user `creds` belong to; for credentials the pool did not load, a digest of the refresh token."""
+        with self._lock:
+            user_email = self._accounts.get(creds)
+        if user_email:
+            return user_email
+        refresh_token = getattr(creds, "refresh_token", None)
+        if not isinstance(refresh_token, str) or not refresh_token:
+            return ""
+        return "token:" + hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()[:16]
+
+    def forget(self, user_email):
+        """Drop the cached credentials (e.g. after the user revoked access)."""
+        with self._user_lock(user_email):
+            self._creds.pop(user_email, None)
+
+    def _http(self):
+        """The transport every service is built on; connections are checked out per request."""
+        with self._lock:
+            if self._shared_http is None:
+                self._shared_http = SharedHttp(timeout=60,
+                                               on_checkout=lambda hit, ms=0.0: self._record("http", hit, ms))
+            return self._shared_http
+
+    def _document(self, api, version):
+        key = (api, version)
+        with self._lock:
+            document = self._documents.get(key)
+        if document is not None:
+            self._record("discovery", hit=True)
+            return document
+
+        import json
+        from googleapiclient import discovery_cache
+        start = time.perf_counter()
+        content = discovery_cache.get_static_doc(api, version)
+        if content is None:
+            raise ValueError(f"no bundled discovery document for {api} {version}")
+        document = json.loads(content)
+        with self._lock:
+            self._documents[key] = document
+        self._record("discovery", hit=False, ms=(time.perf_counter() - start) * 1000)
+        return document
+
+    def build(self, api, version, creds):
+        """A service for `creds`, memoized for every thread; the drop-in for googleapiclient's build()."""
+        key = (api, version, creds)
+        with self._lock:
+            service = self._services.get(key)
+        if service is not None:
+            self._record("service", hit=True)
+            return service
+
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+        start = time.perf_counter()
+        document = self._document(api, version)
+        service = build_from_document(document, http=AuthorizedHttp(creds, http=self._http()))
+        with self._lock:
+            service = self._services.setdefault(key, service)
+        self._record("service", hit=False, ms=(time.perf_counter() - start) * 1000)
+        return service
+
+    def service(self, user_email, api, version):
+        return self.build(api, version, self.credentials(user_email))
+
+    def gspread_client(self, creds):
+        with self._lock:
+            client = self._clients.get(creds)
+        if client is not None:
+            self._record("gspread", hit=True)
+            return client
+
+        import gspread
+        start = time.perf_counter()
+        client = gspread.authorize(creds)
+        with self._lock:
+            client = self._clients.setdefault(creds, client)
+        self._record("gspread", hit=False, ms=(time.perf_counter() - start) * 1000)
+        return client
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ClientPool:
+    """The process-wide pool; Streamlit reruns and sessions all share it."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
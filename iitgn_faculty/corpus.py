@@ -0,0 +1,182 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+
+import msgpack
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FACULTY_DIR = os.path.join(BASE_DIR, "faculty")
+SNAPSHOT_PATH = os.path.join(BASE_DIR, ".corpus_cache", "faculty.msgpack")
+SNAPSHOT_VERSION = 2
+
+COLLEGE_NAMES = {
+    "iitgn": "IIT Gandhinagar",
+    "iitj": "IIT Jodhpur",
+    "iitg": "IIT Guwahati",
+    "iitr": "IIT Roorkee",
+    "iitbhu": "IIT BHU (Varanasi)",
+    "iith": "IIT Hyderabad",
+    "iiti": "IIT Indore",
+    "iitd": "IIT Delhi",
+}
+
+FIELDS = [
+    "prof_id",
+    "name",
+    "designation",
+    "email",
+    "website",
+    "research_interests",
+    "academic_background",
+    "work_experience",
+    "selected_publications",
+    "department",
+    "photo",
+    "profile_url",
+    "college_name",
+]
+
+
+def infer_college_name(filename: str) -> str:
+    # "iitgn_faculty.json" -> "iitgn"; exact prefix so "iitg" never shadows "iitgn"
+    key = os.path.basename(filename).split("_")[0].lower()
+    return COLLEGE_NAMES.get(key, "Unknown")
+
+
+def professor_id(name, department, college_name) -> str:
+    """Stable id derived from who the professor is, not from their position in the files."""
+    key = "|".join(" ".join((part or "").split()).lower() for part in (college_name, department, name))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_professor(prof: dict, college_name: str) -> dict:
+    if college_name == "IIT Gandhinagar":
+        match = re.search(r"/faculty/([^/]+)", prof.get("profile_url") or "")
+        department = match.group(1).upper() if match else "UNKNOWN"
+    else:
+        department = (prof.get("department") or "UNKNOWN").strip()
+
+    name = (prof.get("name") or "").strip()
+    return {
+        "prof_id": professor_id(name, department, college_name),
+        "name": name,
+        "designation": prof.get("designation"),
+        "email": prof.get("email"),
+        "website": prof.get("website"),
+        "research_interests": prof.get("research_interests"),
+        "academic_background": prof.get("academic_background") or "",
+        "work_experience": prof.get("work_experience") or "",
+        "selected_publications": prof.get("selected_publications") or "",
+        "department": department,
+        "photo": prof.get("photo") or "",
+        "profile_url": (prof.get("profile_url") or "#").replace(" ", "%20"),
+        "college_name": college_name,
+    }
+
+
+def _source_files(folder_path):
+    return sorted(f for f in os.listdir(folder_path) if f.endswith(".json"))
+
+
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _fingerprint(folder_path, previous=None):
+    # mtime/size are checked first so an unchanged tree never gets re-hashed;
+    # the digest keeps a touched-but-identical file (git checkout) from forcing a rebuild
+    previous = previous or {}
+    sources = {}
+    for file in _source_files(folder_path):
+        st = os.stat(os.path.join(folder_path, file))
+        old = previous.get(file)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            digest = old[2]
+        else:
+            digest = _file_digest(os.path.join(folder_path, file))
+        sources[file] = [st.st_size, st.st_mtime_ns, digest]
+    return sources
+
+
+def parse_sources(folder_path=None) -> dict:
+    folder_path = folder_path or FACULTY_DIR
+    columns = {field: [] for field in FIELDS}
+
+    for file in _source_files(folder_path):
+        with open(os.path.join(folder_path, file), "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except Exception as e:
+                print(f"Failed to load {file}: {e}")
+                continue
+        if not isinstance(data, list):
+            data = [data]
+
+        college_name = infer_college_name(file)
+        for prof in data:
+            row = normalize_professor(prof, college_name)
+            for field in FIELDS:
+                columns[field].append(row[field])
+
+    return columns
+
+
+def _read_snapshot(path):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return msgpack.unpackb(mm, raw=False)
+
+
+def _write_snapshot(path, snapshot):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(msgpack.packb(snapshot, use_bin_type=True))
+    os.replace(tmp_path, path)
+
+
+def load_columns(folder_path=None, snapshot_path=None) -> dict:
+    """Column-oriented corpus ({field: [values]}), served from the msgpack snapshot when it is fresh."""
+    folder_path = folder_path or FACULTY_DIR
+    snapshot_path = snapshot_path or SNAPSHOT_PATH
+
+    snapshot = None
+    if os.path.exists(snapshot_path):
+        try:
+            snapshot = _read_snapshot(snapshot_path)
+        except Exception as e:
+            print(f"Corpus snapshot unreadable, rebuilding: {e}")
+
+    try:
+        previous = snapshot["sources"] if snapshot and snapshot.get("version") == SNAPSHOT_VERSION else None
+        sources = _fingerprint(folder_path, previous)
+    except FileNotFoundError:
+        print(f"Faculty folder not found at: {folder_path}")
+        return {field: [] for field in FIELDS}
+
+    if previous is not None and {k: v[2] for k, v in previous.items()} == {k: v[2] for k, v in sources.items()}:
+        if previous != sources:
+            snapshot["sources"] = sources
+            try:
+                _write_snapshot(snapshot_path, snapshot)
+            except OSError as e:
+                print(f"Could not refresh corpus snapshot: {e}")
+        return snapshot["columns"]
+
+    columns = parse_sources(folder_path)
+    try:
+        _write_snapshot(snapshot_path, {"version": SNAPSHOT_VERSION, "sources": sources, "columns": columns})
+    except OSError as e:
+        print(f"Could not write corpus snapshot: {e}")
+    return columns
+
+
+def load_records(folder_path=None, snapshot_path=None) -> list[dict]:
+    columns = load_columns(folder_path, snapshot_path)
+    return [dict(zip(FIELDS, values)) for values in zip(*(columns[field] for field in FIELDS))]
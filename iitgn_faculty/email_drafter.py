@@ -1,10 +1,18 @@
-import google.generativeai as genai
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from just_backup_data.interaction_logger import plan_followup, log_interaction
 import datetime
+import hashlib
+import io
+import json
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
+from kv_cache import CACHE_DIR, SqliteCache
+from rate_limit import call_with_retries, is_transient
 
 def suggest_optimal_time():
     now = datetime.datetime.now()
@@ -17,11 +25,32 @@ def suggest_optimal_time():
     else:
         return now  
 
-genai.configure(api_key=os.getenv(st.secrets["GEMINI_API_KEY"]))
-model = genai.GenerativeModel("gemini-2.0-flash")
+MODEL_NAME = "gemini-2.0-flash"
+_model = None
 
-def draft_email(prof_name, prof_interest, student_name, student_academic_year, student_background, student_interest, goal, extra=""):
-    prompt = f"""
+# bump when build_prompt changes so old drafts stop matching
+PROMPT_VERSION = 1
+DRAFT_CACHE_PATH = os.path.join(CACHE_DIR, "email_drafts.sqlite3")
+DRAFT_CACHE_TTL = 7 * 24 * 3600
+DRAFT_CACHE_MAX_ENTRIES = 5000
+_draft_cache = None
+_draft_stats = {"hits": 0, "misses": 0}
+_draft_stats_lock = threading.Lock()
+BULK_DRAFT_WORKERS = int(os.getenv("BULK_DRAFT_WORKERS", "8"))
+BULK_DRAFT_MAX_RETRIES = 3
+
+
+def get_model():
+    # google.generativeai is slow to import; defer it until the first draft
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv(st.secrets["GEMINI_API_KEY"]))
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+def build_prompt(prof_name, student_name, student_academic_year, goal, extra=""):
+    return f"""
 You are an academic email assistant. Write a polite, professional email from a student to a professor.
 
 Context:
@@ -41,9 +70,8 @@ Rules:
 Write the email accordingly.
 """
 
-    response = model.generate_content(prompt)
-    email_text = response.text.strip()
 
+def _log_draft(email_text, prof_name, prof_interest, student_name, goal, extra):
     now = datetime.datetime.now()
     followup = plan_followup(now)
 
@@ -60,6 +88,120 @@ Write the email accordingly.
         "responded": False,
     }
     log_interaction(log_entry)
+
+
+def draft_cache_key(**inputs):
+    """Hash of every prompt input after whitespace/case normalization, plus the model and prompt version."""
+    canonical = {name: " ".join(str(value or "").split()).casefold() for name, value in inputs.items()}
+    canonical.update(model=MODEL_NAME, prompt_version=PROMPT_VERSION)
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _get_draft_cache():
+    global _draft_cache
+    if _draft_cache is None:
+        _draft_cache = SqliteCache(DRAFT_CACHE_PATH, table="email_drafts", ttl=DRAFT_CACHE_TTL,
+                                   max_entries=DRAFT_CACHE_MAX_ENTRIES)
+    return _draft_cache
+
+
+def _cached_draft(key):
+    try:
+        text = _get_draft_cache().get(key)
+    except Exception as e:
+        print(f"Draft cache read failed: {e}")
+        text = None
+    with _draft_stats_lock:
+        _draft_stats["hits" if text is not None else "misses"] += 1
+    return text
+
+
+def _store_draft(key, email_text):
+    if not email_text:
+        return
+    try:
+        _get_draft_cache().set(key, email_text)
+    except Exception as e:
+        print(f"Draft cache write failed: {e}")
+
+
+def draft_cache_stats() -> dict:
+    with _draft_stats_lock:
+        hits, misses = _draft_stats["hits"], _draft_stats["misses"]
+    return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+
+def draft_email(prof_name, prof_interest, student_name, student_academic_year, student_background, student_interest, goal, extra="", regenerate=False):
+    key = draft_cache_key(prof_name=prof_name, prof_interest=prof_interest, student_name=student_name,
+                          student_academic_year=student_academic_year, student_background=student_background,
+                          student_interest=student_interest, goal=goal, extra=extra)
+    email_text = None if regenerate else _cached_draft(key)
+    if email_text is None:
+        prompt = build_prompt(prof_name, student_name, student_academic_year, goal, extra)
+        response = get_model().generate_content(prompt)
+        email_text = response.text.strip()
+        _store_draft(key, email_text)
+    _log_draft(email_text, prof_name, prof_interest, student_name, goal, extra)
     return email_text
 
 
+def draft_email_stream(prof_name, prof_interest, student_name, student_academic_year, student_background, student_interest, goal, extra="", regenerate=False):
+    """Like draft_email, but yields text as Gemini produces it; the full draft is logged once the stream ends."""
+    key = draft_cache_key(prof_name=prof_name, prof_interest=prof_interest, student_name=student_name,
+                          student_academic_year=student_academic_year, student_background=student_background,
+                          student_interest=student_interest, goal=goal, extra=extra)
+    email_text = None if regenerate else _cached_draft(key)
+    if email_text is not None:
+        yield email_text
+        _log_draft(email_text, prof_name, prof_interest, student_name, goal, extra)
+        return
+
+    prompt = build_prompt(prof_name, student_name, student_academic_year, goal, extra)
+    parts = []
+    for chunk in get_model().generate_content(prompt, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # chunks without text (e.g. only safety ratings) raise on .text
+            continue
+        parts.append(text)
+        yield text
+    email_text = "".join(parts).strip()
+    _store_draft(key, email_text)
+    _log_draft(email_text, prof_name, prof_interest, student_name, goal, extra)
+
+
+
+
+def draft_emails_bulk(profs, student_name, student_academic_year, student_background, student_interest, goal, extra="",
+                      max_workers=BULK_DRAFT_WORKERS, max_retries=BULK_DRAFT_MAX_RETRIES):
+    """Draft one email per professor concurrently; yields (prof, email_text, error) as each finishes."""
+    def draft(prof):
+        return call_with_retries(
+            draft_email, max_retries=max_retries, retry_if=is_transient,
+            prof_name=prof["name"], prof_interest=prof.get("research_interests", ""), student_name=student_name,
+            student_academic_year=student_academic_year, student_background=student_background,
+            student_interest=student_interest, goal=goal, extra=extra,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="draft") as executor:
+        futures = {executor.submit(draft, prof): prof for prof in profs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def drafts_zip(drafts) -> bytes:
+    """Zip {prof_id: (professor name, email text)} as one .txt per professor."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        used = set()
+        for name, text in drafts.values():
+            filename = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "professor"
+            while filename in used:
+                filename += "_"
+            used.add(filename)
+            archive.writestr(f"{filename}.txt", text)
+    return buffer.getvalue()
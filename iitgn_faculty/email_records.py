@@ -1,50 +1,20 @@
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-import base64
-import os.path
 import datetime
-import streamlit as st
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-    "https://www.googleapis.com/auth/gmail.send",
-    "https://www.googleapis.com/auth/gmail.readonly",
-    "https://www.googleapis.com/auth/script.projects",
-    "https://www.googleapis.com/auth/script.deployments",
-    "https://www.googleapis.com/auth/script.scriptapp"
-]
 
+from client_pool import get_pool
+from outbox import mime_message
+from outreach_analytics import get_analytics
+from reply_tracker import get_reply_tracker
+from sheet_writer import get_sheet_writer
 
 def get_credentials(user_email):
-    token_path = f"C:\\Users\\deep\\summer siege\\iitgn_faculty\\tokens\\token_{user_email}.json"
-    creds = None
-
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(st.secrets["CLIENT_SECRET_JSON"], SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(token_path, "w") as token:
-            token.write(creds.to_json())
-
-    return creds
-
-
-def send_email(creds, to_email, subject, message_text):
-    service = build('gmail', 'v1', credentials=creds)
-    message = MIMEText(message_text)
-    message['to'] = to_email
-    message['subject'] = subject
-    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    message_body = {'raw': raw}
+    """The user's OAuth credentials from the shared client pool (token files live in GOOGLE_TOKEN_DIR)."""
+    return get_pool().credentials(user_email)
+
+
+def send_email(creds, to_email, subject, message_text, service=None, thread_id=None):
+    """Send immediately; pass a reused Gmail `service` to skip the build, or use outbox.Outbox to schedule."""
+    service = service or get_pool().build('gmail', 'v1', creds)
+    message_body = mime_message(to_email, subject, message_text, thread_id)
 
     try:
         sent = service.users().messages().send(userId='me', body=message_body).execute()
@@ -56,42 +26,39 @@ def send_email(creds, to_email, subject, message_text):
         return None
 
 
-def log_email_to_sheet(client, student_name, prof_name, prof_email, intent, email_text, thread_id, creds):
-    sheet_title = f"{student_name} Outreach History"
-    sheets_service = build("sheets", "v4", credentials=creds)
+def _outreach_writer(creds, client=None):
+    """The student's sheet writer, with flushed rows registered for reply tracking and analytics."""
+    writer = get_sheet_writer(creds, client)
+    if writer.on_flush is None:
+        tracker = get_reply_tracker(creds)
 
-    spreadsheet_created = False
+        def on_flush(spreadsheet_id, rows, first_row):
+            tracker.load_sheet(spreadsheet_id, rows, first_row)
+            get_analytics().ingest_rows(rows)
 
-    try:
-        spreadsheet = client.open(sheet_title)
-        spreadsheet_id = spreadsheet.id
-    except gspread.SpreadsheetNotFound:
-        spreadsheet_data = sheets_service.spreadsheets().create(
-            body={"properties": {"title": sheet_title}}
-        ).execute()
-        spreadsheet_id = spreadsheet_data["spreadsheetId"]
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        spreadsheet_created = True
+        writer.on_flush = on_flush
+    return writer
 
-    if spreadsheet_created:
-        sheet = spreadsheet.sheet1
-        sheet.append_row(["Timestamp", "Student", "Professor", "Email", "Intent", "Email Text", "Reply Status", "Thread ID"])
-    else:
-        sheet = spreadsheet.sheet1
+
+def log_email_to_sheet(client, student_name, prof_name, prof_email, intent, email_text, thread_id, creds, writer=None):
+    """Queue the row on the student's sheet writer; rows reach the sheet in batched appends."""
+    writer = writer or _outreach_writer(creds, client)
+    spreadsheet_id, _ = writer.resolve(student_name)
+    get_reply_tracker(creds).track(thread_id, spreadsheet_id)
 
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     reply_status = "Awaiting Reply"
     row = [timestamp, student_name, prof_name, prof_email, intent, email_text, reply_status, thread_id]
-    sheet.append_row(row)
+    writer.append(student_name, row)
 
-    print(f"📬 Logged to sheet: {spreadsheet.url}")
     print(f"📎 Spreadsheet link: https://docs.google.com/spreadsheets/d/{spreadsheet_id}")
     
     return spreadsheet_id
 
 
 def attach_apps_script(creds, spreadsheet_id):
-    script_service = build('script', 'v1', credentials=creds)
+    """Legacy per-sheet reply poller; reply_tracker.sync_replies replaces it and it is no longer attached."""
+    script_service = get_pool().build('script', 'v1', creds)
 
     try:
         project = script_service.projects().create(
@@ -184,48 +151,31 @@ def attach_apps_script(creds, spreadsheet_id):
 
 
 def prepare_sheet_and_suggest_best_time(student_name, client, creds):
-    import pandas as pd
-
-    sheet_title = f"{student_name} Outreach History"
-
-    try:
-        spreadsheet = client.open(sheet_title)
-        spreadsheet_id = spreadsheet.id
-        sheet = spreadsheet.sheet1
-    except gspread.SpreadsheetNotFound:
-        sheets_service = build("sheets", "v4", credentials=creds)
-        spreadsheet_data = sheets_service.spreadsheets().create(
-            body={"properties": {"title": sheet_title}}
-        ).execute()
-        spreadsheet_id = spreadsheet_data["spreadsheetId"]
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        sheet = spreadsheet.sheet1
-        sheet.append_row(["Timestamp", "Student", "Professor", "Email", "Intent", "Email Text", "Reply Status", "Thread ID"])
-        attach_apps_script(creds, spreadsheet_id)
-        print(f"🧩 New sheet created and Apps Script attached: {spreadsheet_id}")
+    writer = _outreach_writer(creds, client)
+    spreadsheet_id, created = writer.resolve(student_name)
+    if created:
+        print(f"🧩 New sheet created: {spreadsheet_id}")
 
     print(f"📄 Sheet ready: https://docs.google.com/spreadsheets/d/{spreadsheet_id}")
 
-    rows = sheet.get_all_values()
-    if len(rows) <= 1:
-        return spreadsheet_id, "Not enough data to suggest best timing."
-
-    import pandas as pd
-    df = pd.DataFrame(rows[1:], columns=rows[0])
-    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors='coerce')
-    df = df[df["Reply Status"] == "Replied"]
-
-    if df.empty:
-        return spreadsheet_id, "No replies yet to analyze best time."
-
-    df["hour"] = df["Timestamp"].dt.hour
-    df["weekday"] = df["Timestamp"].dt.dayofweek  # 0=Mon
-
-    best_hour = df["hour"].mode()[0]
-    best_day = df["weekday"].mode()[0]
-    day_name = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][best_day]
-    suggestion = f"Suggested outreach time: {day_name} around {best_hour}:00 hrs"
-    return spreadsheet_id, suggestion
+    # queued rows count towards the analysis; flushing also feeds them to the analytics store
+    writer.flush(student_name)
+    tracker = get_reply_tracker(creds)
+    analytics = get_analytics()
+    if not analytics.is_imported(student_name):
+        # first visit since the local history began: import the sheet once
+        rows = writer.read_rows(student_name)
+        tracker.load_sheet(spreadsheet_id, rows)
+        analytics.import_sheet(student_name, rows[1:])
+
+    # reply status comes from an incremental Gmail sync rather than the Apps Script poller
+    try:
+        tracker.sync()
+        tracker.push_changes()
+    except Exception as e:
+        print(f"Reply sync failed, using the statuses recorded so far: {e}")
+    analytics.record_replies(tracker)
+    return spreadsheet_id, analytics.suggest_best_time(student_name)
 
 
 if __name__ == "__main__":
@@ -237,7 +187,7 @@ if __name__ == "__main__":
 
     user_email = input("Enter your Google email: ").strip()
     creds = get_credentials(user_email)
-    client = gspread.authorize(creds)
+    client = get_pool().gspread_client(creds)
 
     thread_id = send_email(creds, prof_email, f"Outreach: {student_name} - {intent}", email_text)
 
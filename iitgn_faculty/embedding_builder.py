@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from kv_cache import CACHE_DIR, SqliteCache
+from rate_limit import TokenBucket, call_with_retries, is_transient
+
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "embedding_checkpoint.sqlite3")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "300"))
+EMBED_MAX_RETRIES = 5
+
+
+class EmbeddingBuilder:
+    """Embeds large document lists in concurrent, rate-limited, checkpointed batches.
+
+    `embed_documents` is any callable taking a list of texts and returning one
+    vector per text (the LangChain method, or a local fake). Every finished
+    batch is written to a SQLite checkpoint keyed by model + text hash, so a
+    build that dies on a quota error resumes where it stopped.
+    """
+
+    def __init__(self, embed_documents, model_name, batch_size=EMBED_BATCH_SIZE, max_workers=EMBED_WORKERS,
+                 requests_per_minute=EMBED_REQUESTS_PER_MINUTE, max_retries=EMBED_MAX_RETRIES, base_delay=1.0,
+                 checkpoint_path=CHECKPOINT_PATH):
+        self.embed_batch = embed_documents
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.limiter = TokenBucket.per_minute(requests_per_minute, burst=max_workers)
+        self.checkpoint = SqliteCache(checkpoint_path, table="embedding_checkpoint") if checkpoint_path else None
+        self.last_stats = {}
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed(self, keys, texts):
+        self.limiter.acquire()
+        vectors = call_with_retries(
+            self.embed_batch, texts, max_retries=self.max_retries, base_delay=self.base_delay, retry_if=is_transient
+        )
+        if len(vectors) != len(texts):
+            raise ValueError(f"expected {len(texts)} vectors, got {len(vectors)}")
+        vectors = [list(v) for v in vectors]
+        if self.checkpoint is not None:
+            self.checkpoint.set_many((key, array("f", v).tobytes()) for key, v in zip(keys, vectors))
+        return keys, vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        start = time.perf_counter()
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+
+        vectors = {}
+        if self.checkpoint is not None:
+            vectors = {key: array("f", blob).tolist() for key, blob in self.checkpoint.get_many(set(keys)).items()}
+        resumed = len(vectors)
+
+        pending, seen = [], set()
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in seen:
+                seen.add(key)
+                pending.append((key, text))
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed") as executor:
+            futures = [executor.submit(self._embed, [k for k, _ in b], [t for _, t in b]) for b in batches]
+            for future in as_completed(futures):
+                try:
+                    batch_keys, batch_vectors = future.result()
+                except Exception as e:
+                    # keep collecting: every other finished batch is already checkpointed
+                    error = error or e
+                    continue
+                vectors.update(zip(batch_keys, batch_vectors))
+
+        elapsed = time.perf_counter() - start
+        embedded = len(vectors) - resumed
+        self.last_stats = {
+            "documents": len(texts),
+            "embedded": embedded,
+            "resumed": resumed,
+            "batches": len(batches),
+            "seconds": elapsed,
+            "docs_per_second": embedded / elapsed if elapsed > 0 else 0.0,
+        }
+        if batches:
+            print(
+                f"Embedded {embedded} docs in {len(batches)} batches ({resumed} from checkpoint) "
+                f"at {self.last_stats['docs_per_second']:.1f} docs/s",
+                file=sys.stderr,
+            )
+        if error is not None:
+            raise error
+        return [vectors[key] for key in keys]
+
+    def clear_checkpoint(self):
+        """Call once the vectors are safely persisted in the index."""
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+from array import array
+
+from kv_cache import CACHE_DIR, LRUCache, SqliteCache
+
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "query_embeddings.sqlite3")
+EMBEDDING_CACHE_TTL = 30 * 24 * 3600
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000
+MEMORY_CACHE_SIZE = 1024
+
+
+def normalize_query(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+class CachedEmbeddings:
+    """Wraps a LangChain embeddings object and caches embed_query results.
+
+    Lookups go memory LRU -> SQLite (TTL) -> remote model; the key is the model
+    name plus the whitespace/case-normalized query. Document embeddings pass
+    straight through, since index builds have their own checkpointing.
+    """
+
+    def __init__(self, embeddings, model_name, path=EMBEDDING_CACHE_PATH, ttl=EMBEDDING_CACHE_TTL,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES, memory_size=MEMORY_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.memory = LRUCache(memory_size)
+        self.disk = SqliteCache(path, table="query_embeddings", ttl=ttl, max_entries=max_entries)
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            self._count("hits_memory")
+            return vector
+
+        try:
+            blob = self.disk.get(key)
+        except Exception as e:
+            print(f"Embedding cache read failed: {e}")
+            blob = None
+        if blob is not None:
+            vector = array("f", blob).tolist()
+            self.memory.set(key, vector)
+            self._count("hits_disk")
+            return vector
+
+        self._count("misses")
+        vector = self.embeddings.embed_query(text)
+        self.memory.set(key, vector)
+        try:
+            self.disk.set(key, array("f", vector).tobytes())
+        except Exception as e:
+            print(f"Embedding cache write failed: {e}")
+        return vector
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """embed_query for many texts: cached ones are looked up together, the rest go out in one request."""
+        keys = [self._key(text) for text in texts]
+        vectors = {}
+        for key in set(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+        try:
+            disk_hits = self.disk.get_many(set(keys) - set(vectors))
+        except Exception as e:
+            print(f"Embedding cache read failed: {e}")
+            disk_hits = {}
+        for key, blob in disk_hits.items():
+            vectors[key] = array("f", blob).tolist()
+            self.memory.set(key, vectors[key])
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        with self._stats_lock:
+            self.hits_disk += len(disk_hits)
+            self.hits_memory += len(set(keys)) - len(disk_hits) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            try:
+                fetched = self.embeddings.embed_documents(list(missing.values()), task_type="retrieval_query")
+            except TypeError:
+                # embeddings without task types (local fakes) embed queries and documents alike
+                fetched = self.embeddings.embed_documents(list(missing.values()))
+            fetched = [list(v) for v in fetched]
+            for key, vector in zip(missing, fetched):
+                vectors[key] = vector
+                self.memory.set(key, vector)
+            try:
+                self.disk.set_many((key, array("f", v).tobytes()) for key, v in zip(missing, fetched))
+            except Exception as e:
+                print(f"Embedding cache write failed: {e}")
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from io import BytesIO
+
+from corpus import BASE_DIR
+
+CACHE_DIR = os.path.join(BASE_DIR, ".image_cache")
+THUMBNAIL_WIDTH = 300
+THUMBNAIL_QUALITY = 80
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+FETCH_TIMEOUT = 4
+FAILURE_TTL = 24 * 3600
+ACCESS_RESOLUTION = 3600
+
+
+class ThumbnailCache:
+    """Content-addressed disk cache of 300px WebP thumbnails with LRU size eviction.
+
+    get() never touches the network: a miss schedules a background fetch and
+    returns None so the caller can fall back to the original photo URL.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_workers=8):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.sqlite3")
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        self._pending = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, digest TEXT, failed_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER, last_access REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.webp")
+
+    def _lookup(self, url):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT urls.digest, urls.failed_at, blobs.last_access FROM urls "
+                "LEFT JOIN blobs ON blobs.digest = urls.digest WHERE urls.url = ?",
+                (url,),
+            ).fetchone()
+
+    def get(self, url):
+        if not url:
+            return None
+        row = self._lookup(url)
+        if row and row[0] and row[2] is not None:
+            digest, _, last_access = row
+            try:
+                with open(self._blob_path(digest), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                self._forget(url, digest)
+                self.prefetch([url])
+                return None
+            now = time.time()
+            if now - last_access > ACCESS_RESOLUTION:
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            return data
+        if row and row[1] and time.time() - row[1] < FAILURE_TTL:
+            return None
+        self.prefetch([url])
+        return None
+
+    def prefetch(self, urls):
+        futures = []
+        with self._lock:
+            for url in urls:
+                if not url:
+                    continue
+                future = self._pending.get(url)
+                if future is None:
+                    future = self._executor.submit(self._fetch_if_missing, url)
+                    self._pending[url] = future
+                    future.add_done_callback(lambda _, url=url: self._done(url))
+                futures.append(future)
+        return futures
+
+    def _done(self, url):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def _forget(self, url, digest):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM urls WHERE url = ?", (url,))
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+
+    def _fetch_if_missing(self, url):
+        row = self._lookup(url)
+        if row and (row[2] is not None or (row[1] and time.time() - row[1] < FAILURE_TTL)):
+            return
+        try:
+            data = fetch_thumbnail(url)
+        except Exception as e:
+            print("Image load error:", e)
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO urls (url, digest, failed_at) VALUES (?, NULL, ?)",
+                    (url, time.time()),
+                )
+            return
+        self._store(url, data)
+
+    def _store(self, url, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs (digest, size, last_access) VALUES (?, ?, ?)",
+                (digest, len(data), time.time()),
+            )
+            conn.execute("INSERT OR REPLACE INTO urls (url, digest, failed_at) VALUES (?, ?, NULL)", (url, digest))
+        self._evict()
+
+    def _evict(self):
+        with closing(self._connect()) as conn, conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for digest, size in conn.execute("SELECT digest, size FROM blobs ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+def fetch_thumbnail(url, width=THUMBNAIL_WIDTH, timeout=FETCH_TIMEOUT) -> bytes:
+    # requests and PIL cost ~100ms to import; only the background fetches need them, not app startup
+    import certifi
+    import requests
+    from PIL import Image
+
+    headers = {"User-Agent": "Mozilla/5.0"}
+    response = requests.get(url, headers=headers, timeout=timeout, verify=certifi.where())
+    response.raise_for_status()
+    if "image" not in response.headers.get("Content-Type", ""):
+        raise ValueError(f"not an image: {url}")
+
+    image = Image.open(BytesIO(response.content))
+    image.thumbnail((width, width * 4))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    out = BytesIO()
+    image.save(out, format="WEBP", quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+
+if __name__ == "__main__":
+    from corpus import load_columns
+
+    cache = ThumbnailCache()
+    photos = sorted(set(p for p in load_columns()["photo"] if p))
+    start = time.perf_counter()
+    for future in cache.prefetch(photos):
+        future.result()
+    print(f"Prefetched {len(photos)} photos in {time.perf_counter() - start:.1f}s")
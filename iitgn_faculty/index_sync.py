@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+SYNC_BATCH_SIZE = 100
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """doc_id -> content hash of what is currently embedded in an index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.hashes = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {path}: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp_path, self.path)
+
+
+class ChromaSyncBackend:
+    # upserts are persisted as they happen, so only the manifest needs checkpointing
+    checkpoint_batches = 10
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ids(self):
+        return set(self.collection.get(include=[])["ids"])
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def upsert(self, ids, texts, vectors, metadatas):
+        self.collection.upsert(ids=list(ids), documents=list(texts), embeddings=[list(v) for v in vectors],
+                               metadatas=list(metadatas))
+
+    def vectors_by_hash(self, manifest):
+        stored = self.collection.get(include=["embeddings", "documents"])
+        # keyed by the text each vector was embedded from, so documents from the old full rebuild
+        # ("<tag_id> <interests>") never stand in for the clean text and get re-embedded
+        return {content_hash(document): vector for vector, document in zip(stored["embeddings"], stored["documents"])
+                if document}
+
+    def flush(self):
+        pass
+
+
+class NumpySyncBackend:
+    # every flush rewrites the whole matrix, so it is written once at the end; the embedding checkpoint covers resume
+    checkpoint_batches = 0
+
+    def __init__(self, store, dtype="float32", **meta):
+        self.store = store
+        self.dtype = dtype
+        self.meta = meta
+        self.vectors = {}
+        if store.exists():
+            store.load()
+            # copy out of the memmap so the .npy can be replaced (Windows refuses while mapped)
+            matrix = store.matrix.astype("float32")
+            self.vectors = {doc_id: matrix[i] for i, doc_id in enumerate(store.ids)}
+            store.matrix = None
+        self._dirty = False
+
+    def ids(self):
+        return set(self.vectors)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self._dirty |= self.vectors.pop(doc_id, None) is not None
+
+    def upsert(self, ids, texts, vectors, metadatas):
+        for doc_id, vector in zip(ids, vectors):
+            self.vectors[doc_id] = vector
+        self._dirty = True
+
+    def vectors_by_hash(self, manifest):
+        return {manifest.hashes[doc_id]: v for doc_id, v in self.vectors.items() if doc_id in manifest.hashes}
+
+    def flush(self):
+        if self._dirty or not self.store.exists():
+            ids = sorted(self.vectors)
+            self.store.matrix = None
+            self.store.save([self.vectors[doc_id] for doc_id in ids], ids, self.dtype, **self.meta)
+            self._dirty = False
+
+
+def sync_index(docs, backend, manifest, embed_documents, seed_vectors=None, batch_size=SYNC_BATCH_SIZE) -> dict:
+    """Bring `backend` in line with `docs` ({doc_id: (text, metadata)}), embedding only new or changed rows.
+
+    Vectors for unchanged text are reused by content hash, both from the
+    backend itself and from `seed_vectors` ({hash: vector}), so renamed ids
+    and a backend switch cost no embedding calls. Missing vectors are fetched
+    with a single `embed_documents` call (see embedding_builder for batching
+    and resume). Upserts go in batch by batch; the backend is flushed and the
+    manifest saved every `backend.checkpoint_batches` batches (0: only at the end).
+    Stale rows are deleted last, so a failed embedding or upsert leaves the
+    existing index serving as it was.
+    """
+    hashes = {doc_id: content_hash(text) for doc_id, (text, _) in docs.items()}
+    existing = backend.ids()
+
+    stale = (set(manifest.hashes) | existing) - set(docs)
+    changed = [doc_id for doc_id in docs if manifest.hashes.get(doc_id) != hashes[doc_id] or doc_id not in existing]
+
+    reusable = dict(seed_vectors or {})
+    if changed:
+        reusable.update(backend.vectors_by_hash(manifest))
+
+    # one call for everything missing, so a batching/concurrent embedder can parallelize it
+    texts = {hashes[doc_id]: docs[doc_id][0] for doc_id in changed if hashes[doc_id] not in reusable}
+    if texts:
+        reusable.update(zip(texts, embed_documents(list(texts.values()))))
+    embedded = len(texts)
+    reused = sum(1 for doc_id in changed if hashes[doc_id] not in texts)
+
+    checkpoint_batches = getattr(backend, "checkpoint_batches", 1)
+    for n, start in enumerate(range(0, len(changed), batch_size), 1):
+        batch = changed[start:start + batch_size]
+        backend.upsert(
+            batch,
+            [docs[doc_id][0] for doc_id in batch],
+            [reusable[hashes[doc_id]] for doc_id in batch],
+            [docs[doc_id][1] for doc_id in batch],
+        )
+        manifest.hashes.update({doc_id: hashes[doc_id] for doc_id in batch})
+        # the manifest is only saved after the backend has persisted what it lists
+        if checkpoint_batches and n % checkpoint_batches == 0:
+            backend.flush()
+            manifest.save()
+
+    backend.delete(stale)
+    for doc_id in stale:
+        manifest.hashes.pop(doc_id, None)
+    backend.flush()
+    if changed or stale:
+        manifest.save()
+    stats = {"total": len(docs), "embedded": embedded, "reused": reused, "deleted": len(stale)}
+    if embedded or reused or stale:
+        print(f"Index sync: {stats}")
+    return stats
@@ -0,0 +1,100 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# research interests count double; designation and publications fill in exact terms
+FIELD_WEIGHTS = {"research_interests": 2.0, "designation": 1.0, "selected_publications": 1.0}
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is of on or the to with using based via its their".split()
+)
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+RRF_K = 60
+
+
+def tokenize(text) -> list[str]:
+    """Lowercased terms; "O-RAN" yields "oran" plus its parts so either spelling matches."""
+    if not isinstance(text, str):
+        return []
+    tokens = []
+    for match in TOKEN_RE.findall(text.replace("\\,", ",").lower()):
+        parts = re.split(r"[-/.]", match)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+        tokens.extend(p for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return tokens
+
+
+def _field_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return value if isinstance(value, str) else ""
+
+
+class LexicalIndex:
+    """In-memory BM25 over interests, designation and publications.
+
+    Each posting list stores the precomputed BM25 weight of a term in a
+    document, so a query is a handful of numpy scatter-adds plus an
+    argpartition, with no network involved.
+    """
+
+    def __init__(self, records, ids, k1=1.2, b=0.75, field_weights=FIELD_WEIGHTS):
+        self.ids = list(ids)
+        self.k1 = k1
+        self.b = b
+
+        doc_terms = []
+        for prof in records:
+            tf = Counter()
+            for field, weight in field_weights.items():
+                for token in tokenize(_field_text(prof.get(field))):
+                    tf[token] += weight
+            doc_terms.append(tf)
+
+        lengths = np.array([sum(tf.values()) for tf in doc_terms], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        norms = k1 * (1 - b + b * lengths / avg_length)
+
+        postings = defaultdict(lambda: ([], []))
+        for row, tf in enumerate(doc_terms):
+            for term, freq in tf.items():
+                rows, freqs = postings[term]
+                rows.append(row)
+                freqs.append(freq)
+
+        n_docs = len(doc_terms)
+        self.postings = {}
+        for term, (rows, freqs) in postings.items():
+            rows = np.array(rows, dtype=np.int32)
+            freqs = np.array(freqs, dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            self.postings[term] = (rows, (idf * freqs * (k1 + 1) / (freqs + norms[rows])).astype(np.float32))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not terms or k <= 0:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            rows, weights = self.postings[term]
+            scores[rows] += weights
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[row], float(scores[row])) for row in matched]
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K, limit: int = None) -> list[str]:
+    """Merge ranked id lists; each list adds 1 / (k + rank) to an id's score."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return fused[:limit] if limit is not None else fused
@@ -0,0 +1,351 @@
+"""Persistent outbox that sends queued outreach mail at its scheduled time.
+
+    cd iitgn_faculty && python outbox.py [--poll 30]
+
+Messages wait in SQLite until their send_at (by default the next
+suggest_optimal_time), then go out through one Gmail service per user and
+worker thread, throttled per user by a token bucket and a rolling daily cap.
+Transient failures are rescheduled with exponential backoff; after a
+successful send a follow-up is queued in the same thread for
+plan_followup(sent time), and dropped if the professor has replied by then.
+"""
+import argparse
+import base64
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from email.mime.text import MIMEText
+
+from kv_cache import CACHE_DIR
+from rate_limit import TokenBucket, backoff_delay, is_transient
+
+OUTBOX_PATH = os.path.join(CACHE_DIR, "outbox.sqlite3")
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_RATE_PER_MINUTE = float(os.getenv("OUTBOX_RATE_PER_MINUTE", "30"))
+OUTBOX_DAILY_LIMIT = int(os.getenv("OUTBOX_DAILY_LIMIT", "450"))  # under Gmail's 500/day for personal accounts
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_RETRY_BASE = 30.0  # seconds; doubled per attempt, capped at an hour
+OUTBOX_POLL_SECONDS = 30.0
+OUTBOX_CLAIM_TIMEOUT = 600.0  # a message still 'sending' after this long belongs to a dead process
+
+FOLLOWUP_TEMPLATE = """Dear {prof_name},
+
+I hope you are doing well. I wanted to follow up on my earlier email below in case it got buried in your inbox. \
+I would be grateful for any response whenever you have a moment.
+
+Thank you for your time.
+
+Best regards,
+{student_name}"""
+
+_COLUMNS = ("id", "user_email", "to_email", "subject", "body", "student_name", "prof_name", "intent", "send_at",
+            "status", "attempts", "last_error", "thread_id", "followup_of", "sent_at")
+
+
+def mime_message(to_email, subject, message_text, thread_id=None) -> dict:
+    """Gmail messages.send body; with thread_id the message joins that thread."""
+    message = MIMEText(message_text)
+    message["to"] = to_email
+    message["subject"] = subject
+    body = {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
+    if thread_id:
+        body["threadId"] = thread_id
+    return body
+
+
+def _timestamp(value):
+    if value is None:
+        return time.time()
+    return value.timestamp() if hasattr(value, "timestamp") else float(value)
+
+
+class Outbox:
+    """Queue plus scheduler.
+
+    `service_factory(user_email)` returns an authorized Gmail service; it is
+    called once per user and worker thread, since the client's HTTP
+    transport is not thread-safe. `on_sent(message)` runs after each send
+    (e.g. to log the row to the student's sheet) and
+    `replied_threads(user_email, thread_ids)` returns the threads that already
+    have a reply, so their follow-ups are cancelled.
+    """
+
+    def __init__(self, service_factory, path=OUTBOX_PATH, on_sent=None, replied_threads=None,
+                 workers=OUTBOX_WORKERS, rate_per_minute=OUTBOX_RATE_PER_MINUTE, daily_limit=OUTBOX_DAILY_LIMIT,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, retry_base=OUTBOX_RETRY_BASE, followups=True):
+        self.service_factory = service_factory
+        self.path = path
+        self.on_sent = on_sent
+        self.replied_threads = replied_threads
+        self.workers = workers
+        self.rate_per_minute = rate_per_minute
+        self.daily_limit = daily_limit
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.followups = followups
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbox")
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, user_email TEXT NOT NULL, "
+                "to_email TEXT NOT NULL, subject TEXT, body TEXT, student_name TEXT, prof_name TEXT, intent TEXT, "
+                "send_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+                "last_error TEXT, thread_id TEXT, followup_of INTEGER, sent_at REAL, claimed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, send_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_sent ON outbox (user_email, sent_at)")
+        self._fail_stale_claims()
+
+    def _fail_stale_claims(self):
+        # a claim that never finished may or may not have reached Gmail; never send it twice
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("UPDATE outbox SET status = 'failed', last_error = 'interrupted while sending; "
+                                "check the Sent folder before re-queueing' WHERE status = 'sending' AND claimed_at < ?",
+                                (time.time() - OUTBOX_CLAIM_TIMEOUT,)).rowcount
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, user_email, to_email, subject, body, send_at=None, student_name=None, prof_name=None,
+                intent=None, thread_id=None, followup_of=None) -> int:
+        """Queue one message for send_at (datetime or epoch seconds; default suggest_optimal_time())."""
+        if send_at is None:
+            from email_drafter import suggest_optimal_time
+            send_at = suggest_optimal_time()
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "INSERT INTO outbox (user_email, to_email, subject, body, student_name, prof_name, intent, send_at, "
+                "thread_id, followup_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_email, to_email, subject, body, student_name, prof_name, intent, _timestamp(send_at),
+                 thread_id, followup_of),
+            ).lastrowid
+
+    def cancel(self, message_id) -> bool:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("UPDATE outbox SET status = 'cancelled' WHERE id = ? AND status = 'queued'",
+                                (message_id,)).rowcount > 0
+
+    def messages(self, status=None, user_email=None) -> list[dict]:
+        query, params = f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE 1 = 1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if user_email:
+            query += " AND user_email = ?"
+            params.append(user_email)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query + " ORDER BY send_at", params)]
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def _bucket(self, user_email):
+        with self._buckets_lock:
+            if user_email not in self._buckets:
+                self._buckets[user_email] = TokenBucket.per_minute(self.rate_per_minute, burst=1)
+            return self._buckets[user_email]
+
+    def _service(self, user_email):
+        services = self._local.__dict__.setdefault("services", {})
+        if user_email not in services:
+            services[user_email] = self.service_factory(user_email)
+        return services[user_email]
+
+    def _claim(self, now, limit):
+        """Atomically move up to `limit` due messages to 'sending', respecting each user's daily cap."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            with conn:
+                sent_today = dict(conn.execute(
+                    "SELECT user_email, COUNT(*) FROM outbox WHERE sent_at >= ? OR status = 'sending' "
+                    "GROUP BY user_email", (now - 86400,)
+                ).fetchall())
+                # users already at the cap are left out in SQL, so their backlog cannot fill the window
+                capped = [user for user, count in sent_today.items() if count >= self.daily_limit]
+                claimed = []
+                for row in conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE status = 'queued' "
+                                        f"AND send_at <= ? AND user_email NOT IN ({', '.join('?' * len(capped))}) "
+                                        "ORDER BY send_at LIMIT ?", (now, *capped, limit * 4)).fetchall():
+                    if len(claimed) == limit:
+                        break
+                    if sent_today.get(row["user_email"], 0) >= self.daily_limit:
+                        continue
+                    sent_today[row["user_email"]] = sent_today.get(row["user_email"], 0) + 1
+                    claimed.append(dict(row))
+                conn.executemany("UPDATE outbox SET status = 'sending', attempts = attempts + 1, claimed_at = ? "
+                                 "WHERE id = ?", [(time.time(), row["id"]) for row in claimed])
+        return claimed
+
+    def _drop_replied_followups(self, messages):
+        """Cancel due follow-ups whose thread already has a reply; returns the messages still to send."""
+        if self.replied_threads is None:
+            return messages
+        by_user = {}
+        for m in messages:
+            if m["followup_of"] and m["thread_id"]:
+                by_user.setdefault(m["user_email"], []).append(m)
+
+        held = set()
+        for user_email, followups in by_user.items():
+            try:
+                replied = set(self.replied_threads(user_email, [m["thread_id"] for m in followups]))
+            except Exception as e:
+                # without a fresh reply status, wait rather than nag someone who may have answered
+                print(f"Reply check failed for {user_email}, postponing follow-ups: {e}")
+                self._finish(followups, "queued", error=str(e), send_at=time.time() + self.retry_base, refund=True)
+                held.update(m["id"] for m in followups)
+                continue
+            dropped = [m for m in followups if m["thread_id"] in replied]
+            self._finish(dropped, "cancelled", error="professor replied")
+            held.update(m["id"] for m in dropped)
+        return [m for m in messages if m["id"] not in held]
+
+    def _finish(self, messages, status, error=None, send_at=None, refund=False):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, last_error = ?, send_at = COALESCE(?, send_at), "
+                "attempts = attempts - ? WHERE id = ?",
+                [(status, error, send_at, int(refund), m["id"]) for m in messages],
+            )
+
+    def _send(self, message) -> bool:
+        self._bucket(message["user_email"]).acquire()
+        try:
+            service = self._service(message["user_email"])
+            sent = service.users().messages().send(userId="me", body=mime_message(
+                message["to_email"], message["subject"], message["body"], message["thread_id"]
+            )).execute()
+        except Exception as e:
+            attempts = message["attempts"] + 1
+            if is_transient(e) and attempts < self.max_attempts:
+                delay = backoff_delay(attempts - 1, self.retry_base, cap=3600)
+                print(f"Send to {message['to_email']} failed ({e}); retrying in {delay:.0f}s")
+                self._finish([message], "queued", error=str(e), send_at=time.time() + delay)
+            else:
+                print(f"Send to {message['to_email']} failed permanently: {e}")
+                self._finish([message], "failed", error=str(e))
+            return False
+
+        sent_at = time.time()
+        message.update(thread_id=sent["threadId"], sent_at=sent_at, status="sent")
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE outbox SET status = 'sent', thread_id = ?, sent_at = ?, last_error = NULL "
+                         "WHERE id = ?", (message["thread_id"], sent_at, message["id"]))
+        print(f"Email sent to {message['to_email']}. Message ID: {sent['id']}")
+        if self.followups and not message["followup_of"]:
+            self._queue_followup(message)
+        if self.on_sent is not None:
+            try:
+                self.on_sent(message)
+            except Exception as e:
+                print(f"on_sent hook failed for message {message['id']}: {e}")
+        return True
+
+    def _queue_followup(self, message):
+        import datetime
+        from email_drafter import plan_followup
+
+        sent = datetime.datetime.fromtimestamp(message["sent_at"])
+        subject = message["subject"] or ""
+        self.enqueue(
+            message["user_email"], message["to_email"],
+            subject if subject.lower().startswith("re:") else f"Re: {subject}",
+            FOLLOWUP_TEMPLATE.format(prof_name=message["prof_name"] or "Professor",
+                                     student_name=message["student_name"] or ""),
+            send_at=plan_followup(sent), student_name=message["student_name"], prof_name=message["prof_name"],
+            intent="Follow-up", thread_id=message["thread_id"], followup_of=message["id"],
+        )
+
+    def run_once(self, now=None) -> dict:
+        """Send everything due now (up to a few batches); returns {'sent': n, 'failed': n, 'skipped': n}."""
+        now = _timestamp(now)
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        counts["failed"] += self._fail_stale_claims()
+        while True:
+            claimed = self._claim(now, self.workers * 4)
+            if not claimed:
+                return counts
+            due = self._drop_replied_followups(claimed)
+            counts["skipped"] += len(claimed) - len(due)
+            for ok in self._executor.map(self._send, due):
+                counts["sent" if ok else "failed"] += 1
+
+    def run_forever(self, poll_seconds=OUTBOX_POLL_SECONDS):
+        while not self._stop.is_set():
+            try:
+                counts = self.run_once()
+                if counts["sent"] or counts["failed"]:
+                    print(f"Outbox: {counts}")
+            except Exception as e:
+                print(f"Outbox run failed: {e}")
+            self._stop.wait(poll_seconds)
+
+    def start(self, poll_seconds=OUTBOX_POLL_SECONDS):
+        """Run the scheduler in a daemon thread (e.g. inside the Streamlit process)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, args=(poll_seconds,), daemon=True,
+                                            name="outbox-scheduler")
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def default_outbox(**kwargs):
+    """Outbox wired to the client pool, the sheet writer and the reply tracker."""
+    from client_pool import get_pool
+    from email_records import log_email_to_sheet
+    from reply_tracker import REPLIED, get_reply_tracker
+
+    pool = get_pool()
+
+    def service_factory(user_email):
+        return pool.service(user_email, "gmail", "v1")
+
+    def on_sent(message):
+        if not message["followup_of"] and message["student_name"]:
+            log_email_to_sheet(None, message["student_name"], message["prof_name"], message["to_email"],
+                               message["intent"], message["body"], message["thread_id"],
+                               pool.credentials(message["user_email"]))
+
+    def replied_threads(user_email, thread_ids):
+        tracker = get_reply_tracker(pool.credentials(user_email))
+        tracker.sync()
+        return [t for t, status in tracker.statuses(thread_ids).items() if status == REPLIED]
+
+    return Outbox(service_factory, on_sent=on_sent, replied_threads=replied_threads, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queued outreach mail as it comes due.")
+    parser.add_argument("--poll", type=float, default=OUTBOX_POLL_SECONDS, help="seconds between scheduler runs")
+    parser.add_argument("--once", action="store_true", help="send what is due now and exit")
+    args = parser.parse_args()
+
+    outbox = default_outbox()
+    if args.once:
+        print(outbox.run_once())
+    else:
+        print(f"Outbox running, polling every {args.poll:.0f}s (Ctrl+C to stop)")
+        try:
+            outbox.run_forever(args.poll)
+        except KeyboardInterrupt:
+            outbox.stop()
+
+
+if __name__ == "__main__":
+    main()
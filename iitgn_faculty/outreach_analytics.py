@@ -0,0 +1,373 @@
+"""Reply analytics over the outreach history of every student.
+
+The history lives in a local Parquet file (one row per sent email), fed by
+the sheet writer as rows are flushed and by the reply tracker as replies
+arrive, so nothing is downloaded from Sheets after a student's first import.
+Aggregates (sent/replied counts per weekday and hour, per college and
+department, and a time-to-reply histogram) are kept per student and updated
+with the delta of each change, so suggestions stay instant as the history grows.
+"""
+import datetime
+import os
+import pickle
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from kv_cache import CACHE_DIR
+from sheet_writer import SHEET_HEADER
+
+ANALYTICS_DIR = os.path.join(CACHE_DIR, "outreach")
+COMPACT_AFTER_PARTS = 64
+MIN_SLOT_PRIOR = 5  # pseudo-sends pulling sparse slots towards the overall reply rate
+REPLY_HOUR_BINS = [0, 1, 3, 6, 12, 24, 48, 96, 168, 336, np.inf]
+REPLY_HOUR_LABELS = ["<1h", "1-3h", "3-6h", "6-12h", "12-24h", "1-2d", "2-4d", "4-7d", "1-2w", ">2w"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+COLUMNS = ["key", "thread_id", "student", "professor", "email", "intent", "college", "department", "sent_at",
+           "replied", "replied_at"]
+
+
+@lru_cache(maxsize=1)
+def professor_directory():
+    """(email -> (college, department), name -> (college, department)) from the faculty corpus."""
+    from corpus import load_columns
+
+    try:
+        columns = load_columns()
+    except Exception as e:
+        print(f"Faculty corpus unavailable for analytics: {e}")
+        return {}, {}
+    by_email, by_name = {}, {}
+    for name, email, college, department in zip(columns["name"], columns["email"], columns["college_name"],
+                                                columns["department"]):
+        place = (college or "Unknown", department or "Unknown")
+        if isinstance(email, str) and email:
+            by_email.setdefault(email.strip().casefold(), place)
+        if isinstance(name, str) and name:
+            by_name.setdefault(name.strip().casefold(), place)
+    return by_email, by_name
+
+
+def rows_to_frame(rows) -> pd.DataFrame:
+    """History rows from sheet rows (SHEET_HEADER order, header row excluded)."""
+    sheet = pd.DataFrame([list(row[:len(SHEET_HEADER)]) + [""] * (len(SHEET_HEADER) - len(row)) for row in rows],
+                         columns=SHEET_HEADER, dtype=object)
+    frame = pd.DataFrame({
+        "thread_id": sheet["Thread ID"].fillna("").astype(str),
+        "student": sheet["Student"].fillna("").astype(str),
+        "professor": sheet["Professor"].fillna("").astype(str),
+        "email": sheet["Email"].fillna("").astype(str),
+        "intent": sheet["Intent"].fillna("").astype(str),
+        "sent_at": pd.to_datetime(sheet["Timestamp"], errors="coerce"),
+        "replied": (sheet["Reply Status"] == "Replied").to_numpy(),
+        "replied_at": pd.Series(pd.NaT, index=sheet.index, dtype="datetime64[ns]"),
+    })
+    frame = frame[frame["sent_at"].notna()]
+    by_email, by_name = professor_directory()
+    places = [by_email.get(email.strip().casefold()) or by_name.get(name.strip().casefold()) or ("Unknown", "Unknown")
+              for email, name in zip(frame["email"], frame["professor"])]
+    frame["college"] = [college for college, _ in places]
+    frame["department"] = [department for _, department in places]
+    # threadless rows (failed sends) are keyed by who, when and to whom
+    fallback = frame["student"] + "|" + frame["sent_at"].astype(str) + "|" + frame["email"]
+    frame["key"] = frame["thread_id"].where(frame["thread_id"] != "", fallback)
+    return frame[COLUMNS].drop_duplicates("key", keep="last").reset_index(drop=True)
+
+
+def _empty_history():
+    frame = pd.DataFrame({column: pd.Series(dtype=object) for column in COLUMNS})
+    frame["sent_at"] = pd.Series(dtype="datetime64[ns]")
+    frame["replied_at"] = pd.Series(dtype="datetime64[ns]")
+    frame["replied"] = pd.Series(dtype=bool)
+    return frame
+
+
+def _codes(vocabulary, values):
+    """Integer codes for values, growing the vocabulary (name -> code) with unseen ones."""
+    for value in pd.unique(values):
+        if value not in vocabulary:
+            vocabulary[value] = len(vocabulary)
+    return pd.Series(values).map(vocabulary).to_numpy(np.int64)
+
+
+def _grow(array, sizes):
+    pad = [(0, max(0, size - current)) for size, current in zip(sizes, array.shape)]
+    return np.pad(array, pad) if any(after for _, after in pad) else array
+
+
+class Aggregates:
+    """Dense sent/replied counters by integer-coded student, college and department.
+
+    add() scatters a batch of history rows into the arrays with np.add.at;
+    subtracting a row's old version and adding its new one keeps the counts
+    exact without revisiting the rest of the history.
+    """
+
+    def __init__(self):
+        self.students, self.colleges, self.departments = {}, {}, {}
+        self.slots = np.zeros((0, 7, 24, 2), dtype=np.int32)  # student, weekday, hour, (sent, replied)
+        self.by_college = np.zeros((0, 0, 2), dtype=np.int32)
+        self.by_department = np.zeros((0, 0, 2), dtype=np.int32)
+        self.reply_hours = np.zeros((0, len(REPLY_HOUR_LABELS)), dtype=np.int32)
+
+    def add(self, frame: pd.DataFrame, sign=1):
+        if frame.empty:
+            return self
+        student = _codes(self.students, frame["student"].to_numpy())
+        college = _codes(self.colleges, frame["college"].to_numpy())
+        department = _codes(self.departments, (frame["college"] + " / " + frame["department"]).to_numpy())
+        n_students = len(self.students)
+        self.slots = _grow(self.slots, (n_students, 7, 24, 2))
+        self.by_college = _grow(self.by_college, (n_students, len(self.colleges), 2))
+        self.by_department = _grow(self.by_department, (n_students, len(self.departments), 2))
+        self.reply_hours = _grow(self.reply_hours, (n_students, len(REPLY_HOUR_LABELS)))
+
+        replied = frame["replied"].to_numpy(dtype=bool)
+        weekday = frame["sent_at"].dt.dayofweek.to_numpy()
+        hour = frame["sent_at"].dt.hour.to_numpy()
+        for counts, index in ((self.slots, (student, weekday, hour)), (self.by_college, (student, college)),
+                              (self.by_department, (student, department))):
+            np.add.at(counts, (*index, 0), sign)
+            np.add.at(counts, tuple(i[replied] for i in index) + (1,), sign)
+
+        hours = ((frame["replied_at"] - frame["sent_at"]).dt.total_seconds() / 3600).to_numpy()
+        timed = replied & ~np.isnan(hours) & (hours >= 0)
+        bins = np.searchsorted(REPLY_HOUR_BINS, hours[timed], side="right") - 1
+        np.add.at(self.reply_hours, (student[timed], bins), sign)
+        return self
+
+    def select(self, name, student=None):
+        """One counter array for a student, or summed over everyone; None for an unknown student."""
+        counts = getattr(self, name)
+        if student is None:
+            return counts.sum(axis=0)
+        code = self.students.get(student)
+        return None if code is None else counts[code]
+
+
+def aggregate(frame: pd.DataFrame) -> Aggregates:
+    """Aggregates of a whole history in one vectorized pass."""
+    return Aggregates().add(frame)
+
+
+def _same_rows(old, new):
+    columns = ["student", "college", "department", "sent_at", "replied", "replied_at"]
+    same = (old[columns] == new[columns]) | (old[columns].isna() & new[columns].isna())
+    return same.all(axis=1).to_numpy()
+
+
+class OutreachAnalytics:
+    """Outreach history plus its cached aggregates.
+
+    Each change is written as a small Parquet part holding only the new or
+    changed rows (later parts win on load) and folded into a single file once
+    `compact_after` parts pile up, so an update costs the size of the change,
+    not of the history.
+    """
+
+    def __init__(self, path=ANALYTICS_DIR, prior=MIN_SLOT_PRIOR, compact_after=COMPACT_AFTER_PARTS):
+        self.path = path
+        self.prior = prior
+        self.compact_after = compact_after
+        self.aggregates_path = os.path.join(path, "aggregates.pkl")
+        self._lock = threading.RLock()
+        self._history = None
+        self._totals = None
+        self._imported = set()
+        self._pending_replies = {}  # thread id -> reply time, for replies whose row has not arrived yet
+        self.replies_synced_at = {}  # tracker account -> updated_at of the last reply taken in
+
+    def _parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("history-") and name.endswith(".parquet"))
+
+    def _load(self):
+        if self._history is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        parts = self._parts()
+        frames = [pd.read_parquet(os.path.join(self.path, name)) for name in parts]
+        history = pd.concat(frames) if frames else _empty_history()
+        self._history = history.drop_duplicates("key", keep="last").set_index("key")
+        try:
+            with open(self.aggregates_path, "rb") as f:
+                saved = pickle.load(f)
+            self._imported, self._pending_replies = saved["imported"], saved["pending_replies"]
+            if saved["parts"] == parts:
+                self._totals, self.replies_synced_at = saved["totals"], dict(saved["replies_synced_at"])
+        except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+            pass
+        if self._totals is None:
+            # aggregates missing or older than the history: one vectorized pass over everything
+            self._totals = aggregate(self._history)
+
+    def _write_part(self, frame, parts):
+        sequence = int(parts[-1][len("history-"):-len(".parquet")]) + 1 if parts else 0
+        frame.reset_index().to_parquet(os.path.join(self.path, f"history-{sequence:08d}.parquet"), index=False)
+
+    def _save(self, changed=None):
+        parts = self._parts()
+        if changed is not None:
+            if len(parts) + 1 >= self.compact_after:
+                self._write_part(self._history, parts)
+                for name in parts:
+                    os.remove(os.path.join(self.path, name))
+            else:
+                self._write_part(changed, parts)
+        # written aside and swapped in, so a crash never leaves a truncated pickle behind
+        tmp_path = f"{self.aggregates_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"parts": self._parts(), "totals": self._totals, "imported": self._imported,
+                         "pending_replies": self._pending_replies, "replies_synced_at": self.replies_synced_at}, f)
+        os.replace(tmp_path, self.aggregates_path)
+
+    @property
+    def history(self) -> pd.DataFrame:
+        with self._lock:
+            self._load()
+            return self._history.reset_index()[COLUMNS]
+
+    def is_imported(self, student) -> bool:
+        """Whether the student's sheet was imported; rows flushed before that are only part of their history."""
+        with self._lock:
+            self._load()
+            return student in self._imported
+
+    def import_sheet(self, student, rows) -> int:
+        """Take in a student's whole sheet (header row excluded) once; later rows arrive through ingest_rows."""
+        with self._lock:
+            self._load()
+            changed = self.ingest_rows(rows)
+            self._imported.add(student)
+            self._save()
+            return changed
+
+    def upsert(self, frame: pd.DataFrame) -> int:
+        """Insert or replace rows by key, updating the aggregates by the change only; returns rows changed."""
+        if frame.empty:
+            return 0
+        with self._lock:
+            self._load()
+            history = self._history
+            incoming = frame.set_index("key")
+            existing = incoming.index[history.index.get_indexer(incoming.index) >= 0]
+            old = history.loc[existing]
+            # a reply already recorded is never downgraded by a stale sheet row
+            stale = existing[old["replied"].to_numpy() & ~incoming.loc[existing, "replied"].to_numpy()]
+            incoming.loc[stale, ["replied", "replied_at"]] = old.loc[stale, ["replied", "replied_at"]]
+            same = existing[_same_rows(old, incoming.loc[existing])]
+            old, incoming = old.drop(same), incoming.drop(same)
+            if incoming.empty:
+                return 0
+
+            self._totals.add(old, sign=-1).add(incoming)
+            if len(old):
+                history.loc[old.index, incoming.columns] = incoming.loc[old.index]
+            self._history = pd.concat([history, incoming[~incoming.index.isin(old.index)]])
+            self._save(changed=incoming[history.columns])
+            return len(incoming)
+
+    def _apply_replies(self, frame, replied_at) -> pd.DataFrame:
+        """Mark rows whose thread is in replied_at (thread id -> epoch seconds) as replied."""
+        rows = frame[frame["thread_id"].isin(replied_at)].copy()
+        rows["replied"] = True
+        # sheet timestamps are local wall-clock time, so replies are converted the same way
+        rows["replied_at"] = pd.to_datetime([
+            datetime.datetime.fromtimestamp(replied_at[t]) if replied_at[t] else None for t in rows["thread_id"]
+        ])
+        return rows
+
+    def ingest_rows(self, rows) -> int:
+        frame = rows_to_frame(rows)
+        with self._lock:
+            self._load()
+            if self._pending_replies:
+                # replies the tracker saw before the sheet writer flushed these rows
+                replied = self._apply_replies(frame, self._pending_replies)
+                frame.loc[replied.index, ["replied", "replied_at"]] = replied[["replied", "replied_at"]]
+                for thread_id in replied["thread_id"]:
+                    self._pending_replies.pop(thread_id, None)
+            return self.upsert(frame)
+
+    def record_replies(self, tracker) -> int:
+        """Apply the replies the tracker found since the last call; replies to rows not seen yet are kept pending."""
+        account = getattr(tracker, "account", "")
+        replies = tracker.replies_since(self.replies_synced_at.get(account, 0.0))
+        if not replies:
+            return 0
+        with self._lock:
+            self._load()
+            replied_at = {thread_id: at for thread_id, at, _ in replies}
+            rows = self._apply_replies(self._history.reset_index(), replied_at)
+            self._pending_replies.update(
+                {thread_id: at for thread_id, at in replied_at.items() if thread_id not in set(rows["thread_id"])}
+            )
+            self.replies_synced_at[account] = max(updated_at for _, _, updated_at in replies)
+            changed = self.upsert(rows)
+            if not changed:
+                self._save()
+            return changed
+
+    def _counts(self, name, student=None):
+        with self._lock:
+            self._load()
+            return self._totals.select(name, student)
+
+    def heatmap(self, student=None, value="rate") -> pd.DataFrame:
+        """Weekday x hour grid of reply rate (value="rate"), or of "sent"/"replied" counts."""
+        slots = self._counts("slots", student)
+        if slots is None:
+            slots = np.zeros((7, 24, 2), dtype=np.int32)
+        if value == "rate":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                grid = np.where(slots[..., 0] > 0, slots[..., 1] / slots[..., 0], np.nan)
+        else:
+            grid = slots[..., {"sent": 0, "replied": 1}[value]]
+        return pd.DataFrame(grid, index=WEEKDAYS, columns=range(24))
+
+    def time_to_reply(self, student=None) -> pd.DataFrame:
+        """Replies per delay bucket, with the share and cumulative share of replies."""
+        counts = self._counts("reply_hours", student)
+        counts = np.zeros(len(REPLY_HOUR_LABELS), dtype=np.int64) if counts is None else counts.astype(np.int64)
+        share = counts / counts.sum() if counts.sum() else counts.astype(float)
+        return pd.DataFrame({"replies": counts, "share": share, "cumulative": share.cumsum()}, index=REPLY_HOUR_LABELS)
+
+    def response_rates(self, by="college", student=None) -> pd.DataFrame:
+        """Sent, replied and reply rate per college (by="college") or per "college / department"."""
+        name, vocabulary = ("by_college", "colleges") if by == "college" else ("by_department", "departments")
+        counts = self._counts(name, student)
+        if counts is None or not len(counts):
+            return pd.DataFrame(columns=["sent", "replied", "rate"])
+        table = pd.DataFrame(counts, index=list(getattr(self._totals, vocabulary)), columns=["sent", "replied"])
+        table = table[table["sent"] > 0]
+        return table.assign(rate=table["replied"] / table["sent"]).sort_values(["rate", "sent"], ascending=False)
+
+    def suggest_best_time(self, student=None) -> str:
+        slots = self._counts("slots", student)
+        if slots is None or slots[..., 0].sum() == 0:
+            return "Not enough data to suggest best timing."
+        if slots[..., 1].sum() == 0:
+            return "No replies yet to analyze best time."
+        overall = slots[..., 1].sum() / slots[..., 0].sum()
+
+        def best(counts):
+            # sparse slots are pulled towards the overall rate, so two lucky sends do not win;
+            # slots nothing was sent in would score exactly `overall` and are never suggested
+            rates = (counts[:, 1] + self.prior * overall) / (counts[:, 0] + self.prior)
+            return int(np.argmax(np.where(counts[:, 0] > 0, rates, -np.inf)))
+
+        day, hour = best(slots.sum(axis=1)), best(slots.sum(axis=0))
+        return f"Suggested outreach time: {WEEKDAYS[day]} around {hour}:00 hrs"
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics() -> OutreachAnalytics:
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = OutreachAnalytics()
+        return _analytics
@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, count: float, burst: float = None):
+        return cls(count / 60.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter for retry `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# network failures without an HTTP status, matched by class name so requests/httplib2/google-auth need not be imported:
+# builtin TimeoutError/ConnectionError, requests' ConnectionError/Timeout, httplib2's ServerNotFoundError,
+# google-auth's TransportError (a token refresh that could not reach the server) and a truncated http.client body
+NETWORK_ERRORS = {"TimeoutError", "ConnectionError", "Timeout", "ServerNotFoundError", "TransportError",
+                  "IncompleteRead"}
+
+
+def _status(error):
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code  # google.api_core errors (Gemini) carry the HTTP status as .code
+    return status
+
+
+def is_transient(error) -> bool:
+    """Worth retrying: rate limiting (408/429), a server error, a timeout or a dropped connection.
+
+    Anything else, such as a 4xx or a ValueError for a blocked response, is
+    not. Wrapped errors (LangChain re-raises API errors `from` them) are
+    judged by their cause.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = _status(error)
+        if status is not None:
+            return int(status) in (408, 429) or int(status) >= 500
+        if any(cls.__name__ in NETWORK_ERRORS for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def call_with_retries(fn, *args, max_retries=5, base_delay=1.0, retry_on=(Exception,), retry_if=None, **kwargs):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as e:
+            if attempt == max_retries or (retry_if is not None and not retry_if(e)):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            print(f"Retrying after error ({attempt + 1}/{max_retries}) in {delay:.1f}s: {e}")
+            time.sleep(delay)
@@ -1,264 +1,378 @@
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-try:
-    import pysqlite3 as sqlite3
-    sys.modules['sqlite3'] = sqlite3
-    print("Successfully overrode sqlite3 with pysqlite3")
-except ImportError:
-    print("pysqlite3 not available, using system sqlite3")
-    pass
-
-import pandas as pd
-import os
-import json
-import google.generativeai as genai
-import seaborn as sns
-import matplotlib.pyplot as plt
-import numpy as np
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_chroma import Chroma  
-
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=os.getenv("GEMINI_API_KEY2")
-)
-genai.configure(api_key=os.getenv("GEMINI_API_KEY2"))
-gemini_model = genai.GenerativeModel("gemini-2.0-flash")
-
-all_faculty_data = []
-
-import re
-
-def infer_college_name(filename: str) -> str:
-    name_map = {
-        "iitgn": "IIT Gandhinagar",
-        "iitj": "IIT Jodhpur",
-        "iitg": "IIT Guwahati",
-        "iitr": "IIT Roorkee",
-        "iitbhu": "IIT BHU (Varanasi)",
-        "iith": "IIT Hyderabad",
-        "iiti": "IIT Indore",
-        "iitd": "IIT Delhi",
-    }
-    for key, val in name_map.items():
-        if key in filename.lower():
-            return val
-    return "Unknown"
-
-def load_all_faculty_data(folder_path=None):
-    global all_faculty_data
-
-    if all_faculty_data:  # Already loaded
-        return all_faculty_data
-
-    # Dynamically resolve the absolute path of the 'faculty' folder
-    if folder_path is None:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        folder_path = os.path.join(current_dir, "faculty")
+# siblings are imported flat; this keeps them resolvable as iitgn_faculty.recommender (see README)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from corpus import BASE_DIR, load_columns
 
+CHROMA_PATH = os.path.join(BASE_DIR, ".chroma_index")
+COLLECTION_NAME = "faculty_research"
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+# "chroma" (persistent Chroma/HNSW) or "numpy" (memory-mapped brute force, see vector_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# "hybrid" (vector + BM25 fused with RRF), "semantic" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# past this, hybrid queries are answered from BM25 alone
+SEMANTIC_TIMEOUT = float(os.getenv("SEMANTIC_TIMEOUT", "3"))
+SEMANTIC_WORKERS = 2
+# semantic searches queued or running before hybrid queries stop adding more and answer from BM25
+SEMANTIC_MAX_PENDING = int(os.getenv("SEMANTIC_MAX_PENDING", str(SEMANTIC_WORKERS)))
+# after a semantic search fails or times out, hybrid queries skip it for this many seconds
+SEMANTIC_COOLDOWN = float(os.getenv("SEMANTIC_COOLDOWN", "30"))
+# fields embedded per professor and how much a match in each counts; a professor scores as their best chunk
+FIELD_WEIGHTS = {
+    "research_interests": 1.0,
+    "selected_publications": 0.9,
+    "academic_background": 0.8,
+    "work_experience": 0.8,
+}
+CHUNK_CHARS = 1000
+MIN_CHUNK_CHARS = 40
+MAX_CHUNKS_PER_FIELD = 20
+# HNSW settings for a newly created Chroma collection, e.g. CHROMA_HNSW_M=32; an existing collection keeps its own
+CHROMA_HNSW_METADATA = {
+    key: int(os.environ[env])
+    for key, env in (("hnsw:M", "CHROMA_HNSW_M"), ("hnsw:construction_ef", "CHROMA_HNSW_CONSTRUCTION_EF"),
+                     ("hnsw:search_ef", "CHROMA_HNSW_SEARCH_EF"))
+    if os.getenv(env)
+}
+# Chroma cannot group by professor, so it first fetches this many chunks per requested result, widening as needed
+CHROMA_CHUNKS_PER_RESULT = 5
+
+
+def _use_pysqlite3():
     try:
-        for file in os.listdir(folder_path):
-            if file.endswith(".json"):
-                full_path = os.path.join(folder_path, file)
-                with open(full_path, "r", encoding="utf-8") as f:
-                    try:
-                        data = json.load(f)
-                        if not isinstance(data, list):
-                            data = [data]
-
-                        college_name = infer_college_name(file)
-
-                        for prof in data:
-                            prof["college_name"] = college_name
-                            prof["profile_url"] = prof.get("profile_url", "#")
-                            prof["photo"] = prof.get("photo", "")
-                            prof["academic_background"] = prof.get("academic_background", "")
-                            prof["work_experience"] = prof.get("work_experience", "")
-                            prof["selected_publications"] = prof.get("selected_publications", "")
-
-                        all_faculty_data.extend(data)
-
-                    except Exception as e:
-                        print(f"Failed to load {file}: {e}")
-    except FileNotFoundError:
-        print(f"Faculty folder not found at: {folder_path}")
-
-    return all_faculty_data
-
-
-load_all_faculty_data()
-
-df = pd.DataFrame(all_faculty_data)
-# print(df.shape)
-df = df.drop_duplicates(subset=["name", "department"])
-
-# print(df.shape)
-
-# ax = plt.axes()
-
-# sns.heatmap(df.isnull(), cbar=False, ax=ax)
-# plt.title("Missing Values Heatmap")
-# plt.xticks(rotation=45, fontsize=6)
-# plt.yticks(fontsize=6)
-# plt.show()
-# def extract_useful_features(df):
-#     df["missing_interests"] = df["research_interests"].isnull().astype(int)
-
-#     df["has_website"] = df["website"].notnull().astype(int)
-
-#     df["has_photo"] = df["photo"].notnull().astype(int)
-
-#     df["num_keywords"] = df["research_interests"].apply(
-#         lambda x: len(x.split(",")) if pd.notnull(x) else 0
-#     )
-
-#     df["profile_url_valid"] = df["profile_url"].apply(
-#         lambda x: str(x).startswith("http")
-#     ).astype(int)
-
-#     def encode_designation(desig):
-#         if not isinstance(desig, str):
-#             return -1
-#         d = desig.lower()
-#         if "assistant" in d:
-#             return 0
-#         elif "associate" in d:
-#             return 1
-#         elif "professor" in d:
-#             return 2
-#         return -1
-
-#     df["designation_level"] = df["designation"].apply(encode_designation)
-
-#     return df
-# df = extract_useful_features(df)
-
-# column_of_interest = [
-#     "missing_interests",
-#     "has_website",
-#     "has_photo",
-#     "num_keywords",
-#     "profile_url_valid",
-#     "designation_level"
-# ]
-
-
-# correlation_matrix = df[column_of_interest].corr(method='spearman')
-
-# sns.set_theme(style="white")
-# plt.figure(figsize=(8, 10))
-
-# heatmap = sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap="coolwarm", cbar_kws={"label": "Spearman Correlation"})
-# heatmap.set_title("Correlation Heatmap of Faculty Data", fontdict={"fontsize": 16}, pad=12)
-# plt.xticks(rotation=45, fontsize=10)
-# plt.yticks(fontsize=10)
-# plt.tight_layout()
-# plt.show()
-
-
-print(df.shape)
-
-df["tag_id"], _ = pd.factorize(df["research_interests"])
-df["tagged_research_interests"] = df["tag_id"].astype(str) + " " + df["research_interests"].fillna("")
-df["tagged_research_interests"] = df["tagged_research_interests"].str.replace(r"\\,", ",", regex=True)
-
-from langchain_core.documents import Document
-
-raw_documents = [
-    Document(page_content=text)
-    for text in df["tagged_research_interests"].tolist()
-]
-text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0, separator="\n")
-documents = text_splitter.split_documents(raw_documents)
+        import pysqlite3 as sqlite3
+        sys.modules['sqlite3'] = sqlite3
+        print("Successfully overrode sqlite3 with pysqlite3")
+    except ImportError:
+        print("pysqlite3 not available, using system sqlite3")
+
+
+def chunk_field(value, chunk_chars=CHUNK_CHARS) -> list[str]:
+    """One chunk per list item (publications), long strings packed into ~chunk_chars pieces."""
+    items = value if isinstance(value, (list, tuple)) else [value]
+    chunks = []
+    for item in items:
+        words = item.replace("\\,", ",").split() if isinstance(item, str) else []
+        current, length = [], 0
+        for word in words:
+            if current and length + len(word) > chunk_chars:
+                chunks.append(" ".join(current))
+                current, length = [], 0
+            current.append(word)
+            length += len(word) + 1
+        if current:
+            chunks.append(" ".join(current))
+    return chunks
+
+
+class Recommender:
+    """Hybrid faculty recommender; pandas, embeddings and Chroma are only loaded on first use."""
+
+    def __init__(self, chroma_path=CHROMA_PATH, collection_name=COLLECTION_NAME, backend=VECTOR_BACKEND,
+                 mode=RETRIEVAL_MODE, semantic_timeout=SEMANTIC_TIMEOUT, reranker=None,
+                 semantic_max_pending=SEMANTIC_MAX_PENDING, semantic_cooldown=SEMANTIC_COOLDOWN):
+        self.chroma_path = chroma_path
+        self.collection_name = collection_name
+        self.backend = backend
+        self.mode = mode
+        self.semantic_timeout = semantic_timeout
+        self.semantic_max_pending = semantic_max_pending
+        self.semantic_cooldown = semantic_cooldown
+        self._semantic_pending = 0
+        self._semantic_pending_lock = threading.Lock()
+        self._semantic_retry_at = 0.0  # time.monotonic() before which the semantic leg is skipped
+        # a reranker.Reranker; the module-level recommender builds one from RERANKER
+        self.reranker = reranker
+        self._lock = threading.Lock()
+        self._corpus_lock = threading.Lock()
+        self._loaded = False
+        self._warmup_thread = None
+        self._executor = ThreadPoolExecutor(max_workers=SEMANTIC_WORKERS, thread_name_prefix="semantic")
+        self.last_mode = None
+        self.df = None
+        self.documents = None
+        self.embedding_model = None
+        self.vectorstore = None
+        self.numpy_store = None
+        self.records = []
+        self.row_by_id = {}
+        self.lexical = None
+
+    def _build_frame(self):
+        import pandas as pd
+
+        df = pd.DataFrame(load_columns())
+        df = df.drop_duplicates(subset=["name", "department"]).reset_index(drop=True)
+        return df
+
+    def _build_documents(self, df):
+        # {"<prof_id>:<field>:<i>": (text, metadata)}; ids are stable, so edits elsewhere never touch these rows
+        documents = {}
+        for field in FIELD_WEIGHTS:
+            for prof_id, value in zip(df["prof_id"], df[field]):
+                chunks = chunk_field(value)
+                if field != "research_interests":
+                    # scraped publication lists start with page headings like "Faculty"
+                    chunks = [c for c in chunks if len(c) >= MIN_CHUNK_CHARS][:MAX_CHUNKS_PER_FIELD]
+                for i, text in enumerate(chunks):
+                    documents[f"{prof_id}:{field}:{i}"] = (text, {"prof_id": prof_id, "field": field})
+        return documents
+
+    def _open_chroma(self):
+        _use_pysqlite3()
+        from langchain_community.vectorstores import Chroma as ChromaBase
+
+        return ChromaBase(
+            embedding_function=self.embedding_model,
+            persist_directory=self.chroma_path,
+            collection_name=self.collection_name,
+            collection_metadata=CHROMA_HNSW_METADATA or None,
+        )
+
+    def _sync(self, backend, index_path, seed_vectors=None):
+        from embedding_builder import EmbeddingBuilder
+        from index_sync import MANIFEST_NAME, Manifest, sync_index
+
+        manifest = Manifest(os.path.join(index_path, MANIFEST_NAME))
+        builder = EmbeddingBuilder(self.embedding_model.embed_documents, EMBEDDING_MODEL_NAME)
+        try:
+            stats = sync_index(self.documents, backend, manifest, builder.embed_documents, seed_vectors)
+            builder.clear_checkpoint()
+            return stats
+        except Exception as e:
+            # whatever finished is in the manifest; the next start picks up from there
+            print(f"Index sync incomplete, serving existing vectors: {e}")
+            return None
 
-import tempfile
-from langchain_chroma import Chroma
-from langchain_community.vectorstores import Chroma as ChromaBase
-import shutil
-import streamlit as st
+    def _load_vectorstore(self):
+        from index_sync import ChromaSyncBackend
 
-CHROMA_PATH = "./.chroma_index"
-COLLECTION_NAME = "faculty_research"
+        try:
+            chroma = self._open_chroma()
+        except Exception as e:
+            # Only an unreadable index is rebuilt from scratch
+            print(f"Failed to open vectorstore, recreating: {e}")
+            try:
+                import shutil
+                if os.path.exists(self.chroma_path):
+                    shutil.rmtree(self.chroma_path)
+                chroma = self._open_chroma()
+            except Exception as e2:
+                print(f"Failed to recreate vectorstore: {e2}")
+                return None
+
+        self._sync(ChromaSyncBackend(chroma._collection), self.chroma_path)
+        return chroma
 
-@st.cache_resource
-def load_vectorstore():
-    try:
-        if not os.path.exists(CHROMA_PATH):
-            os.makedirs(CHROMA_PATH)
-            chroma = ChromaBase.from_documents(
-                documents=documents,
-                embedding=embedding_model,
-                persist_directory=CHROMA_PATH,
-                collection_name=COLLECTION_NAME
+    def _load_numpy_store(self):
+        from ann_index import ANN_INDEX
+        from index_sync import MANIFEST_NAME, ChromaSyncBackend, Manifest, NumpySyncBackend
+        from vector_store import NumpyVectorStore
+
+        store = NumpyVectorStore()
+        seed_vectors = None
+        if not os.path.exists(os.path.join(store.path, MANIFEST_NAME)) and os.path.exists(self.chroma_path):
+            # First build: reuse the vectors already in Chroma
+            try:
+                chroma_manifest = Manifest(os.path.join(self.chroma_path, MANIFEST_NAME))
+                seed_vectors = ChromaSyncBackend(self._open_chroma()._collection).vectors_by_hash(chroma_manifest)
+            except Exception as e:
+                print(f"Could not reuse Chroma vectors: {e}")
+
+        self._sync(NumpySyncBackend(store, VECTOR_DTYPE, model=EMBEDDING_MODEL_NAME), store.path, seed_vectors)
+        if store.matrix is None and store.exists():
+            store.load()
+        if ANN_INDEX and store.matrix is not None:
+            try:
+                store.attach_ann(ANN_INDEX)
+            except Exception as e:
+                print(f"ANN index unavailable, using exact search: {e}")
+        return store
+
+    def load_corpus(self):
+        """DataFrame, id -> row map and BM25 index; everything local, no embedding service needed."""
+        if self.lexical is not None:
+            return self
+        with self._corpus_lock:
+            if self.lexical is not None:
+                return self
+            from lexical_index import LexicalIndex
+
+            df = self._build_frame()
+            # results are looked up here by id instead of filtering the DataFrame per query
+            self.records = df.to_dict(orient="records")
+            self.row_by_id = {prof_id: row for row, prof_id in enumerate(df["prof_id"])}
+            self.documents = self._build_documents(df)
+            self.df = df
+            self.lexical = LexicalIndex(self.records, df["prof_id"])
+        return self
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return self
+        with self._lock:
+            if self._loaded:
+                return self
+            self.load_corpus()
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            from embedding_cache import CachedEmbeddings
+
+            self.embedding_model = CachedEmbeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model=EMBEDDING_MODEL_NAME,
+                    google_api_key=os.getenv("GEMINI_API_KEY2")
+                ),
+                EMBEDDING_MODEL_NAME,
             )
-            chroma.persist()
-        else:
-            chroma = ChromaBase(
-                embedding_function=embedding_model,
-                persist_directory=CHROMA_PATH,
-                collection_name=COLLECTION_NAME
-            )
-        return chroma
-    except Exception as e:
-        # If loading fails, recreate the index
+            if self.backend == "numpy":
+                self.numpy_store = self._load_numpy_store()
+            else:
+                self.vectorstore = self._load_vectorstore()
+            self._loaded = True
+        return self
+
+    def warm_up(self):
+        """Start loading in a daemon thread so the first query does not pay for it."""
+        if self._loaded or (self._warmup_thread and self._warmup_thread.is_alive()):
+            return self._warmup_thread
+        self._warmup_thread = threading.Thread(target=self._warm_up, name="recommender-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warm_up(self):
         try:
-            import shutil
-            if os.path.exists(CHROMA_PATH):
-                shutil.rmtree(CHROMA_PATH)
-            os.makedirs(CHROMA_PATH)
-            chroma = ChromaBase.from_documents(
-                documents=documents,
-                embedding=embedding_model,
-                persist_directory=CHROMA_PATH,
-                collection_name=COLLECTION_NAME
-            )
-            chroma.persist()
-            return chroma
-        except Exception as e2:
-            print(f"Failed to recreate vectorstore: {e2}")
+            self.ensure_loaded()
+        except Exception as e:
+            print(f"Recommender warm-up failed: {e}")
+
+    def _search_ids(self, query, top_k):
+        self.ensure_loaded()
+        if self.numpy_store is not None:
+            query_vector = self.embedding_model.embed_query(query)
+            return [prof_id for prof_id, _ in self.numpy_store.search_grouped(query_vector, top_k, FIELD_WEIGHTS)]
+        if self.vectorstore is None:
+            return []
+        return self._search_chroma(self.embedding_model.embed_query(query), top_k)
+
+    def _search_chroma(self, query_vector, top_k):
+        """Best weighted chunk per professor, fetching more chunks until no unseen one could change the top_k."""
+        relevance = self.vectorstore._select_relevance_score_fn()
+        max_weight = max(FIELD_WEIGHTS.values())
+        k = top_k * CHROMA_CHUNKS_PER_RESULT
+        while True:
+            recs = self.vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
+            best = {}
+            for doc, distance in recs:
+                prof_id = doc.metadata.get("prof_id")
+                score = relevance(distance) * FIELD_WEIGHTS.get(doc.metadata.get("field"), 1.0)
+                if score > best.get(prof_id, float("-inf")):
+                    best[prof_id] = score
+            ranked = sorted(best, key=best.get, reverse=True)[:top_k]
+            # chunks come back best first; anything not fetched scores at most max_weight * the last one
+            bound = max_weight * relevance(recs[-1][1]) if recs else float("-inf")
+            if len(recs) < k or (len(ranked) == top_k and best[ranked[-1]] >= bound):
+                return ranked
+            k *= 4
+
+    def _semantic_done(self, future):
+        with self._semantic_pending_lock:
+            self._semantic_pending -= 1
+
+    def _semantic_ids(self, query, top_k, timeout):
+        """Semantic ids within `timeout`, or None to answer from BM25 only.
+
+        A failure or timeout skips the semantic leg for `semantic_cooldown`
+        seconds, and at most `semantic_max_pending` searches are queued or
+        running, so a struggling embedding service never holds queries up.
+        """
+        if time.monotonic() < self._semantic_retry_at:
             return None
+        with self._semantic_pending_lock:
+            if self._semantic_pending >= self.semantic_max_pending:
+                print("Semantic search backed up, answering from BM25 only")
+                return None
+            self._semantic_pending += 1
+        # same pattern as serp.safe_generate: a hung embedding call must not hang the query
+        future = self._executor.submit(self._search_ids, query, top_k)
+        future.add_done_callback(self._semantic_done)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            print(f"Semantic search slower than {timeout}s, answering from BM25 only for {self.semantic_cooldown:g}s")
+        except Exception as e:
+            print(f"Semantic search failed, answering from BM25 only for {self.semantic_cooldown:g}s: {e}")
+        self._semantic_retry_at = time.monotonic() + self.semantic_cooldown
+        return None
+
+    def search_ids(self, query: str, top_k: int = 10, mode: str = None) -> list[str]:
+        mode = mode or self.mode
+        if mode == "semantic":
+            self.last_mode = "semantic"
+            return self._search_ids(query, top_k)
+
+        self.load_corpus()
+        lexical_ids = [prof_id for prof_id, _ in self.lexical.search(query, top_k)]
+        semantic_ids = None
+        if mode != "lexical":
+            semantic_ids = self._semantic_ids(query, top_k, self.semantic_timeout)
+        if not semantic_ids:
+            self.last_mode = "lexical"
+            return lexical_ids
+
+        from lexical_index import reciprocal_rank_fusion
+
+        self.last_mode = "hybrid"
+        return reciprocal_rank_fusion([semantic_ids, lexical_ids], limit=top_k)
+
+    def recommend(self, query: str, top_k: int = 10, mode: str = None) -> list[dict]:
+        if self.reranker is None:
+            prof_ids = self.search_ids(query, top_k, mode)
+        else:
+            from reranker import RERANK_CANDIDATES, profile_text
 
-db_df = load_vectorstore()
+            candidates = self.search_ids(query, max(top_k, RERANK_CANDIDATES), mode)
+            candidates = [i for i in candidates if i in self.row_by_id]
+            prof_ids = self.reranker.rerank(
+                query, [(i, profile_text(self.records[self.row_by_id[i]])) for i in candidates]
+            )[:top_k]
+        return [dict(self.records[self.row_by_id[i]]) for i in prof_ids if i in self.row_by_id]
 
 
-# query = "Sensor networks, Machine learning with sustainibility"
-# docs = db_df.similarity_search(query, k=10)
+def _default_reranker():
+    # reranker pulls in the SQLite cache; only import it when re-ranking is switched on
+    if not os.getenv("RERANKER"):
+        return None
+    from reranker import make_reranker
 
-# tag_ids = [int(doc.page_content.split()[0]) for doc in docs]
-# data = df[df["tag_id"].isin(tag_ids)]
+    return make_reranker(os.getenv("RERANKER"))
 
-def retrieve_symantic_recommendations(query: str, top_k: int = 10) -> list[dict]:
-    recs = db_df.similarity_search(query, k=top_k * 10)  
 
-    prof_ids = []
-    seen = set()
+recommender = Recommender(reranker=_default_reranker())
+
+
+def load_vectorstore():
+    return recommender.ensure_loaded().vectorstore
 
-    for doc in recs:
-        try:
-            content = doc.page_content.strip().strip('"')
-            parts = content.split()
-            if parts and parts[0].isdigit():
-                tag = int(parts[0])
-            else:
-                continue
-        except (ValueError, IndexError):
-            continue
-        if tag not in seen:
-            prof_ids.append(tag)
-            seen.add(tag)
-        if len(prof_ids) >= top_k:
-            break
 
-    result_df = df[df["tag_id"].isin(prof_ids)]
-    result_df = result_df.drop(columns=["tag_id", "tagged_research_interests"], errors="ignore")
+def warm_up():
+    return recommender.warm_up()
 
-    return result_df.to_dict(orient="records")
 
+def embedding_cache_stats() -> dict:
+    if recommender.embedding_model is None:
+        return {}
+    return recommender.embedding_model.stats()
 
 
+def last_retrieval_mode():
+    return recommender.last_mode
 
 
+def retrieve_symantic_recommendations(query: str, top_k: int = 10, mode: str = None) -> list[dict]:
+    return recommender.recommend(query, top_k, mode)
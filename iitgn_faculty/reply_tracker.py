@@ -0,0 +1,271 @@
+"""Reply status for outreach threads, synced from Gmail into a local mirror.
+
+The mirror maps every tracked thread to its spreadsheet row and status.
+A sync reads only what changed in the mailbox since the last sync (the
+Gmail history API, from a stored historyId); a full baseline, which fetches
+the still-awaiting threads in batched requests, happens only on the first
+sync or when the stored historyId has expired. Rows whose status changed
+are pushed back to the sheets with one values.batchUpdate per spreadsheet.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from client_pool import get_pool
+from kv_cache import CACHE_DIR
+from rate_limit import call_with_retries, is_transient
+from sheet_writer import SHEET_HEADER
+
+REPLY_TRACKER_PATH = os.path.join(CACHE_DIR, "reply_tracker.sqlite3")
+GMAIL_BATCH_SIZE = 50  # Gmail's recommended ceiling for one batch request
+AWAITING, REPLIED = "Awaiting Reply", "Replied"
+STATUS_COLUMN = chr(ord("A") + SHEET_HEADER.index("Reply Status"))
+THREAD_COLUMN = SHEET_HEADER.index("Thread ID")
+
+
+def _status_code(error):
+    return getattr(getattr(error, "resp", None), "status", None)
+
+
+def is_reply(message: dict) -> bool:
+    """A message in an outreach thread that the student did not send."""
+    labels = message.get("labelIds") or []
+    return "SENT" not in labels and "DRAFT" not in labels
+
+
+class ReplyTracker:
+    """Mirror of one account's outreach threads; trackers for several accounts can share the database."""
+
+    def __init__(self, gmail=None, sheets=None, path=REPLY_TRACKER_PATH, batch_size=GMAIL_BATCH_SIZE, creds=None,
+                 account=None):
+        self.creds = creds
+        self.account = account if account is not None else (get_pool().account(creds) if creds is not None else "")
+        self._gmail = gmail
+        self._sheets = sheets
+        self.path = path
+        self.batch_size = batch_size
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(threads)")}
+            if columns and "account" not in columns:
+                # thread ids are only unique within a mailbox: rebuild keyed by (account, thread_id);
+                # threads tracked before accounts were recorded keep the unknown ("") account
+                conn.execute("ALTER TABLE threads RENAME TO threads_unscoped")
+                if "replied_at" not in columns:
+                    conn.execute("ALTER TABLE threads_unscoped ADD COLUMN replied_at REAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS threads (account TEXT NOT NULL DEFAULT '', thread_id TEXT NOT NULL, "
+                "spreadsheet_id TEXT, row INTEGER, status TEXT NOT NULL, synced_status TEXT, updated_at REAL, "
+                "replied_at REAL, PRIMARY KEY (account, thread_id))"
+            )
+            if columns and "account" not in columns:
+                conn.execute("INSERT INTO threads (thread_id, spreadsheet_id, row, status, synced_status, updated_at, "
+                             "replied_at) SELECT thread_id, spreadsheet_id, row, status, synced_status, updated_at, "
+                             "replied_at FROM threads_unscoped")
+                conn.execute("DROP TABLE threads_unscoped")
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_pending ON threads (account, status, synced_status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_updated ON threads (account, status, updated_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (account TEXT PRIMARY KEY, history_id TEXT)")
+
+    @property
+    def gmail(self):
+        # one service per account from the pool; each request checks out its own HTTP connection
+        return self._gmail or get_pool().build("gmail", "v1", self.creds)
+
+    @property
+    def sheets(self):
+        return self._sheets or get_pool().build("sheets", "v4", self.creds)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _execute(self, request):
+        self.api_calls += 1
+        return call_with_retries(request.execute, max_retries=4, retry_if=is_transient)
+
+    def track(self, thread_id, spreadsheet_id=None, row=None, status=AWAITING):
+        """Start (or keep) tracking a thread; known statuses are never downgraded."""
+        if not thread_id:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO threads (thread_id, account, spreadsheet_id, row, status, synced_status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(account, thread_id) DO UPDATE SET "
+                "spreadsheet_id = COALESCE(excluded.spreadsheet_id, spreadsheet_id), "
+                "row = COALESCE(excluded.row, row)",
+                (thread_id, self.account, spreadsheet_id, row, status, status, time.time()),
+            )
+
+    def load_sheet(self, spreadsheet_id, rows, first_row=1):
+        """Register the threads of sheet rows starting at sheet row first_row (1 = the header row).
+
+        A Replied status already on the sheet is taken over; otherwise the
+        mirror's status wins and a difference is pushed on the next push_changes.
+        """
+        with closing(self._connect()) as conn, conn:
+            for offset, values in enumerate(rows):
+                thread_id = values[THREAD_COLUMN] if len(values) > THREAD_COLUMN else ""
+                if not thread_id or thread_id == SHEET_HEADER[THREAD_COLUMN]:
+                    continue
+                status = values[SHEET_HEADER.index("Reply Status")] or AWAITING
+                conn.execute(
+                    "INSERT INTO threads (thread_id, account, spreadsheet_id, row, status, synced_status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(account, thread_id) DO UPDATE SET "
+                    "spreadsheet_id = excluded.spreadsheet_id, row = excluded.row, "
+                    "status = CASE WHEN excluded.status = ? THEN excluded.status ELSE status END, "
+                    "synced_status = excluded.synced_status",
+                    (thread_id, self.account, spreadsheet_id, first_row + offset, status, status, time.time(),
+                     REPLIED),
+                )
+
+    def statuses(self, thread_ids=None) -> dict:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT thread_id, status FROM threads WHERE account = ?", (self.account,)).fetchall()
+        statuses = dict(rows)
+        return statuses if thread_ids is None else {t: statuses[t] for t in thread_ids if t in statuses}
+
+    def replies_since(self, since=0.0) -> list[tuple]:
+        """(thread_id, replied_at, updated_at) of threads marked Replied after `since` (epoch seconds)."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT thread_id, replied_at, updated_at FROM threads WHERE account = ? AND status = ? "
+                "AND updated_at > ?",
+                (self.account, REPLIED, since),
+            ).fetchall()
+
+    def _mark_replied(self, replied):
+        """replied maps thread id -> time of the reply (epoch seconds)."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            return conn.executemany(
+                "UPDATE threads SET status = ?, replied_at = ?, updated_at = ? WHERE thread_id = ? AND account = ? "
+                "AND status = ?",
+                [(REPLIED, replied_at, now, thread_id, self.account, AWAITING) for thread_id, replied_at in replied.items()],
+            ).rowcount
+
+    def _awaiting(self):
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT thread_id FROM threads WHERE account = ? AND status = ?",
+                                                   (self.account, AWAITING))}
+
+    def _baseline(self):
+        """Fetch every awaiting thread, batch_size per HTTP request; returns {thread id: first reply time}."""
+        replied = {}
+
+        def collect(request_id, response, exception):
+            if exception is not None:
+                print(f"Could not fetch thread {request_id}: {exception}")
+                return
+            times = [int(m.get("internalDate", 0)) / 1000 for m in response.get("messages", []) if is_reply(m)]
+            if times:
+                replied[request_id] = min(times) or time.time()
+
+        awaiting = sorted(self._awaiting())
+        for start in range(0, len(awaiting), self.batch_size):
+            batch = self.gmail.new_batch_http_request(callback=collect)
+            for thread_id in awaiting[start:start + self.batch_size]:
+                batch.add(self.gmail.users().threads().get(
+                    userId="me", id=thread_id, format="minimal", fields="id,messages(id,labelIds,internalDate)"
+                ), request_id=thread_id)
+            self._execute(batch)
+        return replied
+
+    def _history(self, start_history_id):
+        """(thread ids with a new incoming message, latest historyId) since start_history_id."""
+        threads, page_token, history_id = set(), None, start_history_id
+        while True:
+            response = self._execute(self.gmail.users().history().list(
+                userId="me", startHistoryId=start_history_id, historyTypes=["messageAdded"], maxResults=500,
+                pageToken=page_token,
+            ))
+            for record in response.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    message = added.get("message", {})
+                    if is_reply(message):
+                        threads.add(message.get("threadId"))
+            history_id = response.get("historyId", history_id)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return threads, history_id
+
+    def sync(self) -> int:
+        """Bring the mirror up to date with the mailbox; returns how many threads became Replied."""
+        with self._lock:
+            profile = self._execute(self.gmail.users().getProfile(userId="me"))
+            account = profile.get("emailAddress", "me")
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT history_id FROM sync_state WHERE account = ?", (account,)).fetchone()
+
+            replied, history_id = None, profile["historyId"]
+            if row:
+                try:
+                    threads, history_id = self._history(row[0])
+                    # history records carry no message date; the sync time bounds the reply time
+                    replied = dict.fromkeys(threads & self._awaiting(), time.time())
+                except Exception as e:
+                    if _status_code(e) != 404:
+                        raise
+                    print("Gmail history expired, resyncing reply status from threads")
+            if replied is None:
+                # profile's historyId was read before the threads, so nothing between is lost
+                replied = self._baseline()
+
+            changed = self._mark_replied(replied)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (account, str(history_id)))
+            return changed
+
+    def push_changes(self) -> int:
+        """Write this account's changed statuses to their sheets, one batchUpdate per spreadsheet."""
+        with closing(self._connect()) as conn:
+            changed = conn.execute(
+                "SELECT thread_id, spreadsheet_id, row, status FROM threads WHERE account = ? "
+                "AND status IS NOT synced_status AND spreadsheet_id IS NOT NULL AND row IS NOT NULL "
+                "ORDER BY spreadsheet_id, row", (self.account,)
+            ).fetchall()
+        by_sheet = {}
+        for thread_id, spreadsheet_id, row, status in changed:
+            by_sheet.setdefault(spreadsheet_id, []).append((thread_id, row, status))
+
+        pushed, error = 0, None
+        for spreadsheet_id, updates in by_sheet.items():
+            try:
+                self._execute(self.sheets.spreadsheets().values().batchUpdate(spreadsheetId=spreadsheet_id, body={
+                    "valueInputOption": "RAW",
+                    "data": [{"range": f"{STATUS_COLUMN}{row}", "values": [[status]]} for _, row, status in updates],
+                }))
+            except Exception as e:
+                # the sheet's statuses stay unsynced and go out on the next push
+                print(f"Could not update reply status on {spreadsheet_id}: {e}")
+                error = error or e
+                continue
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("UPDATE threads SET synced_status = status WHERE account = ? AND thread_id = ?",
+                                 [(self.account, thread_id) for thread_id, _, _ in updates])
+            pushed += len(updates)
+        if error is not None:
+            raise error
+        return pushed
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_reply_tracker(creds):
+    with _trackers_lock:
+        if creds not in _trackers:
+            _trackers[creds] = ReplyTracker(creds=creds)
+        return _trackers[creds]
+
+
+def sync_replies(creds):
+    """One incremental sync plus the sheet updates it implies: (threads newly replied, rows pushed)."""
+    tracker = get_reply_tracker(creds)
+    return tracker.sync(), tracker.push_changes()
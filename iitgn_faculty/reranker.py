@@ -0,0 +1,194 @@
+"""Second-stage re-ranking of the recommender's top candidates.
+
+A scorer turns (student query, professor profile) pairs into relevance
+scores. Scores are cached on disk per (scorer, query hash, professor id),
+and scoring runs against a per-request latency budget: if the uncached
+pairs cannot be scored in time, the first-stage order is returned and the
+scores still land in the cache for the next request. Once max_pending jobs
+are queued or running, new requests skip scoring so a backlog never builds up.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from embedding_cache import normalize_query
+from kv_cache import CACHE_DIR, SqliteCache
+
+RERANKER = os.getenv("RERANKER", "")  # "", "cross-encoder", "gemini" or "keyword"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "800"))
+RERANK_WORKERS = 2
+# scoring jobs queued or running before requests skip re-ranking; at RERANK_WORKERS nothing ever waits for a worker
+RERANK_MAX_PENDING = int(os.getenv("RERANK_MAX_PENDING", str(RERANK_WORKERS)))
+RERANK_CACHE_PATH = os.path.join(CACHE_DIR, "rerank_scores.sqlite3")
+RERANK_CACHE_TTL = 30 * 24 * 3600
+RERANK_CACHE_MAX_ENTRIES = 200_000
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+GEMINI_RERANK_MODEL = "gemini-2.0-flash"
+PROFILE_CHARS = 1500
+
+
+def profile_text(prof: dict) -> str:
+    """What the scorer sees of a professor: who they are, their interests, then publications."""
+    publications = prof.get("selected_publications")
+    if isinstance(publications, (list, tuple)):
+        publications = "; ".join(str(p) for p in publications)
+    parts = [prof.get("name"), prof.get("designation"), prof.get("department"), prof.get("college_name"),
+             prof.get("research_interests"), publications]
+    text = ". ".join(p.replace("\\,", ",") for p in parts if isinstance(p, str) and p)
+    return text[:PROFILE_CHARS]
+
+
+class KeywordScorer:
+    """Offline scorer (tests, benchmarks): fraction of query terms found in the profile."""
+
+    name = "keyword"
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        from lexical_index import tokenize
+
+        terms = set(tokenize(query))
+        if not terms:
+            return [0.0] * len(texts)
+        return [len(terms & set(tokenize(text))) / len(terms) for text in texts]
+
+
+class CrossEncoderScorer:
+    """Small local cross-encoder (sentence-transformers), loaded on first use."""
+
+    def __init__(self, model_name=CROSS_ENCODER_MODEL):
+        self.name = f"cross-encoder:{model_name}"
+        self.model_name = model_name
+        self._model = None
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name)
+        return [float(s) for s in self._model.predict([(query, text) for text in texts])]
+
+
+class GeminiScorer:
+    """Asks Gemini to grade every candidate 0-10 in a single request."""
+
+    def __init__(self, model_name=GEMINI_RERANK_MODEL):
+        self.name = f"gemini:{model_name}"
+        self.model_name = model_name
+        self._model = None
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY2"))
+            self._model = genai.GenerativeModel(self.model_name)
+        profiles = "\n".join(f"{i}. {text}" for i, text in enumerate(texts))
+        prompt = f"""
+Rate how well each professor matches the student's research interests, from 0 (unrelated) to 10 (ideal supervisor).
+
+Student: {query}
+
+Professors:
+{profiles}
+
+Reply with only a JSON list of {len(texts)} numbers, in the same order.
+"""
+        response = self._model.generate_content(prompt)
+        match = re.search(r"\[.*\]", response.text, re.S)
+        scores = json.loads(match.group(0)) if match else []
+        if len(scores) != len(texts):
+            raise ValueError(f"expected {len(texts)} scores, got {len(scores)}")
+        return [float(s) for s in scores]
+
+
+SCORERS = {"keyword": KeywordScorer, "cross-encoder": CrossEncoderScorer, "gemini": GeminiScorer}
+
+
+class Reranker:
+    def __init__(self, scorer, budget_ms=RERANK_BUDGET_MS, cache_path=RERANK_CACHE_PATH,
+                 ttl=RERANK_CACHE_TTL, max_entries=RERANK_CACHE_MAX_ENTRIES, max_pending=RERANK_MAX_PENDING):
+        self.scorer = scorer
+        self.budget_ms = budget_ms
+        self.max_pending = max_pending
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.cache = SqliteCache(cache_path, table="rerank_scores", ttl=ttl, max_entries=max_entries) if cache_path else None
+        self._executor = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+        self.last_status = None
+
+    def _key(self, query_hash, prof_id):
+        return f"{self.scorer.name}:{query_hash}:{prof_id}"
+
+    def _submit(self, *args):
+        """Queue a scoring job, or return None when max_pending jobs are already queued or running."""
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        future = self._executor.submit(self._score_and_cache, *args)
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _score_and_cache(self, query, query_hash, pending):
+        scores = self.scorer.score(query, [text for _, text in pending])
+        scores = dict(zip((prof_id for prof_id, _ in pending), scores))
+        if self.cache is not None:
+            try:
+                self.cache.set_many((self._key(query_hash, prof_id), score) for prof_id, score in scores.items())
+            except Exception as e:
+                print(f"Rerank cache write failed: {e}")
+        return scores
+
+    def rerank(self, query: str, candidates: list[tuple]) -> list[str]:
+        """Reorder [(prof_id, profile text)] best first; first-stage order if the budget runs out."""
+        start = time.perf_counter()
+        order = [prof_id for prof_id, _ in candidates]
+        if not candidates:
+            self.last_status = "empty"
+            return order
+
+        query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:32]
+        scores = {}
+        if self.cache is not None:
+            try:
+                keys = {self._key(query_hash, prof_id): prof_id for prof_id in order}
+                scores = {keys[key]: score for key, score in self.cache.get_many(keys).items()}
+            except Exception as e:
+                print(f"Rerank cache read failed: {e}")
+
+        pending = [(prof_id, text) for prof_id, text in candidates if prof_id not in scores]
+        self.last_status = "cached"
+        if pending:
+            future = self._submit(query, query_hash, pending)
+            if future is None:
+                print("Re-ranker backed up, keeping first-stage order")
+                self.last_status = "busy"
+                return order
+            remaining = self.budget_ms / 1000 - (time.perf_counter() - start)
+            try:
+                scores.update(future.result(timeout=max(remaining, 0)))
+                self.last_status = "scored"
+            except FutureTimeoutError:
+                # a job that already started still caches its scores; one still queued is dropped
+                future.cancel()
+                print(f"Re-ranking over its {self.budget_ms:.0f}ms budget, keeping first-stage order")
+                self.last_status = "timeout"
+                return order
+            except Exception as e:
+                print(f"Re-ranking failed, keeping first-stage order: {e}")
+                self.last_status = "error"
+                return order
+
+        rank = {prof_id: i for i, prof_id in enumerate(order)}
+        return sorted(order, key=lambda prof_id: (-scores[prof_id], rank[prof_id]))
+
+
+def make_reranker(kind=RERANKER, **kwargs):
+    return Reranker(SCORERS[kind](), **kwargs) if kind else None
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from functools import lru_cache
+
+GRAM_SIZE = 3
+
+
+def normalize(text) -> str:
+    return (text or "").strip().lower()
+
+
+def _grams(text: str) -> set[str]:
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _build_gram_index(values: list[str]) -> dict[str, frozenset]:
+    index = defaultdict(set)
+    for row_id, value in enumerate(values):
+        for gram in _grams(value):
+            index[gram].add(row_id)
+    return {gram: frozenset(ids) for gram, ids in index.items()}
+
+
+def _build_exact_index(values: list[str]) -> dict[str, frozenset]:
+    index = defaultdict(set)
+    for row_id, value in enumerate(values):
+        index[value].add(row_id)
+    return {value: frozenset(ids) for value, ids in index.items()}
+
+
+class FacultySearchIndex:
+    """Prebuilt filter index over faculty records.
+
+    Department and college are exact-match dictionaries; name and research
+    interest substrings go through a trigram inverted index, so a query is a
+    handful of set intersections plus a substring check on the survivors
+    instead of a scan over every professor. Results are row positions into the
+    records the index was built from, cached per query tuple.
+    """
+
+    def __init__(self, records: list[dict], cache_size: int = 512):
+        self.size = len(records)
+        self.all_ids = frozenset(range(self.size))
+
+        self.names = [normalize(p.get("name")) for p in records]
+        self.interests = [normalize(p.get("research_interests")) for p in records]
+        self.by_department = _build_exact_index([normalize(p.get("department")) for p in records])
+        self.by_college = _build_exact_index([normalize(p.get("college_name")) for p in records])
+        self.name_grams = _build_gram_index(self.names)
+        self.interest_grams = _build_gram_index(self.interests)
+
+        self.search = lru_cache(maxsize=cache_size)(self._search)
+
+    def _exact(self, index, value):
+        if value in index:
+            return index[value]
+        # the UI passes exact option values; substring match keeps free text working
+        matches = set()
+        for key, ids in index.items():
+            if value in key:
+                matches |= ids
+        return matches
+
+    def _substring(self, gram_index, values, query, candidates):
+        if len(query) >= GRAM_SIZE:
+            postings = sorted((gram_index.get(g, frozenset()) for g in _grams(query)), key=len)
+            for ids in postings:
+                candidates = candidates & ids
+                if not candidates:
+                    return candidates
+        # trigrams only bound the candidates; confirm the contiguous substring
+        return {i for i in candidates if query in values[i]}
+
+    def _search(self, department="All", name="", interest="", college="") -> tuple[int, ...]:
+        candidates = self.all_ids
+
+        department = normalize(department)
+        if department and department != "all":
+            candidates = candidates & self.by_department.get(department, frozenset())
+
+        college = normalize(college)
+        if college and candidates:
+            candidates = candidates & self._exact(self.by_college, college)
+
+        name = normalize(name)
+        if name and candidates:
+            candidates = self._substring(self.name_grams, self.names, name, candidates)
+
+        interest = normalize(interest)
+        if interest and candidates:
+            candidates = self._substring(self.interest_grams, self.interests, interest, candidates)
+
+        return tuple(sorted(candidates))
+
+    def filter(self, records: list[dict], department="All", name="", interest="", college="") -> list[dict]:
+        return [records[i] for i in self.search(department, name, interest, college)]
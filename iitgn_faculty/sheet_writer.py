@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from client_pool import get_pool
+from kv_cache import CACHE_DIR
+from rate_limit import call_with_retries, is_transient
+
+SHEET_HEADER = ["Timestamp", "Student", "Professor", "Email", "Intent", "Email Text", "Reply Status", "Thread ID"]
+SHEET_WRITER_PATH = os.path.join(CACHE_DIR, "sheets.sqlite3")
+SHEET_FLUSH_ROWS = int(os.getenv("SHEET_FLUSH_ROWS", "25"))
+SHEET_FLUSH_SECONDS = float(os.getenv("SHEET_FLUSH_SECONDS", "30"))
+
+
+def sheet_title(student_name):
+    return f"{student_name} Outreach History"
+
+
+class SheetWriter:
+    """Buffers outreach rows on disk and writes them with one values.append per spreadsheet.
+
+    Spreadsheet ids are cached by title, so the Drive search behind
+    gspread's client.open runs once per student instead of once per row.
+    Queued rows survive a crash and go out on the next flush, which happens
+    when a spreadsheet has `flush_rows` rows waiting, `flush_seconds` after
+    the first queued row, or on an explicit flush(). Ids and queued rows are
+    scoped to the account, so writers for different users sharing the cache
+    file never touch each other's sheets.
+    """
+
+    def __init__(self, creds, client=None, flush_rows=SHEET_FLUSH_ROWS, flush_seconds=SHEET_FLUSH_SECONDS,
+                 path=SHEET_WRITER_PATH, service=None, account=None):
+        self.creds = creds
+        self.account = account if account is not None else get_pool().account(creds)
+        self._client = client
+        self._service = service
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.path = path
+        self.api_calls = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        self.on_flush = None  # called as on_flush(spreadsheet_id, rows, first_row) after each append
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # replaces the unscoped spreadsheet_ids cache; ids are looked up again on first use
+            conn.execute("CREATE TABLE IF NOT EXISTS sheet_ids (account TEXT NOT NULL, title TEXT NOT NULL, "
+                         "spreadsheet_id TEXT, PRIMARY KEY (account, title))")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_rows "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, student TEXT, row TEXT, queued_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pending_rows)")}
+            if "account" not in columns:
+                # rows queued before accounts were recorded stay with the unknown ("") account
+                conn.execute("ALTER TABLE pending_rows ADD COLUMN account TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS pending_account ON pending_rows (account, student)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @property
+    def service(self):
+        # the pool's services check out a connection per request, so timer and worker flushes can share one
+        return self._service or get_pool().build("sheets", "v4", self.creds)
+
+    @property
+    def client(self):
+        return self._client or get_pool().gspread_client(self.creds)
+
+    def _execute(self, request):
+        self.api_calls += 1
+        return call_with_retries(request.execute, max_retries=4, retry_if=is_transient)
+
+    def resolve(self, student_name):
+        """(spreadsheet_id, created) for the student's outreach sheet, creating it if needed."""
+        with self._lock:
+            return self._resolve(student_name)
+
+    def _resolve(self, student_name):
+        import gspread
+
+        title = sheet_title(student_name)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT spreadsheet_id FROM sheet_ids WHERE account = ? AND title = ?",
+                               (self.account, title)).fetchone()
+        if row:
+            return row[0], False
+
+        created = False
+        try:
+            self.api_calls += 1
+            spreadsheet_id = self.client.open(title).id
+        except gspread.SpreadsheetNotFound:
+            spreadsheet = self._execute(self.service.spreadsheets().create(body={"properties": {"title": title}}))
+            spreadsheet_id = spreadsheet["spreadsheetId"]
+            self._execute(self.service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id, range="A1", valueInputOption="RAW", body={"values": [SHEET_HEADER]}
+            ))
+            created = True
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO sheet_ids VALUES (?, ?, ?)", (self.account, title, spreadsheet_id))
+        return spreadsheet_id, created
+
+    def read_rows(self, student_name):
+        """Every row of the student's sheet (header first) in one values.get."""
+        spreadsheet_id, _ = self.resolve(student_name)
+        result = self._execute(self.service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range="A:H"))
+        # the API drops trailing empty cells, so pad rows back to the header width
+        return [row + [""] * (len(SHEET_HEADER) - len(row)) for row in result.get("values", [])]
+
+    def append(self, student_name, row):
+        """Queue one row; returns the number of rows written if this triggered a flush."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT INTO pending_rows (account, student, row, queued_at) VALUES (?, ?, ?, ?)",
+                         (self.account, student_name, json.dumps(row, default=str), time.time()))
+            waiting, oldest = conn.execute(
+                "SELECT COUNT(*), MIN(queued_at) FROM pending_rows WHERE account = ? AND student = ?",
+                (self.account, student_name),
+            ).fetchone()
+        if waiting >= self.flush_rows or time.time() - oldest >= self.flush_seconds:
+            return self.flush(student_name)
+        self._schedule_flush()
+        return 0
+
+    def _schedule_flush(self):
+        with self._lock:
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Timer(self.flush_seconds, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Sheet flush failed, rows stay queued: {e}")
+
+    def pending(self, student_name=None) -> int:
+        query, params = "SELECT COUNT(*) FROM pending_rows WHERE account = ?", (self.account,)
+        if student_name:
+            query, params = query + " AND student = ?", (*params, student_name)
+        with closing(self._connect()) as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def flush(self, student_name=None) -> int:
+        """Write this account's queued rows (or one student's) with a single values.append per spreadsheet."""
+        with self._lock:
+            with closing(self._connect()) as conn:
+                query, params = "SELECT id, student, row FROM pending_rows WHERE account = ?", (self.account,)
+                if student_name:
+                    query, params = query + " AND student = ?", (*params, student_name)
+                queued = conn.execute(query + " ORDER BY id", params).fetchall()
+
+            by_student = {}
+            for row_id, student, row in queued:
+                by_student.setdefault(student, []).append((row_id, json.loads(row)))
+
+            written, error = 0, None
+            for student, rows in by_student.items():
+                values = [row for _, row in rows]
+                try:
+                    spreadsheet_id, _ = self.resolve(student)
+                    response = self._execute(self.service.spreadsheets().values().append(
+                        spreadsheetId=spreadsheet_id, range="A1", valueInputOption="RAW",
+                        insertDataOption="INSERT_ROWS", body={"values": values},
+                    ))
+                except Exception as e:
+                    # one unwritable sheet keeps its rows queued without holding back the others
+                    print(f"Could not log {len(rows)} rows for {student}, they stay queued: {e}")
+                    error = error or e
+                    continue
+                with closing(self._connect()) as conn, conn:
+                    conn.executemany("DELETE FROM pending_rows WHERE id = ?", [(row_id,) for row_id, _ in rows])
+                written += len(rows)
+                first_row = _first_row(response.get("updates", {}).get("updatedRange", ""))
+                if self.on_flush is not None and first_row:
+                    self.on_flush(spreadsheet_id, values, first_row)
+                print(f"📬 Logged {len(rows)} rows to https://docs.google.com/spreadsheets/d/{spreadsheet_id}")
+            if error is not None:
+                raise error
+            return written
+
+
+def _first_row(updated_range):
+    """Sheet row number an append landed on, from a range like "Sheet1!A12:H41"."""
+    match = re.search(r"[A-Z]+(\d+)", updated_range.rpartition("!")[2])
+    return int(match.group(1)) if match else None
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_sheet_writer(creds, client=None):
+    """One writer per set of credentials, so the id cache and queue are shared across calls."""
+    with _writers_lock:
+        if creds not in _writers:
+            _writers[creds] = SheetWriter(creds, client)
+        return _writers[creds]
@@ -0,0 +1,45 @@
+import importlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+import ann_index
+from vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def hnsw_ef_env(monkeypatch):
+    pytest.importorskip("hnswlib")
+    monkeypatch.setenv("HNSW_EF_SEARCH", "300")
+    yield importlib.reload(ann_index)
+    monkeypatch.delenv("HNSW_EF_SEARCH")
+    importlib.reload(ann_index)
+
+
+def test_search_params_from_the_environment_win_over_saved_ones(tmp_path, hnsw_ef_env):
+    vectors = np.random.default_rng(0).normal(size=(200, 8)).astype(np.float32)
+    path = str(tmp_path)
+    hnsw_ef_env.load_or_build("hnsw", path, vectors, "fp", ef_search=64)
+    with open(os.path.join(path, "ann.json"), encoding="utf-8") as f:
+        assert json.load(f)["params"]["ef_search"] == 64
+
+    assert hnsw_ef_env.load_or_build("hnsw", path, vectors, "fp").params["ef_search"] == 300
+
+
+def test_grouped_ann_search_widens_until_k_groups_are_found(tmp_path):
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16).astype(np.float32)
+    # one professor owns the 40 chunks nearest the query, so the first fetch only sees them
+    near = query + 0.05 * rng.normal(size=(40, 16))
+    far = rng.normal(size=(60, 16))
+    ids = [f"p0:bio:{i}" for i in range(40)] + [f"p{1 + i % 6}:bio:{i}" for i in range(60)]
+    store = NumpyVectorStore(str(tmp_path)).save(np.vstack([near, far]), ids)
+    exact = store.search_grouped(query, k=4)
+
+    store.attach_ann("ivf", nlist=2, nprobe=2)
+    found = store.search_grouped(query, k=4)
+    assert [group for group, _ in found] == [group for group, _ in exact]
+    assert [score for _, score in found] == pytest.approx([score for _, score in exact], abs=1e-5)
+    assert len(found) == 4
@@ -0,0 +1,65 @@
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httplib2")
+
+from client_pool import ClientPool, SharedHttp, token_path  # noqa: E402
+
+
+class _Slow(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(0.05)
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Slow)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_shared_http_serves_concurrent_threads_on_separate_connections(server):
+    http = SharedHttp(timeout=5)
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(lambda i: http.request(f"{server}/{i}", "GET"), range(32)))
+    assert [(resp.status, content) for resp, content in responses] == [(200, f"/{i}".encode()) for i in range(32)]
+    assert http.opened <= 8
+
+    opened = http.opened
+    for i in range(5):
+        http.request(f"{server}/{i}", "GET")
+    assert http.opened == opened
+
+
+def test_services_are_shared_across_threads(tmp_path):
+    pytest.importorskip("googleapiclient")
+    expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    with open(token_path("a@x", str(tmp_path)), "w") as f:
+        json.dump({"token": "t", "refresh_token": "r", "client_id": "c", "client_secret": "s",
+                   "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ")}, f)
+    pool = ClientPool(token_dir=str(tmp_path))
+    services = []
+    # every Streamlit rerun runs on a new thread
+    for _ in range(3):
+        thread = threading.Thread(target=lambda: services.append(pool.service("a@x", "gmail", "v1")))
+        thread.start()
+        thread.join()
+    assert services[0] is services[1] is services[2]
+    assert pool.stats()["service"]["misses"] == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from embedding_builder import EmbeddingBuilder
+
+
+class ApiError(Exception):
+    """Shaped like google.api_core errors: the HTTP status is .code."""
+
+    def __init__(self, code):
+        super().__init__(f"{code} from the embedding API")
+        self.code = code
+
+
+class Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [[1.0, float(len(text))] for text in texts]
+
+
+def _builder(embed):
+    return EmbeddingBuilder(embed, "fake", max_workers=1, base_delay=0.001, checkpoint_path=None)
+
+
+def test_rate_limited_batches_are_retried():
+    embed = Flaky([ApiError(429), ApiError(503)])
+    assert _builder(embed).embed_documents(["a", "bb"]) == [[1.0, 1.0], [1.0, 2.0]]
+    assert embed.calls == 3
+
+
+def test_rejected_batches_are_not_retried():
+    embed = Flaky([ApiError(400)])
+    with pytest.raises(ApiError):
+        _builder(embed).embed_documents(["a"])
+    assert embed.calls == 1
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from benchmarks.fake_gmail import FakeHttpError
+from index_sync import ChromaSyncBackend, Manifest, sync_index
+
+
+class FakeCollection:
+    def __init__(self, rows=None):
+        self.rows = dict(rows or {})  # id -> (document, embedding, metadata)
+
+    def get(self, include=()):
+        ids = list(self.rows)
+        return {"ids": ids, "documents": [self.rows[i][0] for i in ids],
+                "embeddings": [self.rows[i][1] for i in ids], "metadatas": [self.rows[i][2] for i in ids]}
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.rows.update(zip(ids, zip(documents, embeddings, metadatas)))
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.rows.pop(doc_id, None)
+
+
+LEGACY = {"7": ("7 machine learning", [0.7], None), "9": ("9 robotics", [0.9], None)}
+DOCS = {"p1:research_interests:0": ("machine learning", {"prof_id": "p1"}),
+        "p2:research_interests:0": ("robotics", {"prof_id": "p2"})}
+
+
+def _embed(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def test_failed_embedding_leaves_the_index_serving(tmp_path):
+    collection = FakeCollection(LEGACY)
+    manifest = Manifest(os.path.join(tmp_path, "manifest.json"))
+
+    def quota_exceeded(texts):
+        raise FakeHttpError(429)
+
+    with pytest.raises(FakeHttpError):
+        sync_index(DOCS, ChromaSyncBackend(collection), manifest, quota_exceeded)
+    assert collection.rows == LEGACY
+    assert not os.path.exists(manifest.path)
+
+
+def test_failed_upsert_keeps_stale_rows_and_manifest(tmp_path):
+    collection = FakeCollection(LEGACY)
+    manifest = Manifest(os.path.join(tmp_path, "manifest.json"))
+
+    def broken_upsert(**kwargs):
+        raise FakeHttpError(503)
+
+    collection.upsert = broken_upsert
+    with pytest.raises(FakeHttpError):
+        sync_index(DOCS, ChromaSyncBackend(collection), manifest, _embed)
+    assert collection.rows == LEGACY
+    assert not os.path.exists(manifest.path)
+
+
+def test_tagged_legacy_vectors_are_re_embedded(tmp_path):
+    collection = FakeCollection(LEGACY)
+    manifest = Manifest(os.path.join(tmp_path, "manifest.json"))
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return _embed(texts)
+
+    stats = sync_index(DOCS, ChromaSyncBackend(collection), manifest, embed)
+    assert sorted(embedded) == ["machine learning", "robotics"]
+    assert stats["deleted"] == 2
+    assert set(collection.rows) == set(DOCS)
+    assert Manifest(manifest.path).hashes == manifest.hashes
+
+
+def test_vectors_for_identical_text_are_reused(tmp_path):
+    collection = FakeCollection({"old": ("machine learning", [1.5], None)})
+    manifest = Manifest(os.path.join(tmp_path, "manifest.json"))
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return _embed(texts)
+
+    sync_index(DOCS, ChromaSyncBackend(collection), manifest, embed)
+    assert embedded == ["robotics"]
+    assert collection.rows["p1:research_interests:0"][1] == [1.5]
@@ -0,0 +1,17 @@
+from outreach_analytics import OutreachAnalytics
+
+
+def _row(sent_at, thread_id, status):
+    return [sent_at, "student", "Prof", "prof@iitgn.ac.in", "Research", "...", status, thread_id]
+
+
+def test_best_time_is_only_picked_among_slots_something_was_sent_in(tmp_path):
+    analytics = OutreachAnalytics(path=str(tmp_path))
+    # 2026-01-06 is a Tuesday, 2026-01-07 a Wednesday; every email went out at 14:00
+    rows = [_row(f"2026-01-0{6 + i % 2} 14:00:00", f"t{i}", "Replied" if i < 3 else "Awaiting Reply")
+            for i in range(10)]
+    analytics.import_sheet("student", rows)
+
+    suggestion = analytics.suggest_best_time("student")
+    assert suggestion in ("Suggested outreach time: Tue around 14:00 hrs",
+                          "Suggested outreach time: Wed around 14:00 hrs")
@@ -0,0 +1,55 @@
+import http.client
+
+import pytest
+
+from benchmarks.fake_embeddings import QuotaExceeded
+from benchmarks.fake_gmail import FakeHttpError
+from rate_limit import call_with_retries, is_transient
+
+
+class WrappedError(Exception):
+    pass
+
+
+def _wrapped(cause):
+    try:
+        raise WrappedError(f"Error embedding content: {cause}") from cause
+    except WrappedError as e:
+        return e
+
+
+@pytest.mark.parametrize("error, transient", [
+    (FakeHttpError(429), True),
+    (FakeHttpError(503), True),
+    (FakeHttpError(404), False),
+    (FakeHttpError(400), False),
+    (QuotaExceeded("quota"), True),
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (http.client.RemoteDisconnected(), True),
+    (ValueError("response blocked by safety filters"), False),
+    (KeyError("candidates"), False),
+    (_wrapped(QuotaExceeded("quota")), True),
+    (_wrapped(ValueError("blocked")), False),
+])
+def test_only_rate_limits_server_errors_and_network_failures_are_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_requests_network_errors_are_transient():
+    requests = pytest.importorskip("requests")
+    assert is_transient(requests.exceptions.ConnectionError())
+    assert is_transient(requests.exceptions.ReadTimeout())
+    assert not is_transient(requests.exceptions.InvalidURL())
+
+
+def test_blocked_responses_are_not_retried():
+    calls = []
+
+    def blocked():
+        calls.append(1)
+        raise ValueError("response blocked")
+
+    with pytest.raises(ValueError):
+        call_with_retries(blocked, max_retries=3, base_delay=0, retry_if=is_transient)
+    assert len(calls) == 1
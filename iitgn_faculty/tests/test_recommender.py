@@ -0,0 +1,42 @@
+import threading
+import time
+
+from recommender import Recommender
+
+
+def test_a_failing_semantic_leg_is_skipped_until_the_cooldown_ends():
+    recommender = Recommender(semantic_timeout=1, semantic_cooldown=0.2)
+    calls = []
+
+    def failing(query, top_k):
+        calls.append(query)
+        raise RuntimeError("embedding service unavailable")
+
+    recommender._search_ids = failing
+    assert recommender._semantic_ids("q1", 10, 1) is None
+    assert recommender._semantic_ids("q2", 10, 1) is None
+    assert calls == ["q1"]
+
+    time.sleep(0.25)
+    recommender._search_ids = lambda query, top_k: ["p1"]
+    assert recommender._semantic_ids("q3", 10, 1) == ["p1"]
+
+
+def test_semantic_searches_stop_queueing_at_max_pending():
+    recommender = Recommender(semantic_cooldown=0, semantic_max_pending=1)
+    release, calls = threading.Event(), []
+
+    def hung(query, top_k):
+        calls.append(query)
+        release.wait(5)
+        return ["p1"]
+
+    recommender._search_ids = hung
+    try:
+        assert recommender._semantic_ids("q1", 10, 0.01) is None
+        assert recommender._semantic_ids("q2", 10, 0.01) is None
+        assert calls == ["q1"]
+    finally:
+        release.set()
+    recommender._executor.shutdown(wait=True)
+    assert recommender._semantic_pending == 0
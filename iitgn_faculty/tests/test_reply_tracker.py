@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.fake_gmail import FakeGmail, FakeHttpError, FakeSheets, _Request
+from reply_tracker import AWAITING, REPLIED, STATUS_COLUMN, ReplyTracker
+
+
+class FailingSheets(FakeSheets):
+    """Answers batchUpdate on the `broken` spreadsheets with a 403."""
+
+    def __init__(self, broken):
+        super().__init__()
+        self.broken = set(broken)
+
+    def batchUpdate(self, spreadsheetId, body):
+        if spreadsheetId in self.broken:
+            def fail():
+                raise FakeHttpError(403, "no edit access")
+            return _Request(self, fail)
+        return super().batchUpdate(spreadsheetId, body)
+
+
+def _tracker(tmp_path, account, gmail, sheets):
+    return ReplyTracker(gmail, sheets, path=str(tmp_path / "replies.sqlite3"), account=account)
+
+
+def test_accounts_sharing_the_mirror_only_sync_and_push_their_own_threads(tmp_path):
+    ann_gmail, bob_gmail = FakeGmail("ann@x"), FakeGmail("bob@x")
+    ann_sheets, bob_sheets = FakeSheets(), FakeSheets()
+    ann = _tracker(tmp_path, "ann@x", ann_gmail, ann_sheets)
+    bob = _tracker(tmp_path, "bob@x", bob_gmail, bob_sheets)
+    # both mailboxes number their threads from t1: ids are only unique per account
+    ann_thread, bob_thread = ann_gmail.send(), bob_gmail.send()
+    assert ann_thread == bob_thread
+    ann.track(ann_thread, "ann-sheet", 2)
+    bob.track(bob_thread, "bob-sheet", 2)
+    ann.sync(), bob.sync()
+    ann_gmail.reply(ann_thread)
+
+    assert ann.sync() == 1
+    assert bob.sync() == 0
+    assert ann.statuses() == {ann_thread: REPLIED}
+    assert bob.statuses() == {bob_thread: AWAITING}
+    assert [row[0] for row in ann.replies_since()] == [ann_thread]
+    assert bob.replies_since() == []
+
+    assert ann.push_changes() == 1
+    assert bob.push_changes() == 0
+    assert ann_sheets.cells == {("ann-sheet", f"{STATUS_COLUMN}2"): REPLIED}
+    assert bob_sheets.http_requests == 0
+
+
+def test_push_failure_on_one_sheet_does_not_stop_the_others(tmp_path):
+    gmail, sheets = FakeGmail(), FailingSheets(broken={"sheet-a"})
+    tracker = _tracker(tmp_path, "ann@x", gmail, sheets)
+    threads = [gmail.send() for _ in range(3)]
+    for thread_id, spreadsheet_id in zip(threads, ["sheet-a", "sheet-b", "sheet-c"]):
+        tracker.track(thread_id, spreadsheet_id, 2)
+    tracker.sync()
+    for thread_id in threads:
+        gmail.reply(thread_id)
+    assert tracker.sync() == 3
+
+    with pytest.raises(FakeHttpError):
+        tracker.push_changes()
+    assert set(sheets.cells) == {("sheet-b", f"{STATUS_COLUMN}2"), ("sheet-c", f"{STATUS_COLUMN}2")}
+
+    sheets.broken.clear()
+    assert tracker.push_changes() == 1
+    assert ("sheet-a", f"{STATUS_COLUMN}2") in sheets.cells
+
+
+def test_threads_tracked_before_accounts_keep_the_unknown_account(tmp_path):
+    path = str(tmp_path / "replies.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE threads (thread_id TEXT PRIMARY KEY, spreadsheet_id TEXT, row INTEGER, "
+                     "status TEXT NOT NULL, synced_status TEXT, updated_at REAL)")
+        conn.execute("INSERT INTO threads VALUES ('t1', 'sheet', 2, ?, ?, 0)", (AWAITING, AWAITING))
+    assert ReplyTracker(FakeGmail(), FakeSheets(), path=path, account="").statuses() == {"t1": AWAITING}
+    assert ReplyTracker(FakeGmail(), FakeSheets(), path=path, account="ann@x").statuses() == {}
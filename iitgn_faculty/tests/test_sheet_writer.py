@@ -0,0 +1,72 @@
+import sys
+import types
+
+import pytest
+
+from benchmarks.fake_gmail import FakeSheets
+from sheet_writer import SheetWriter
+
+
+class NotFound(Exception):
+    pass
+
+
+class NoSheets:
+    def open(self, title):
+        raise NotFound(title)
+
+
+@pytest.fixture(autouse=True)
+def gspread(monkeypatch):
+    monkeypatch.setitem(sys.modules, "gspread", types.SimpleNamespace(SpreadsheetNotFound=NotFound))
+
+
+def _writer(tmp_path, account, service):
+    return SheetWriter(object(), NoSheets(), flush_rows=100, flush_seconds=3600,
+                       path=str(tmp_path / "sheets.sqlite3"), service=service, account=account)
+
+
+def test_accounts_sharing_the_cache_only_flush_their_own_rows(tmp_path):
+    ann_service, bob_service = FakeSheets(), FakeSheets()
+    ann, bob = _writer(tmp_path, "ann@x", ann_service), _writer(tmp_path, "bob@x", bob_service)
+    ann.append("Student", ["2026-01-01 10:00:00", "Student", "Prof A", "a@x", "", "", "Awaiting Reply", "t1"])
+    bob.append("Student", ["2026-01-01 11:00:00", "Student", "Prof B", "b@x", "", "", "Awaiting Reply", "t2"])
+    assert (ann.pending(), bob.pending()) == (1, 1)
+
+    assert ann.flush() == 1
+    assert bob.pending() == 1
+    ann_rows = [row for rows in ann_service.rows.values() for row in rows]
+    assert [row[-1] for row in ann_rows if row[0] != "Timestamp"] == ["t1"]
+    assert bob_service.http_requests == 0
+
+    assert bob.flush() == 1
+    bob_rows = [row for rows in bob_service.rows.values() for row in rows]
+    assert [row[-1] for row in bob_rows if row[0] != "Timestamp"] == ["t2"]
+
+
+def test_spreadsheet_ids_are_cached_per_account(tmp_path):
+    ann, bob = _writer(tmp_path, "ann@x", FakeSheets()), _writer(tmp_path, "bob@x", FakeSheets())
+    assert ann.resolve("Student") == ("sheet0", True)
+    assert ann.resolve("Student") == ("sheet0", False)
+    # the same title under another account is that account's own sheet
+    assert bob.resolve("Student") == ("sheet0", True)
+
+
+def test_a_failing_sheet_does_not_hold_back_the_others(tmp_path):
+    service = FakeSheets()
+    writer = _writer(tmp_path, "ann@x", service)
+    writer.resolve("Broken")
+    append = service.append
+
+    def append_or_fail(spreadsheetId, **kwargs):
+        if spreadsheetId == "sheet0":
+            raise PermissionError("403")
+        return append(spreadsheetId, **kwargs)
+
+    service.append = append_or_fail
+    writer.append("Broken", ["2026-01-01 10:00:00", "Broken", "", "", "", "", "Awaiting Reply", "t1"])
+    writer.append("Fine", ["2026-01-01 10:00:00", "Fine", "", "", "", "", "Awaiting Reply", "t2"])
+    with pytest.raises(PermissionError):
+        writer.flush()
+    assert writer.pending("Broken") == 1
+    assert writer.pending("Fine") == 0
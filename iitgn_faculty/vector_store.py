@@ -0,0 +1,167 @@
+import json
+import os
+
+import numpy as np
+
+from corpus import BASE_DIR
+
+NUMPY_INDEX_PATH = os.path.join(BASE_DIR, ".numpy_index")
+# with an ANN index attached, this many chunks are fetched per requested professor before grouping
+ANN_CHUNKS_PER_RESULT = 5
+
+
+def normalize_rows(vectors, dtype="float32"):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(dtype)
+
+
+class NumpyVectorStore:
+    """In-process brute-force index: L2-normalized embeddings in a memory-mapped .npy.
+
+    Cosine similarity is one matrix-vector product; argpartition picks the top k.
+    Ids may be "<group>:<field>:<i>" chunk ids, in which case `search_grouped`
+    scores each group (professor) by its best weighted chunk.
+    """
+
+    def __init__(self, path=NUMPY_INDEX_PATH):
+        self.path = path
+        self.matrix = None
+        self.ids = []
+        self.meta = {}
+        self._groups = None
+        self._weights = (None, None)
+        self.ann = None
+
+    @property
+    def matrix_path(self):
+        return os.path.join(self.path, "embeddings.npy")
+
+    @property
+    def ids_path(self):
+        return os.path.join(self.path, "ids.json")
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def exists(self):
+        return os.path.exists(self.matrix_path) and os.path.exists(self.ids_path)
+
+    def load(self):
+        self.matrix = np.load(self.matrix_path, mmap_mode="r")
+        with open(self.ids_path, "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        self._groups = None
+        self._weights = (None, None)
+        self.ann = None
+        return self
+
+    def save(self, vectors, ids, dtype="float32", **meta):
+        os.makedirs(self.path, exist_ok=True)
+        matrix = normalize_rows(vectors, dtype)
+        tmp_path = f"{self.matrix_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, self.matrix_path)
+        with open(self.ids_path, "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+        self.meta = {"dtype": dtype, "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0, "count": len(ids), **meta}
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        return self.load()
+
+    def build(self, texts, ids, embedding_model, dtype="float32", **meta):
+        vectors = embedding_model.embed_documents(list(texts))
+        return self.save(vectors, ids, dtype, **meta)
+
+    def build_from_chroma(self, collection, dtype="float32", **meta):
+        """Reuse the vectors already stored in a Chroma collection instead of re-embedding."""
+        stored = collection.get(include=["embeddings"])
+        return self.save(stored["embeddings"], stored["ids"], dtype, source="chroma", **meta)
+
+    def search_vector(self, query_vector, k=10) -> list[tuple]:
+        if self.matrix is None or not len(self.ids):
+            return []
+        query = normalize_rows(query_vector).astype(self.matrix.dtype, copy=False)
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def search(self, query, embedding_model, k=10) -> list[tuple]:
+        return self.search_vector(embedding_model.embed_query(query), k)
+
+    def attach_ann(self, kind, **params):
+        """Serve search_grouped from an ANN index (see ann_index.py) persisted under this store."""
+        from ann_index import ids_fingerprint, load_or_build
+
+        # the matrix is rewritten on every sync, so its stat changes whenever any vector does
+        stat = os.stat(self.matrix_path)
+        fingerprint = f"{ids_fingerprint(self.ids)}:{stat.st_size}:{stat.st_mtime_ns}"
+        self.ann = load_or_build(kind, os.path.join(self.path, "ann"), self.matrix, fingerprint, **params)
+        return self.ann
+
+    def groups(self):
+        """(group ids, row order that makes each group contiguous, start of each group in that order, owner per row)."""
+        if self._groups is None:
+            labels = np.array([doc_id.split(":", 1)[0] for doc_id in self.ids])
+            group_ids, owner = np.unique(labels, return_inverse=True)
+            order = np.argsort(owner, kind="stable")
+            starts = np.flatnonzero(np.r_[True, np.diff(owner[order]) != 0])
+            self._groups = (group_ids.tolist(), order, starts, owner)
+        return self._groups
+
+    def chunk_weights(self, field_weights=None):
+        if not field_weights:
+            return None
+        key = tuple(sorted(field_weights.items()))
+        if self._weights[0] != key:
+            fields = [doc_id.split(":")[1] if doc_id.count(":") >= 2 else None for doc_id in self.ids]
+            self._weights = (key, np.array([field_weights.get(field, 1.0) for field in fields], dtype=np.float32))
+        return self._weights[1]
+
+    def group_scores(self, scores, weights=None):
+        """Collapse chunk scores (last axis) to the max per group, in one reduceat."""
+        group_ids, order, starts, _ = self.groups()
+        if weights is not None:
+            scores = scores * weights
+        return group_ids, np.maximum.reduceat(scores[..., order], starts, axis=-1)
+
+    def search_grouped(self, query_vector, k=10, field_weights=None) -> list[tuple]:
+        if self.matrix is None or not len(self.ids):
+            return []
+        query = normalize_rows(query_vector).astype(self.matrix.dtype, copy=False)
+        if self.ann is not None:
+            return self._search_grouped_ann(query, k, self.chunk_weights(field_weights))
+        group_ids, scores = self.group_scores(self.matrix @ query, self.chunk_weights(field_weights))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(group_ids[i], float(scores[i])) for i in top]
+
+    def _search_grouped_ann(self, query, k, weights):
+        """Best weighted chunk per group, fetching more chunks until no unseen one could change the top k."""
+        group_ids, _, _, owner = self.groups()
+        fetch = k * ANN_CHUNKS_PER_RESULT
+        while True:
+            rows, scores = self.ann.search(query.astype(np.float32), min(fetch, len(owner)))
+            rows, scores = rows[0], scores[0]
+            rows, scores = rows[rows >= 0], scores[rows >= 0]
+            weighted = scores * weights[rows] if weights is not None else scores
+            best = {}
+            for group, score in zip(owner[rows].tolist(), weighted.tolist()):
+                if score > best.get(group, -np.inf):
+                    best[group] = score
+            top = sorted(best, key=best.get, reverse=True)[:k]
+            # chunks come back best first; anything not fetched scores at most the last one times some weight
+            last = float(scores[-1]) if len(scores) else -np.inf
+            bound = last if weights is None else max(last * float(weights.max()), last * float(weights.min()))
+            exhausted = len(rows) < min(fetch, len(owner)) or fetch >= len(owner)
+            if exhausted or (len(top) == k and best[top[-1]] >= bound):
+                return [(group_ids[group], best[group]) for group in top]
+            fetch *= 4
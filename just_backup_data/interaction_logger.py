@@ -1,21 +1,110 @@
 import json
+import sqlite3
+import threading
+from contextlib import closing
 from datetime import datetime, timedelta
 import os
 
 LOG_FILE = "interaction_log.json"
+# append-only store; WAL lets several Streamlit processes write without losing rows
+LOG_DB = os.getenv("INTERACTION_DB", "interaction_log.sqlite3")
+
+_COLUMNS = ("student_name", "professor_name", "professor_email", "goal", "sent_time", "followup_time", "responded")
+_initialized = set()
+_init_lock = threading.Lock()
+
 
 def plan_followup(sent_time):
     return sent_time + timedelta(days=5)
 
-def log_interaction(entry, path=LOG_FILE):
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                _create(conn)
+                _initialized.add(path)
+    return conn
+
+
+_INSERT = f"INSERT INTO interactions ({', '.join(_COLUMNS)}, entry) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+
+
+def _create(conn):
+    # IMMEDIATE takes the write lock up front, so only one process finds the table empty and imports
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, student_name TEXT, professor_name TEXT, professor_email TEXT, "
+            "goal TEXT, sent_time TEXT, followup_time TEXT, responded INTEGER NOT NULL DEFAULT 0, entry TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS interactions_student ON interactions (student_name, sent_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS interactions_professor ON interactions (professor_name, sent_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS interactions_followup ON interactions (responded, followup_time)")
+        empty = conn.execute("SELECT 1 FROM interactions LIMIT 1").fetchone() is None
+        if empty and os.path.exists(LOG_FILE):
+            # one-time import of the old rewrite-everything JSON log
+            try:
+                with open(LOG_FILE, "r", encoding="utf-8") as f:
+                    conn.executemany(_INSERT, [_row(entry) for entry in json.load(f)])
+                print(f"Imported {LOG_FILE} into the interaction store")
+            except (OSError, ValueError) as e:
+                print("Could not import old interaction log:", e)
+
+
+def _row(entry):
+    values = [entry.get(column) for column in _COLUMNS]
+    values[-1] = int(bool(entry.get("responded")))
+    return (*values, json.dumps(entry, default=str))
+
+
+def _entries(rows):
+    return [{**json.loads(row["entry"]), "id": row["id"], "responded": bool(row["responded"])} for row in rows]
+
+
+def log_interaction(entry, path=LOG_DB):
+    """Append one interaction; a single-row INSERT, so cost does not grow with the log."""
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        else:
-            logs = []
-        logs.append(entry)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=2)
+        with closing(_connect(path)) as conn, conn:
+            return conn.execute(_INSERT, _row(entry)).lastrowid
     except Exception as e:
         print("Logging failed:", e)
+
+
+def followups_due(now=None, student_name=None, path=LOG_DB):
+    """Unanswered interactions whose follow-up time has passed, oldest first."""
+    now = (now or datetime.now()).isoformat()
+    query = "SELECT id, responded, entry FROM interactions WHERE responded = 0 AND followup_time <= ?"
+    params = [now]
+    if student_name:
+        query += " AND student_name = ?"
+        params.append(student_name)
+    with closing(_connect(path)) as conn:
+        return _entries(conn.execute(query + " ORDER BY followup_time", params))
+
+
+def professor_history(professor_name, student_name=None, path=LOG_DB):
+    query = "SELECT id, responded, entry FROM interactions WHERE professor_name = ?"
+    params = [professor_name]
+    if student_name:
+        query += " AND student_name = ?"
+        params.append(student_name)
+    with closing(_connect(path)) as conn:
+        return _entries(conn.execute(query + " ORDER BY sent_time", params))
+
+
+def student_history(student_name, path=LOG_DB):
+    with closing(_connect(path)) as conn:
+        return _entries(conn.execute(
+            "SELECT id, responded, entry FROM interactions WHERE student_name = ? ORDER BY sent_time", (student_name,)
+        ))
+
+
+def mark_responded(interaction_id, responded=True, path=LOG_DB):
+    with closing(_connect(path)) as conn, conn:
+        conn.execute("UPDATE interactions SET responded = ? WHERE id = ?", (int(responded), interaction_id))